@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Lookup cost of the doubleFilter depending on the size of its window
+
+Fills the doubleFilter with doubleFilter_ignore_entries different RICs and
+measures checkID() for unknown RICs (every new alarm), checkID() for doubles
+and newEntry() with the eviction of the oldest entry. For comparison the
+former linear search over the list of entries is measured with the same data.
+
+Usage:
+  doubleFilterBenchmark.py [-w 10,100,1000,10000] [-n 20000]
+
+@author: Bastian Schroll
+"""
+
+import argparse
+import ConfigParser
+import logging
+import os
+import sys
+import time
+
+# allow the start from the benchmark directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from includes import globalVars
+from includes import doubleFilter
+from includes import settings
+
+
+def linearCheck(entryList, typ, data, msg, ignoreTime, checkMsg):
+	"""
+	The former checkID(): linear search over the list of all entries
+
+	@return:    False if double was found
+	"""
+	timestamp = int(time.time())
+	for (xID, xTimestamp, xMsg) in entryList:
+		if data == xID and timestamp < xTimestamp + ignoreTime:
+			if "POC" in typ and checkMsg:
+				if msg.strip() in xMsg:
+					return False
+			else:
+				return False
+	return True
+
+
+def measure(function, arguments):
+	"""
+	Call the function with each of the arguments
+
+	@return:    microseconds per call
+	"""
+	start = time.time()
+	for argument in arguments:
+		function(*argument)
+	return (time.time() - start) * 1000000.0 / len(arguments)
+
+
+def run(window, count):
+	"""
+	Measure the doubleFilter with a window of the given size
+
+	@return:    (miss, hit, newEntry, linear miss, linear hit) in microseconds per call
+	"""
+	globalVars.config.set("BOSWatch", "doubleFilter_ignore_entries", str(window))
+	settings.load()
+	doubleFilter.doubleList.clear()
+	doubleFilter.doubleIndex.clear()
+	for ric in range(window):
+		doubleFilter.newEntry("%07d" % ric, "Testalarm")
+	entryList = list(doubleFilter.doubleList)
+	checkMsg = globalVars.settings.BOSWatch.doubleFilter_check_msg
+
+	misses = [("POC", "%07d" % (window + i), "Testalarm") for i in range(count)]
+	# spread over the whole window, the linear search finds the old entries first
+	hits = [("POC", "%07d" % (i * 7919 % window), "Testalarm") for i in range(count)]
+	linearCount = max(1, min(count, 2000000 // window))
+	return (
+		measure(doubleFilter.checkID, misses),
+		measure(doubleFilter.checkID, hits),
+		measure(doubleFilter.newEntry, [(data, msg) for (typ, data, msg) in misses]),
+		measure(lambda typ, data, msg: linearCheck(entryList, typ, data, msg, 3600, checkMsg), misses[:linearCount]),
+		measure(lambda typ, data, msg: linearCheck(entryList, typ, data, msg, 3600, checkMsg), hits[:linearCount]))
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Lookup cost of the doubleFilter depending on the size of its window")
+	parser.add_argument("-w", "--windows", help="Values of doubleFilter_ignore_entries (comma separated)", default="10,100,1000,10000")
+	parser.add_argument("-n", "--count", help="Number of calls per measurement", type=int, default=20000)
+	args = parser.parse_args()
+
+	# the double alarms are logged with info
+	logging.disable(logging.INFO)
+	globalVars.config = ConfigParser.ConfigParser()
+	globalVars.config.read(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "config.template.ini"))
+	globalVars.config.set("BOSWatch", "doubleFilter_ignore_time", "3600")
+
+	print "%8s %12s %12s %12s %12s %12s" % ("window", "miss", "double", "newEntry", "linear miss", "linear dbl")
+	for window in [int(window) for window in args.windows.split(",")]:
+		print "%8d %9.2f us %9.2f us %9.2f us %9.2f us %9.2f us" % ((window,) + run(window, args.count))
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Parse cost per multimon-ng line
+
+Extracts the fields of FMS, ZVEI and POCSAG lines with the precompiled parsers
+of the decoders and, for comparison, with the former fixed columns and the
+chain of replace() calls for the POCSAG text.
+
+Usage:
+  parserBenchmark.py [-n 100000]
+
+@author: Bastian Schroll
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+# allow the start from the benchmark directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from includes.decoders import fms
+from includes.decoders import poc
+from includes.decoders import zvei
+
+LINES = {
+	"FMS": "FMS: 43f314170000 (9=Rotkreuz       3=Bayern 1         Ort 0x25=037FZG  7141Status  3=Einsatz Ab     0=FZG->LST 2=I  (ohneNA,ohneSIGNAL)) CRC correct\n",
+	"ZVEI": "ZVEI1: 12345\n",
+	"POC": "POCSAG1200: Address: 1234567  Function: 1  Alpha:   B2 Feuer Gebaeude Pers in Gefahr. Musterstrasse 12<NUL><NUL>\n"}
+
+
+def parseFMS(decoded):
+	"""New parser of fms.decode()"""
+	fields = fms.FMS_LINE.search(decoded).groups()
+	fms_id = "".join(fields[:6])
+	return fms.FMS_ID.search(fms_id) is not None, fields
+
+
+def parseZVEI(decoded):
+	"""New parser of zvei.decode()"""
+	zvei_id = zvei.ZVEI_LINE.search(decoded).group(1)
+	return zvei.ZVEI_ID.search(zvei_id) is not None, zvei_id
+
+
+def parsePOC(decoded):
+	"""New parser of poc.decode()"""
+	(bitrate, poc_id, poc_sub, poc_text) = poc.POC_LINE.search(decoded).groups()
+	poc_id = poc_id.zfill(7)
+	poc_sub = str(int(poc_sub)+1)
+	poc_text = poc.POC_CONTROL.sub("", poc_text.strip()).strip() if poc_text is not None else ""
+	return poc.POC_ID.search(poc_id) is not None and poc.POC_SUB.search(poc_sub) is not None, (int(bitrate), poc_id, poc_sub, poc_text)
+
+
+def columnsFMS(decoded):
+	"""Former fixed columns of fms.decode()"""
+	fields = (decoded[19], decoded[36], decoded[61:63], decoded[72:76], decoded[84], decoded[101], decoded[103:110], decoded[114:117])
+	fms_id = "".join(fields[:6])
+	return re.search("[0-9a-f]{8}[0-9a-f]{1}[01]{1}", fms_id) is not None, fields
+
+
+def columnsZVEI(decoded):
+	"""Former fixed columns of zvei.decode()"""
+	zvei_id = decoded[7:12]
+	return re.search("[0-9]{5}", zvei_id) is not None, zvei_id
+
+
+def columnsPOC(decoded):
+	"""Former fixed columns and replace() chain of poc.decode()"""
+	bitrate = 0
+	if "POCSAG512:" in decoded:
+		bitrate = 512
+		poc_id = decoded[20:27].replace(" ", "").zfill(7)
+		poc_sub = str(int(decoded[39])+1)
+	elif "POCSAG1200:" in decoded:
+		bitrate = 1200
+		poc_id = decoded[21:28].replace(" ", "").zfill(7)
+		poc_sub = str(int(decoded[40])+1)
+	elif "POCSAG2400:" in decoded:
+		bitrate = 2400
+		poc_id = decoded[21:28].replace(" ", "").zfill(7)
+		poc_sub = str(int(decoded[40])+1)
+	if "Alpha:" in decoded:
+		poc_text = decoded.split('Alpha:   ')[1].strip().replace('<NUL><NUL>','').replace('<NUL>','').replace('<NUL','').replace('< NUL>','').replace('<EOT>','').strip()
+	else:
+		poc_text = ""
+	return re.search("[0-9]{7}", poc_id) is not None and re.search("[1-4]{1}", poc_sub) is not None, (bitrate, poc_id, poc_sub, poc_text)
+
+
+def measure(function, line, count):
+	"""
+	Parse the line count times
+
+	@return:    microseconds per line
+	"""
+	start = time.time()
+	for number in xrange(count):
+		function(line)
+	return (time.time() - start) * 1000000.0 / count
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Parse cost per multimon-ng line")
+	parser.add_argument("-n", "--count", help="Number of lines per measurement", type=int, default=100000)
+	args = parser.parse_args()
+
+	print "%6s %12s %12s" % ("typ", "parser", "columns")
+	for typ, new, old in (("FMS", parseFMS, columnsFMS), ("ZVEI", parseZVEI, columnsZVEI), ("POC", parsePOC, columnsPOC)):
+		print "%6s %9.2f us %9.2f us" % (typ, measure(new, LINES[typ], args.count), measure(old, LINES[typ], args.count))
@@ -0,0 +1,300 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+End-to-end benchmark of the BOSWatch pipeline
+decoder.decode -> decoders -> doubleFilter -> regexFilter -> alarmHandler -> plugins
+
+Generated multimon-ng lines (FMS/ZVEI/POCSAG mix) are decoded with stub plugins
+(no-op and with an injected latency), a configurable number of RegEx filters and
+description list entries. The result (msgs/s, p50/p99 latency, objects per
+telegram) can be stored as JSON and compared with the result of another version.
+
+Python 2 has no tracemalloc, the allocations are counted as the growth of the
+objects tracked by the garbage collector (gc disabled during the measurement);
+with sys.getallocatedblocks() (Python 3) the memory blocks are counted too.
+
+Usage:
+  pipelineBenchmark.py [-n 20000] [--mix FMS:1,ZVEI:1,POC:2] [--filters 50] [--descriptions 1000]
+                       [--plugins noop:2,sleep:1] [--latency 1] [--async] [-o result.json] [-c old.json]
+
+@author: Bastian Schroll
+
+@requires: none
+"""
+
+import argparse
+import ConfigParser
+import gc
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# allow the start from the benchmark directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from includes import globalVars
+
+FMS_LINE = "FMS: 43f314170000 (9=Rotkreuz       3=Bayern 1         Ort 0x25=037FZG  7141Status  3=Einsatz Ab     0=FZG->LST 2=I  (ohneNA,ohneSIGNAL)) CRC correct\n"
+
+
+def fmsLine(number):
+	"""FMS line with the vehicle and the status of the number"""
+	line = list(FMS_LINE)
+	line[72:76] = "%04d" % (number % 10000)
+	line[84] = "%x" % (number % 16)
+	return "".join(line)
+
+
+def zveiLine(number):
+	"""ZVEI line with a 5-tone code of the number"""
+	return "ZVEI1: %05d\n" % (number % 100000)
+
+
+def pocLine(number):
+	"""POCSAG line with a RIC of the number, every second one with text"""
+	bitrate = (512, 1200, 2400)[number % 3]
+	line = "POCSAG%s: Address: %7d  Function: %d" % (bitrate, 1000000 + number, number % 4)
+	if number % 2:
+		line += "  Alpha:   Einsatz %d: Brand in Musterstadt, Hauptstrasse %d" % (number, number % 200)
+	return line + "\n"
+
+LINES = {"FMS": fmsLine, "ZVEI": zveiLine, "POC": pocLine}
+
+
+def generateLines(count, mix, ids, seed=1):
+	"""
+	Generate the multimon-ng lines
+
+	@type    mix: dict
+	@param   mix: weight for each typ
+	@type    ids: integer
+	@param   ids: number of different ids (a small number gives more double alarms)
+
+	@return:    list of lines
+	"""
+	generator = random.Random(seed)
+	typs = []
+	for typ, weight in sorted(mix.items()):
+		typs += [typ] * weight
+	return [LINES[typ](generator.randint(0, ids - 1)) for typ in [generator.choice(typs) for i in range(count)]]
+
+
+def writeDescriptions(path, count):
+	"""
+	Write description lists with count entries each (every second id of the generator is described)
+
+	@return:    nothing
+	"""
+	os.mkdir(os.path.join(path, "csv"))
+	with open(os.path.join(path, "csv", "fms.csv"), "w") as csvFile:
+		csvFile.write("fms,description\n")
+		for number in range(0, 2 * count, 2):
+			csvFile.write("9325%04d,Fahrzeug %d\n" % (number % 10000, number))
+	with open(os.path.join(path, "csv", "zvei.csv"), "w") as csvFile:
+		csvFile.write("zvei,description\n")
+		for number in range(0, 2 * count, 2):
+			csvFile.write("%05d,Schleife %d\n" % (number % 100000, number))
+	with open(os.path.join(path, "csv", "poc.csv"), "w") as csvFile:
+		csvFile.write("ric,description\n")
+		for number in range(0, 2 * count, 2):
+			csvFile.write("%07d,RIC %d\n" % (1000000 + number, number))
+
+
+class StubPlugin(object):
+	"""Plugin without function, optional with a latency"""
+
+	def __init__(self, latency=0):
+		self.latency = latency
+		self.calls = 0
+
+	def onLoad(self):
+		return
+
+	def run(self, typ, freq, data):
+		self.calls += 1
+		if self.latency:
+			time.sleep(self.latency)
+
+
+def parseWeights(value):
+	"""
+	Parse "NAME:WEIGHT,NAME:WEIGHT"
+
+	@return:    dict
+	"""
+	weights = {}
+	for entry in value.split(","):
+		name, weight = entry.split(":")
+		weights[name.strip()] = int(weight)
+	return weights
+
+
+def setup(args, path):
+	"""
+	Config, description lists, filters and stub plugins for the benchmark
+
+	@return:    dict with the stub plugins
+	"""
+	globalVars.script_path = path
+	globalVars.log_path = path + "/"
+	globalVars.config = ConfigParser.ConfigParser()
+	globalVars.config.read(os.path.join(ROOT, "config", "config.template.ini"))
+	globalVars.config.set("BOSWatch", "processAlarmAsync", "1" if args.processAsync else "0")
+	globalVars.config.set("BOSWatch", "useRegExFilter", "1" if args.filters else "0")
+	for typ in ("FMS", "ZVEI", "POC"):
+		globalVars.config.set(typ, "idDescribed", "1" if args.descriptions else "0")
+	from includes import settings
+	settings.load()
+
+	if args.descriptions:
+		writeDescriptions(path, args.descriptions)
+		from includes import descriptionList
+		descriptionList.loadDescriptionLists()
+
+	plugins = {}
+	for kind, count in parseWeights(args.plugins).items():
+		for number in range(count):
+			plugins["%s%s" % (kind, number)] = StubPlugin(args.latency / 1000.0 if kind == "sleep" else 0)
+	globalVars.pluginList.clear()
+	globalVars.pluginList.update(plugins)
+
+	if args.filters:
+		# filters for all typs and plugins, about half of the telegrams pass
+		names = sorted(plugins.keys()) + ["*"]
+		fields = {"FMS": ("fms", "^93"), "ZVEI": ("zvei", "^[0-4]"), "POC": ("ric", "^10[0-4]")}
+		for number in range(args.filters):
+			typ = ("FMS", "ZVEI", "POC")[number % 3]
+			globalVars.config.set("Filters", "filter%s" % number, "%s;%s;%s;*;%s%s" % (typ, fields[typ][0], names[number % len(names)], fields[typ][1], "" if number < 3 else "[0-9]{%d}" % (number % 4)))
+		from includes import regexFilter
+		regexFilter.loadFilters()
+	return plugins
+
+
+def countBlocks():
+	"""
+	Number of allocated memory blocks (Python 3) or None
+
+	@return:    integer or None
+	"""
+	if hasattr(sys, "getallocatedblocks"):
+		return sys.getallocatedblocks()
+	return None
+
+
+def percentile(values, percent):
+	"""Percentile of a sorted list (nearest rank)"""
+	return values[min(len(values) - 1, int(len(values) * percent / 100.0))] if values else 0
+
+
+def run(args):
+	"""
+	Run the benchmark
+
+	@return:    dict with the parameters and the results
+	"""
+	path = tempfile.mkdtemp(prefix="boswatch-benchmark-")
+	try:
+		plugins = setup(args, path)
+		from includes import alarmHandler
+		from includes import decoder
+		lines = generateLines(args.count, parseWeights(args.mix), args.ids)
+
+		# warm up (imports, compiled regex)
+		for line in lines[:100]:
+			decoder.decode(0, line)
+		alarmHandler.shutdown()
+
+		latencies = []
+		gc.collect()
+		gc.disable()
+		objectsBefore = len(gc.get_objects())
+		blocksBefore = countBlocks()
+		start = time.time()
+		for line in lines:
+			lineStart = time.time()
+			decoder.decode(0, line)
+			latencies.append(time.time() - lineStart)
+		# wait for the queued alarms
+		alarmHandler.shutdown(600)
+		duration = time.time() - start
+		blocksAfter = countBlocks()
+		objectsAfter = len(gc.get_objects())
+		gc.enable()
+
+		latencies.sort()
+		results = {"messagesPerSecond": len(lines) / duration,
+				"duration": duration,
+				"latencyP50": percentile(latencies, 50),
+				"latencyP99": percentile(latencies, 99),
+				"latencyMax": latencies[-1],
+				"objectsPerTelegram": float(objectsAfter - objectsBefore) / len(lines),
+				"pluginCalls": sum([plugin.calls for plugin in plugins.values()])}
+		if blocksBefore is not None:
+			results["blocksPerTelegram"] = float(blocksAfter - blocksBefore) / len(lines)
+	finally:
+		shutil.rmtree(path)
+
+	return {"version": globalVars.versionNr,
+			"branch": globalVars.branch,
+			"python": sys.version.split()[0],
+			"time": time.strftime("%Y-%m-%d %H:%M:%S"),
+			"parameters": {"count": args.count, "mix": args.mix, "ids": args.ids, "filters": args.filters,
+						"descriptions": args.descriptions, "plugins": args.plugins, "latency": args.latency, "async": args.processAsync},
+			"results": results}
+
+
+def printResult(result, old=None):
+	"""
+	Print the results, with the change against an old result
+
+	@return:    nothing
+	"""
+	print "BOSWatch %s (%s), Python %s" % (result["version"], result["branch"], result["python"])
+	print "parameters: %s" % ", ".join(["%s=%s" % item for item in sorted(result["parameters"].items())])
+	if old:
+		print "compared with: BOSWatch %s (%s) from %s" % (old["version"], old["branch"], old["time"])
+		if old["parameters"] != result["parameters"]:
+			print "WARNING: different parameters: %s" % ", ".join(["%s=%s" % item for item in sorted(old["parameters"].items())])
+	for name, value in sorted(result["results"].items()):
+		line = "  %-20s %14.6f" % (name, value)
+		if old and name in old["results"]:
+			oldValue = old["results"][name]
+			line += " %14.6f" % oldValue
+			if oldValue:
+				line += " %+8.1f %%" % (100.0 * (value - oldValue) / oldValue)
+		print line
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="End-to-end benchmark of the BOSWatch pipeline")
+	parser.add_argument("-n", "--count", help="Number of telegrams (default: 20000)", type=int, default=20000)
+	parser.add_argument("--mix", help="Weights of the telegram typs (default: FMS:1,ZVEI:1,POC:2)", default="FMS:1,ZVEI:1,POC:2")
+	parser.add_argument("--ids", help="Number of different ids, less ids give more double alarms (default: 5000)", type=int, default=5000)
+	parser.add_argument("--filters", help="Number of RegEx filters (default: 0 = off)", type=int, default=0)
+	parser.add_argument("--descriptions", help="Entries of each description list (default: 0 = off)", type=int, default=0)
+	parser.add_argument("--plugins", help="Stub plugins, noop and sleep (default: noop:2)", default="noop:2")
+	parser.add_argument("--latency", help="Latency of the sleep plugins in ms (default: 1)", type=float, default=1)
+	parser.add_argument("--async", help="Process the alarms async (processAlarmAsync)", dest="processAsync", action="store_true")
+	parser.add_argument("-o", "--output", help="Store the result as JSON")
+	parser.add_argument("-c", "--compare", help="Compare with a stored JSON result")
+	parser.add_argument("-v", "--verbose", help="Show the log of BOSWatch", action="store_true")
+	args = parser.parse_args()
+
+	logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+	result = run(args)
+	old = None
+	if args.compare:
+		with open(args.compare) as oldFile:
+			old = json.load(oldFile)
+	printResult(result, old)
+	if args.output:
+		with open(args.output, "w") as outputFile:
+			json.dump(result, outputFile, indent=2, sort_keys=True)
+		print "result stored in %s" % args.output
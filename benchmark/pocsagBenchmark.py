@@ -0,0 +1,237 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Benchmark of the native POCSAG demodulator against multimon-ng
+
+Both decoders get the same audio (WAV files with 22050 Hz, mono, 16 bit),
+the tool prints the runtime, the speed (audio seconds per second) and the
+differences of the received telegrams.
+
+Usage:
+  pocsagBenchmark.py --generate test.wav       write a WAV with synthetic POCSAG telegrams
+  pocsagBenchmark.py test.wav [more.wav ...]   compare native demodulator and multimon-ng
+  --mode alpha|numeric|auto                    decoding of the messages (like multimon-ng -f)
+
+@author: Bastian Schroll
+
+@requires: numpy, multimon-ng (optional, for the comparison)
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+import wave
+
+import numpy
+
+# allow the start from the benchmark directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from includes.demodulators import pocsag
+
+SAMPLE_RATE = 22050
+# block size like the audio reader of BOSWatch (0.1 seconds)
+BLOCK_SIZE = 2205
+
+
+def encodeMessage(text, numeric=False):
+	"""
+	Build the payload bits of a message
+
+	@type    text: string
+	@param   text: message
+	@type    numeric: boolean
+	@param   numeric: BCD characters (padded with spaces) instead of 7 bit characters (ended with EOT)
+
+	@return:    list of bits (multiple of 20)
+	"""
+	bits = []
+	if numeric:
+		for char in text:
+			bits += [(pocsag.NUMERIC_CHARS.index(char) >> i) & 1 for i in range(4)]
+		while len(bits) % 20:
+			bits += [(pocsag.NUMERIC_CHARS.index(" ") >> i) & 1 for i in range(4)]
+	else:
+		for char in text + "\x04":
+			bits += [(ord(char) >> i) & 1 for i in range(7)]
+		bits += [0] * (-len(bits) % 20)
+	return bits
+
+
+def encodeTransmission(bitrate, telegrams):
+	"""
+	Build the bits of one POCSAG transmission
+
+	@type    telegrams: list
+	@param   telegrams: list of (ric, function, payload bits of encodeMessage())
+
+	@return:    numpy array with the bits
+	"""
+	codewords = []
+	for ric, function, bits in telegrams:
+		# the address codeword is placed in the frame ric % 8
+		while len(codewords) % 16 != (ric & 7) * 2:
+			codewords.append(pocsag.IDLE)
+		codewords.append(pocsag.bchEncode(((ric >> 3) << 2) | function))
+		for i in range(0, len(bits), 20):
+			data = 0
+			for bit in bits[i:i + 20]:
+				data = (data << 1) | bit
+			codewords.append(pocsag.bchEncode((1 << 20) | data))
+	codewords.append(pocsag.IDLE)
+	codewords += [pocsag.IDLE] * (-len(codewords) % 16)
+
+	stream = [i & 1 for i in range(576)]
+	for i in range(0, len(codewords), 16):
+		for word in [pocsag.SYNC] + codewords[i:i + 16]:
+			stream += [(word >> (31 - j)) & 1 for j in range(32)]
+	return numpy.array(stream, dtype=numpy.uint8)
+
+
+def generate(fileName, mode="alpha", seed=1):
+	"""
+	Write a WAV file with random telegrams (all bitrates, noise and some bit errors)
+	Function 1 carries a numeric message, the others an alpha message,
+	the expected texts are decoded with the mode like multimon-ng would
+
+	@return:    list of the expected telegrams (bitrate, ric, function, text)
+	"""
+	random = numpy.random.RandomState(seed)
+	audio = [numpy.zeros(SAMPLE_RATE)]
+	expected = []
+	for number in range(30):
+		bitrate = [512, 1200, 2400][number % 3]
+		ric = int(random.randint(1, 2000000))
+		function = int(random.randint(0, 4))
+		if function == 0:
+			message = encodeMessage("%d-%07d" % (number, ric), numeric=True)
+		else:
+			message = encodeMessage("Einsatz %d: Brand in Musterstadt, Hauptstrasse %d" % (number, random.randint(1, 200)))
+		texts = pocsag.decodeMessage(numpy.array(message, dtype=numpy.uint8), mode)
+		expected += [(bitrate, "%07d" % ric, str(function + 1), text) for text in texts]
+
+		bits = encodeTransmission(bitrate, [(ric, function, message)])
+		# flip single bits in some codewords - must be corrected by the BCH code
+		for position in random.randint(600, len(bits), 4):
+			bits[position] ^= 1
+		samplesPerBit = float(SAMPLE_RATE) / bitrate
+		index = (numpy.arange(int(len(bits) * samplesPerBit)) / samplesPerBit).astype(int)
+		signal = numpy.where(bits[index], -8000.0, 8000.0)
+		# smooth the edges like the receiver and add noise
+		signal = numpy.convolve(signal, numpy.ones(5) / 5, "same") + random.normal(0, 2000, len(signal))
+		audio.append(signal)
+		audio.append(random.normal(0, 2000, SAMPLE_RATE // 2))
+	audio.append(numpy.zeros(SAMPLE_RATE))
+
+	output = wave.open(fileName, "wb")
+	output.setnchannels(1)
+	output.setsampwidth(2)
+	output.setframerate(SAMPLE_RATE)
+	output.writeframes(numpy.clip(numpy.concatenate(audio), -32768, 32767).astype(numpy.int16).tostring())
+	output.close()
+	return expected
+
+
+def readWav(fileName):
+	"""
+	Read a WAV file with 22050 Hz, mono, 16 bit
+
+	@return:    numpy array with the samples
+	"""
+	wav = wave.open(fileName, "rb")
+	if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+		raise ValueError("%s: only 22050 Hz, mono, 16 bit is supported" % fileName)
+	samples = numpy.frombuffer(wav.readframes(wav.getnframes()), dtype=numpy.int16)
+	wav.close()
+	return samples
+
+
+def runNative(samples, mode="alpha"):
+	"""
+	Decode the samples with the native demodulators, block by block like in BOSWatch
+
+	@return:    (seconds, list of telegrams)
+	"""
+	demodulators = [pocsag.POCSAGDemodulator(bitrate, SAMPLE_RATE, mode) for bitrate in (512, 1200, 2400)]
+	telegrams = []
+	start = time.time()
+	for position in range(0, len(samples), BLOCK_SIZE):
+		block = samples[position:position + BLOCK_SIZE]
+		for demodulator in demodulators:
+			telegrams += [args for (typ, args) in demodulator.process(block)]
+	# one second of silence to finish running transmissions
+	for demodulator in demodulators:
+		telegrams += [args for (typ, args) in demodulator.process(numpy.zeros(SAMPLE_RATE, dtype=numpy.int16))]
+	return time.time() - start, telegrams
+
+
+def runMultimon(samples, multimon, mode="alpha"):
+	"""
+	Decode the samples with multimon-ng (raw audio over stdin)
+
+	@return:    (seconds, list of telegrams) or (None, None) if multimon-ng is not available
+	"""
+	command = [multimon, "-a", "POCSAG512", "-a", "POCSAG1200", "-a", "POCSAG2400", "-f", mode, "-t", "raw", "-"]
+	start = time.time()
+	try:
+		process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=open(os.devnull, "w"))
+	except OSError:
+		return None, None
+	output = process.communicate(samples.tostring())[0]
+	seconds = time.time() - start
+
+	telegrams = []
+	for line in output.splitlines():
+		match = re.match(r"POCSAG(\d+):\s+Address:\s+(\d+)\s+Function:\s+(\d)(?:\s+(?:Alpha|Numeric):\s+(.*))?", line)
+		if match:
+			text = (match.group(4) or "").replace("<NUL>", "").replace("<EOT>", "").strip()
+			telegrams.append((int(match.group(1)), match.group(2).zfill(7), str(int(match.group(3)) + 1), text))
+	return seconds, telegrams
+
+
+def report(name, seconds, telegrams, duration):
+	print "%-12s %8.3f s  %8.1f x realtime  %5d telegrams" % (name, seconds, duration / max(seconds, 1e-9), len(telegrams))
+
+
+def compare(nameA, telegramsA, nameB, telegramsB):
+	onlyA = set(telegramsA) - set(telegramsB)
+	onlyB = set(telegramsB) - set(telegramsA)
+	for telegram in sorted(onlyA):
+		print "  only %s: POCSAG%s %s %s %s" % ((nameA,) + telegram)
+	for telegram in sorted(onlyB):
+		print "  only %s: POCSAG%s %s %s %s" % ((nameB,) + telegram)
+	print "  %d common, %d only %s, %d only %s" % (len(set(telegramsA) & set(telegramsB)), len(onlyA), nameA, len(onlyB), nameB)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark of the native POCSAG demodulator against multimon-ng")
+	parser.add_argument("files", nargs="+", help="WAV files (22050 Hz, mono, 16 bit)")
+	parser.add_argument("-g", "--generate", help="Write a WAV file with synthetic telegrams and compare against them", action="store_true")
+	parser.add_argument("-m", "--multimon", help="Path to multimon-ng (default: multimon-ng)", default="multimon-ng")
+	parser.add_argument("--mode", help="Decoding of the messages like multimon-ng -f (default: alpha)", choices=pocsag.MODES, default="alpha")
+	args = parser.parse_args()
+
+	for fileName in args.files:
+		expected = None
+		if args.generate:
+			expected = generate(fileName, args.mode)
+			print "%s: generated %d telegrams" % (fileName, len(expected))
+
+		samples = readWav(fileName)
+		duration = float(len(samples)) / SAMPLE_RATE
+		print "%s: %.1f s audio" % (fileName, duration)
+
+		nativeSeconds, nativeTelegrams = runNative(samples, args.mode)
+		report("native", nativeSeconds, nativeTelegrams, duration)
+		multimonSeconds, multimonTelegrams = runMultimon(samples, args.multimon, args.mode)
+		if multimonSeconds is None:
+			print "multimon-ng not found - no comparison"
+		else:
+			report("multimon-ng", multimonSeconds, multimonTelegrams, duration)
+			compare("native", nativeTelegrams, "multimon-ng", multimonTelegrams)
+		if expected is not None:
+			compare("native", nativeTelegrams, "generated", expected)
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Latency benchmark of the native ZVEI decoder
+
+Generates ZVEI1 sequences with noise, feeds the audio block by block to the
+Goertzel decoder and passes the codes through zvei.process() (doubleFilter,
+description, alarmHandler). The latency is measured from the end of the last
+tone to the dispatch of the alarm: the time until the audio block is complete
+plus the processing time of the block and the decoder. Negative values mean
+the code was dispatched before the last tone ended.
+
+Usage:
+  zveiBenchmark.py [-b 10,50,100] [-n 50]
+
+@author: Bastian Schroll
+
+@requires: numpy
+"""
+
+import argparse
+import ConfigParser
+import os
+import sys
+import time
+
+import numpy
+
+# allow the start from the benchmark directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from includes import globalVars
+from includes import alarmHandler
+from includes.decoders import zvei as zveiDecoder
+from includes.demodulators import zvei
+
+SAMPLE_RATE = 22050
+TONE_TIME = 0.07
+
+
+def generate(count, seed=1):
+	"""
+	Audio with ZVEI sequences, pauses and noise
+
+	@return:    (samples, list of (code, sample index of the end of the last tone))
+	"""
+	random = numpy.random.RandomState(seed)
+	frequencies = dict(zvei.TONES)
+	audio = [random.normal(0, 500, SAMPLE_RATE // 2)]
+	position = len(audio[0])
+	expected = []
+	for number in range(count):
+		code = "%05d" % random.randint(0, 100000)
+		# repeated digits are sent with the repeat tone
+		tones = code[0]
+		for i in range(1, 5):
+			tones += "E" if code[i] == code[i - 1] and tones[-1] != "E" else code[i]
+		for tone in tones:
+			n = numpy.arange(int(SAMPLE_RATE * TONE_TIME))
+			audio.append(8000 * numpy.sin(2 * numpy.pi * frequencies[tone] * n / SAMPLE_RATE + random.uniform(0, 6.28)) + random.normal(0, 500, len(n)))
+			position += len(n)
+		expected.append((code, position))
+		pause = random.normal(0, 500, int(SAMPLE_RATE * random.uniform(0.5, 1.0)))
+		audio.append(pause)
+		position += len(pause)
+	return numpy.clip(numpy.concatenate(audio), -32768, 32767).astype(numpy.int16), expected
+
+
+def run(samples, expected, blockTime):
+	"""
+	Decode the audio with the given block size
+
+	@return:    (list of latencies in ms, number of received codes)
+	"""
+	dispatched = []
+	alarmHandler.processAlarmHandler = lambda typ, freq, data: dispatched.append((data["zvei"], time.time()))
+
+	demodulator = zvei.ZVEIDemodulator(SAMPLE_RATE)
+	blockSize = int(SAMPLE_RATE * blockTime)
+	ends = dict(expected)
+	latencies = []
+	received = 0
+	for position in range(0, len(samples), blockSize):
+		block = samples[position:position + blockSize]
+		blockEnd = position + len(block)
+		start = time.time()
+		for typ, args in demodulator.process(block):
+			zveiDecoder.process(0, *args)
+		for code, dispatchTime in dispatched:
+			if code in ends:
+				received += 1
+				latencies.append(1000.0 * ((blockEnd - ends[code]) / float(SAMPLE_RATE) + dispatchTime - start))
+		del dispatched[:]
+	return latencies, received
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Latency benchmark of the native ZVEI decoder")
+	parser.add_argument("-b", "--blocks", help="Block sizes in ms (comma separated)", default="10,50,100")
+	parser.add_argument("-n", "--count", help="Number of sequences", type=int, default=50)
+	args = parser.parse_args()
+
+	globalVars.config = ConfigParser.ConfigParser()
+	globalVars.config.read(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "config.template.ini"))
+	globalVars.config.set("ZVEI", "idDescribed", "0")
+	globalVars.config.set("BOSWatch", "doubleFilter_ignore_time", "0")
+	from includes import settings
+	settings.load()
+
+	samples, expected = generate(args.count)
+	print "%d sequences, %.1f s audio" % (len(expected), float(len(samples)) / SAMPLE_RATE)
+	print "%8s %9s %9s %9s %9s" % ("block", "received", "p50", "p95", "max")
+	for blockTime in [int(block) for block in args.blocks.split(",")]:
+		latencies, received = run(samples, expected, blockTime / 1000.0)
+		if latencies:
+			print "%6d ms %5d/%-3d %6.1f ms %6.1f ms %6.1f ms" % (blockTime, received, len(expected), numpy.percentile(latencies, 50), numpy.percentile(latencies, 95), max(latencies))
+		else:
+			print "%6d ms %5d/%-3d" % (blockTime, received, len(expected))
@@ -22,12 +22,11 @@ import argparse		# for parse the args
 import ConfigParser	# for parse the config file
 import os			# for log mkdir
 import sys			# for py version
-import time			# for time.sleep()
-import subprocess	# for starting rtl_fm and multimon-ng
+import threading	# for loading the plugins in parallel to the start of the subprocesses
+import time			# for the startup time
 
 from includes import globalVars  # Global variables
 from includes import MyTimedRotatingFileHandler  # extension of TimedRotatingFileHandler
-from includes import checkSubprocesses  # check startup of the subprocesses
 from includes.helper import configHandler
 from includes.helper import freqConverter
 
@@ -48,18 +47,33 @@ try:
 									description="BOSWatch is a Python Script to recive and decode german BOS information with rtl_fm and multimon-NG",
 									epilog="More options you can find in the extern config.ini file in the folder /config")
 	# parser.add_argument("-c", "--channel", help="BOS Channel you want to listen")
-	parser.add_argument("-f", "--freq", help="Frequency you want to listen to", required=True)
+	parser.add_argument("-f", "--freq", help="Frequency you want to listen to")
 	parser.add_argument("-d", "--device", help="Device you want to use (check with rtl_test)", type=int, default=0)
 	parser.add_argument("-e", "--error", help="Frequency-error of your device in PPM", default=0)
-	parser.add_argument("-a", "--demod", help="Demodulation functions", choices=['FMS', 'ZVEI', 'POC512', 'POC1200', 'POC2400'], required=True, nargs="+")
+	parser.add_argument("-a", "--demod", help="Demodulation functions", choices=['FMS', 'ZVEI', 'POC512', 'POC1200', 'POC2400'], nargs="+")
 	parser.add_argument("-s", "--squelch", help="Level of squelch", type=int, default=0)
 	parser.add_argument("-g", "--gain", help="Level of gain", type=int, default=100)
+	parser.add_argument("-m", "--multichannel", help="Use the receivers of section [Receivers] in config.ini instead of --freq/--device/--demod", action="store_true")
+	parser.add_argument("-w", "--wideband", help="Use the wideband receiver of section [Wideband] in config.ini (requires numpy)", action="store_true")
+	parser.add_argument("-r", "--replay", help="Replay a recorded audio file (WAV or raw, 16 bit, 22050 Hz, mono), with -w an IQ file or a capture of multimon-ng (mm_raw.txt) instead of the SDR stick")
+	parser.add_argument("--speed", help="Real-time factor of the replay (default: 0 = as fast as possible)", type=float, default=0)
 	parser.add_argument("-u", "--usevarlog", help="Use '/var/log/boswatch' for logfiles instead of subdir 'log' in BOSWatch directory", action="store_true")
 	parser.add_argument("-v", "--verbose", help="Show more information", action="store_true")
 	parser.add_argument("-q", "--quiet", help="Show no information. Only logfiles", action="store_true")
 	# We need this argument for testing (skip instantiate of rtl-fm and multimon-ng):
 	parser.add_argument("-t", "--test", help=argparse.SUPPRESS, action="store_true")
 	args = parser.parse_args()
+	# freq and demod are required without multi channel mode
+	if not args.multichannel and not args.wideband and (not args.freq or not args.demod):
+		# a replay doesn't need a frequency, a capture of multimon-ng no demod
+		from includes import replayHandler
+		if args.replay and (args.demod or replayHandler.isCapture(args.replay)):
+			args.freq = args.freq or "0"
+			args.demod = args.demod or []
+		else:
+			parser.error("argument -f/--freq and -a/--demod are required (or use -m/--multichannel or -w/--wideband)")
+	if args.replay and args.test:
+		parser.error("argument -r/--replay not allowed with -t/--test")
 except SystemExit:
 	# -h or --help called, exit right now
 	exit(0)
@@ -74,8 +88,8 @@ except:
 #
 try:
 	# initialization:
-	rtl_fm = None
-	multimon_ng = None
+	startTime = time.time()
+	receivers = []
 	nmaHandler = None
 
 	try:
@@ -143,13 +157,16 @@ try:
 		fh.doRollover()
 		rtl_log = open(globalVars.log_path+"rtl_fm.log", "w")
 		mon_log = open(globalVars.log_path+"multimon.log", "w")
-		rawMmOut = open(globalVars.log_path+"mm_raw.txt", "w")
 		rtl_log.write("")
 		mon_log.write("")
-		rawMmOut.write("")
 		rtl_log.close()
 		mon_log.close()
-		rawMmOut.close()
+		# a capture is replayed without writing mm_raw.txt, it may be the replayed file
+		from includes import replayHandler
+		if not (args.replay and replayHandler.isCapture(args.replay)):
+			rawMmOut = open(globalVars.log_path+"mm_raw.txt", "w")
+			rawMmOut.write("")
+			rawMmOut.close()
 		logging.debug("BOSWatch has started")
 		logging.debug("Logfiles cleared")
 
@@ -169,29 +186,21 @@ try:
 		logging.debug("BOSWatch given arguments")
 		if args.test:
 			logging.debug(" - Test-Mode!")
-
-		logging.debug(" - Frequency: %s", freqConverter.freqToHz(args.freq))
-		logging.debug(" - Device: %s", args.device)
-		logging.debug(" - PPM Error: %s", args.error)
-		logging.debug(" - Squelch: %s", args.squelch)
-		logging.debug(" - Gain: %s", args.gain)
-
-		demodulation = ""
-		if "FMS" in args.demod:
-			demodulation += "-a FMSFSK "
-			logging.debug(" - Demod: FMS")
-		if "ZVEI" in args.demod:
-			demodulation += "-a ZVEI1 "
-			logging.debug(" - Demod: ZVEI")
-		if "POC512" in args.demod:
-			demodulation += "-a POCSAG512 "
-			logging.debug(" - Demod: POC512")
-		if "POC1200" in args.demod:
-			demodulation += "-a POCSAG1200 "
-			logging.debug(" - Demod: POC1200")
-		if "POC2400" in args.demod:
-			demodulation += "-a POCSAG2400 "
-			logging.debug(" - Demod: POC2400")
+		if args.replay:
+			logging.debug(" - Replay: %s (speed %s)", args.replay, args.speed)
+
+		if args.multichannel:
+			logging.debug(" - Multi channel mode: receivers from [Receivers]")
+		if args.wideband:
+			logging.debug(" - Wideband mode: channels from [WidebandChannels]")
+		if not args.multichannel and not args.wideband:
+			logging.debug(" - Frequency: %s", freqConverter.freqToHz(args.freq))
+			logging.debug(" - Device: %s", args.device)
+			logging.debug(" - PPM Error: %s", args.error)
+			logging.debug(" - Squelch: %s", args.squelch)
+			logging.debug(" - Gain: %s", args.gain)
+			for demod in args.demod:
+				logging.debug(" - Demod: %s", demod)
 
 		logging.debug(" - Use /var/log: %s", args.usevarlog)
 		logging.debug(" - Verbose Mode: %s", args.verbose)
@@ -227,6 +236,11 @@ try:
 			configHandler.checkConfig("POC")
 			configHandler.checkConfig("Plugins")
 			configHandler.checkConfig("Filters")
+			if args.multichannel:
+				configHandler.checkConfig("Receivers")
+			if args.wideband:
+				configHandler.checkConfig("Wideband")
+				configHandler.checkConfig("WidebandChannels")
 			#NMAHandler is outputed below
 	except:
 		# we couldn't work without config -> exit
@@ -234,6 +248,18 @@ try:
 		logging.debug("cannot read config file", exc_info=True)
 		exit(1)
 
+	#
+	# Build the typed snapshot of the config for the decoders and filters
+	#
+	try:
+		from includes import settings
+		settings.load()
+	except:
+		# we couldn't work without the settings -> exit
+		logging.critical("invalid option in config file")
+		logging.debug("invalid option in config file", exc_info=True)
+		exit(1)
+
 
 	#
 	# Set the loglevel and backupCount of the file handler
@@ -252,60 +278,115 @@ try:
 	# initialization was fine, continue with main program...
 
 	#
-	# Load plugins
+	# Start the metrics endpoint
 	#
 	try:
-		from includes import pluginLoader
-		pluginLoader.loadPlugins()
+		from includes import metricsServer
+		metricsServer.start()
 	except:
-		# we couldn't work without plugins -> exit
-		logging.critical("cannot load Plugins")
-		logging.debug("cannot load Plugins", exc_info=True)
-		exit(1)
+		# It's an error, but we could work without that stuff...
+		logging.error("cannot start metrics endpoint")
+		logging.debug("cannot start metrics endpoint", exc_info=True)
 
 	#
-	# Load filters
+	# Load plugins, filters, description lists and the doubleFilter_file
+	# they are needed not before the decoding, so they are loaded in parallel to the start of rtl_fm and multimon-ng
 	#
-	try:
-		if globalVars.config.getboolean("BOSWatch","useRegExFilter"):
-			from includes import regexFilter
-			regexFilter.loadFilters()
-	except:
-		# It's an error, but we could work without that stuff...
-		logging.error("cannot load filters")
-		logging.debug("cannot load filters", exc_info=True)
+	loaderResult = {"plugins": False}
+	def loadData():
+		"""
+		Load plugins, filters, description lists and the doubleFilter_file, runs in the loader thread
+
+		@return:    nothing (loaderResult["plugins"] is True if the plugins are loaded)
+		"""
+		#
+		# Load plugins
+		#
+		try:
+			from includes import pluginLoader
+			pluginLoader.loadPlugins()
+			loaderResult["plugins"] = True
+		except:
+			# we couldn't work without plugins -> exit after the loader thread
+			logging.critical("cannot load Plugins")
+			logging.debug("cannot load Plugins", exc_info=True)
+			return
+
+		#
+		# Load filters
+		#
+		try:
+			if globalVars.config.getboolean("BOSWatch","useRegExFilter"):
+				from includes import regexFilter
+				regexFilter.loadFilters()
+		except:
+			# It's an error, but we could work without that stuff...
+			logging.error("cannot load filters")
+			logging.debug("cannot load filters", exc_info=True)
+
+		#
+		# Load description lists
+		#
+		try:
+			if globalVars.config.getboolean("FMS","idDescribed") or globalVars.config.getboolean("ZVEI","idDescribed") or globalVars.config.getboolean("POC","idDescribed"):
+				from includes import descriptionList
+				descriptionList.loadDescriptionLists()
+		except:
+			# It's an error, but we could work without that stuff...
+			logging.error("cannot load description lists")
+			logging.debug("cannot load description lists", exc_info=True)
+
+		#
+		# Load the entries of the doubleFilter saved before the restart
+		#
+		try:
+			from includes import doubleFilter
+			doubleFilter.load()
+		except:
+			# It's an error, but we could work without that stuff...
+			logging.error("cannot load doubleFilter_file")
+			logging.debug("cannot load doubleFilter_file", exc_info=True)
+
+	loader = threading.Thread(target=loadData, name="loader")
+	loader.daemon = True
+	loader.start()
 
 	#
-	# Load description lists
+	# Create the receivers
 	#
 	try:
-		if globalVars.config.getboolean("FMS","idDescribed") or globalVars.config.getboolean("ZVEI","idDescribed") or globalVars.config.getboolean("POC","idDescribed"):
-			from includes import descriptionList
-			descriptionList.loadDescriptionLists()
+		from includes import receiver
+		if args.multichannel:
+			receivers += receiver.loadReceivers()
+		if args.wideband:
+			receivers.append(receiver.loadWideband())
+		if not args.multichannel and not args.wideband:
+			receivers = [receiver.Receiver("", args.device, args.freq, args.demod, args.error, args.squelch, args.gain)]
+		if not receivers:
+			raise ValueError("no receiver defined")
 	except:
-		# It's an error, but we could work without that stuff...
-		logging.error("cannot load description lists")
-		logging.debug("cannot load description lists", exc_info=True)
+		# we couldn't work without a receiver -> exit
+		logging.critical("cannot create receivers")
+		logging.debug("cannot create receivers", exc_info=True)
+		exit(1)
 
 	#
 	# Start rtl_fm
 	#
 	try:
-		if not args.test:
-			logging.debug("starting rtl_fm")
-			command = ""
-			if globalVars.config.has_option("BOSWatch","rtl_path"):
-				command = globalVars.config.get("BOSWatch","rtl_path")
-			command = command+"rtl_fm -d "+str(args.device)+" -f "+str(freqConverter.freqToHz(args.freq))+" -M fm -p "+str(args.error)+" -E DC -F 0 -l "+str(args.squelch)+" -g "+str(args.gain)+" -s 22050"
-			rtl_fm = subprocess.Popen(command.split(),
-					#stdin=rtl_fm.stdout,
-					stdout=subprocess.PIPE,
-					stderr=open(globalVars.log_path+"rtl_fm.log","a"),
-					shell=False)
-			# rtl_fm doesn't self-destruct, when an error occurs
-			# wait a moment to give the subprocess a chance to write the logfile
-			time.sleep(3)
-			checkSubprocesses.checkRTL()
+		if args.replay:
+			from includes import replayHandler
+			if not replayHandler.isCapture(args.replay):
+				for bosReceiver in receivers:
+					if bosReceiver.name:
+						bosReceiver.clearLogs()
+					bosReceiver.startReplay(args.replay, args.speed)
+			logging.warning("!!! Replay of %s: rtl_fm not started !!!", args.replay)
+		elif not args.test:
+			for bosReceiver in receivers:
+				if bosReceiver.name:
+					bosReceiver.clearLogs()
+				bosReceiver.startRTL()
 		else:
 			logging.warning("!!! Test-Mode: rtl_fm not started !!!")
 	except:
@@ -318,21 +399,11 @@ try:
 	# Start multimon
 	#
 	try:
-		if not args.test:
-			logging.debug("starting multimon-ng")
-			command = ""
-			if globalVars.config.has_option("BOSWatch","multimon_path"):
-				command = globalVars.config.get("BOSWatch","multimon_path")
-			command = command+"multimon-ng "+str(demodulation)+" -f alpha -t raw /dev/stdin - "
-			multimon_ng = subprocess.Popen(command.split(),
-				stdin=rtl_fm.stdout,
-				stdout=subprocess.PIPE,
-				stderr=open(globalVars.log_path+"multimon.log","a"),
-				shell=False)
-			# multimon-ng  doesn't self-destruct, when an error occurs
-			# wait a moment to give the subprocess a chance to write the logfile
-			time.sleep(3)
-			checkSubprocesses.checkMultimon()
+		if args.replay and replayHandler.isCapture(args.replay):
+			logging.warning("!!! Replay of a capture: multimon-ng not started !!!")
+		elif not args.test:
+			for bosReceiver in receivers:
+				bosReceiver.startMultimon()
 		else:
 			logging.warning("!!! Test-Mode: multimon-ng not started !!!")
 	except:
@@ -341,33 +412,87 @@ try:
 		logging.debug("cannot start multimon-ng", exc_info=True)
 		exit(1)
 
+	#
+	# Wait for plugins, filters, description lists and the doubleFilter_file
+	# multimon-ng is running, his output waits in the pipe
+	#
+	loader.join()
+	if not loaderResult["plugins"]:
+		# we couldn't work without plugins -> exit
+		exit(1)
+	logging.debug("ready for decoding after %.2f s", time.time() - startTime)
+
+	#
+	# Start the reload with the HUP signal or a changed config.ini or csv-file
+	#
+	try:
+		if not args.test:
+			from includes import reloadHandler
+			reloadHandler.start()
+	except:
+		# It's an error, but we could work without that stuff...
+		logging.error("cannot start reload thread")
+		logging.debug("cannot start reload thread", exc_info=True)
+
 	#
 	# Get decoded data from multimon-ng and call BOSWatch-decoder
 	#
-	if not args.test:
+	from includes import decoder
+	from includes import nativeDecoder
+	from includes import supervisor
+	if args.replay and replayHandler.isCapture(args.replay):
+		#
+		# replay the multimon-ng output with the captured timing
+		#
+		replayHandler.replayCapture(args.replay, args.speed, receivers[0].freq)
+
+	elif (globalVars.config.has_option("BOSWatch","useEventLoop") and globalVars.config.getboolean("BOSWatch","useEventLoop")) or args.multichannel or args.wideband or args.replay or nativeDecoder.getNativeDemods() or supervisor.isEnabled():
+		#
+		# read non-blocking with the event loop (needed for the native demodulators, the replay and the supervisor too)
+		#
+		from includes import eventLoop
+		from includes import doubleFilter
+		eventLoop.addTimer(1, doubleFilter.expireEntries)
+		if globalVars.config.getint("multicastAlarm", "multicastAlarm"):
+			from includes import multicastAlarm
+			eventLoop.addTimer(1, multicastAlarm.expireEntries)
+		if globalVars.config.has_option("BOSWatch","latencyLogInterval") and globalVars.config.getint("BOSWatch","latencyLogInterval"):
+			from includes import metrics
+			eventLoop.addTimer(globalVars.config.getint("BOSWatch","latencyLogInterval"), metrics.dump, inPipeline=False)
+		if not args.test:
+			if supervisor.isEnabled():
+				supervisor.start(receivers)
+			for bosReceiver in receivers:
+				if not supervisor.isEnabled():
+					eventLoop.addTimer(10, bosReceiver.checkHealth, inPipeline=False)
+				for (stream, freq) in bosReceiver.getStreams():
+					eventLoop.addStream(stream, freq)
+			logging.debug("start decoding")
+		else:
+			eventLoop.addStream(open(globalVars.script_path+"/citest/testdata.txt","r"), receivers[0].freq)
+			logging.debug("start testing")
+		eventLoop.run()
+		logging.debug("all streams closed")
+
+	elif not args.test:
 		logging.debug("start decoding")
 		while True:
-			decoded = str(multimon_ng.stdout.readline()) #Get line data from multimon stdout
-			from includes import decoder
-			decoder.decode(freqConverter.freqToHz(args.freq), decoded)
+			decoded = str(receivers[0].multimon_ng.stdout.readline()) #Get line data from multimon stdout
+			if not decoded:
+				# multimon-ng terminated (f.e. rtl_fm lost the stick) - enable supervise to restart it
+				logging.critical("multimon-ng terminated")
+				break
+			decoder.decode(receivers[0].freq, decoded)
 
 			# write multimon-ng raw data
-			if globalVars.config.getboolean("BOSWatch","writeMultimonRaw"):
-				try:
-					rawMmOut = open(globalVars.log_path+"mm_raw.txt", "a")
-					rawMmOut.write(decoded)
-				except:
-					logging.warning("cannot write raw multimon data")
-				finally:
-					rawMmOut.close()
+			decoder.writeRaw(decoded)
 	else:
 		logging.debug("start testing")
 		testFile = open(globalVars.script_path+"/citest/testdata.txt","r")
 		for testData in testFile:
 			if (len(testData.rstrip(' \t\n\r')) > 1) and ("#" not in testData[0]):
 				logging.info("Testdata: %s", testData.rstrip(' \t\n\r'))
-				from includes import decoder
-				decoder.decode(freqConverter.freqToHz(args.freq), testData)
+				decoder.decode(receivers[0].freq, testData)
 				#time.sleep(1)
 		logging.debug("test finished")
 
@@ -383,16 +508,11 @@ except:
 finally:
 	try:
 		logging.debug("BOSWatch shuting down")
-		if multimon_ng and multimon_ng.pid:
-			logging.debug("terminate multimon-ng (%s)", multimon_ng.pid)
-			multimon_ng.terminate()
-			multimon_ng.wait()
-			logging.debug("multimon-ng terminated")
-		if rtl_fm and rtl_fm.pid:
-			logging.debug("terminate rtl_fm (%s)", rtl_fm.pid)
-			rtl_fm.terminate()
-			rtl_fm.wait()
-			logging.debug("rtl_fm terminated")
+		for bosReceiver in receivers:
+			bosReceiver.stop()
+		if args.replay:
+			from includes import replayHandler
+			replayHandler.report()
 		logging.debug("exiting BOSWatch")
 	except:
 		logging.warning("failed in clean-up routine")
@@ -401,10 +521,16 @@ finally:
 	finally:
 		# Close Logging
 		logging.debug("close Logging")
-		# Waiting for all Threads to write there logs
-		if globalVars.config.getboolean("BOSWatch","processAlarmAsync") == True:
-			logging.debug("waiting 3s for threads...")
-			time.sleep(3)
+		# Waiting for all queued alarms and plugin lanes to write there logs
+		from includes import alarmHandler
+		alarmHandler.shutdown()
+		from includes import doubleFilter
+		doubleFilter.close()
+		# latency of all stages and plugins
+		from includes import metrics
+		metrics.dump()
+		from includes import metricsServer
+		metricsServer.stop()
 		logging.info("BOSWatch exit()")
 		logging.shutdown()
 		if nmaHandler:
@@ -13,9 +13,141 @@ Handler for the filter and plugins at an alarm
 import logging # Global logger
 import time    # timestamp
 
+import threading # lock for the alarm queue
+
 from includes import globalVars  # Global variables
+from includes import metrics  # latency of the stages
+from includes.workQueue import WorkQueue # bounded queue for async processing
 from copy import deepcopy # copy objects to avoid issues if the objects will be changed by the plugin's during runtime and during asynch/threaded processing 
 
+# local variables
+alarmQueue = None
+alarmQueueLock = threading.Lock()
+
+# one queue with one worker per plugin
+# ListStructure [pluginName] = WorkQueue
+pluginLanes = {}
+
+
+##
+#
+# create the alarm queue with his worker pool
+#
+def getAlarmQueue():
+	"""
+	Returns the queue for the async alarm processing
+	will be created with the first call
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    WorkQueue
+	@exception: Exception if creating the queue failed
+	"""
+	global alarmQueue
+	with alarmQueueLock:
+		if alarmQueue is None:
+			workers = 2
+			if globalVars.config.has_option("BOSWatch", "processAlarmWorkers"):
+				workers = globalVars.config.getint("BOSWatch", "processAlarmWorkers")
+			maxSize = 100
+			if globalVars.config.has_option("BOSWatch", "processAlarmQueueSize"):
+				maxSize = globalVars.config.getint("BOSWatch", "processAlarmQueueSize")
+			alarmQueue = WorkQueue("alarmQueue", processAlarm, workers=workers, maxSize=maxSize, overflow=getOverflow())
+			alarmQueue.start()
+	return alarmQueue
+
+
+##
+#
+# get the overflow handling of the queues
+#
+def getOverflow():
+	"""
+	Returns the overflow handling of the WorkQueue for processAlarmOverflow
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    block|dropOldest|dropExpendable
+	"""
+	overflow = "block"
+	if globalVars.config.has_option("BOSWatch", "processAlarmOverflow"):
+		overflow = globalVars.config.get("BOSWatch", "processAlarmOverflow")
+	if overflow == "dropFMS":
+		overflow = "dropExpendable"
+	return overflow
+
+
+##
+#
+# get the dispatch lane of a plugin
+#
+def getPluginLane(pluginName):
+	"""
+	Returns the queue of a plugin for the dispatch in parallel
+	will be created with the first call for this plugin
+
+	@type    pluginName: string
+	@param   pluginName: Name of the plugin
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    WorkQueue
+	@exception: Exception if creating the queue failed
+	"""
+	with alarmQueueLock:
+		if pluginName not in pluginLanes:
+			maxSize = 50
+			if globalVars.config.has_option("BOSWatch", "processPluginLaneSize"):
+				maxSize = globalVars.config.getint("BOSWatch", "processPluginLaneSize")
+			lane = WorkQueue("lane-"+pluginName, callPlugin, workers=1, maxSize=maxSize, overflow=getOverflow())
+			lane.start()
+			pluginLanes[pluginName] = lane
+		return pluginLanes[pluginName]
+
+
+##
+#
+# backlog of all plugin lanes
+#
+def getPluginLaneStats():
+	"""
+	Returns the counters of all plugin lanes
+
+	@return:    Python Dict [pluginName] = counters of the lane
+	"""
+	with alarmQueueLock:
+		lanes = pluginLanes.items()
+	return dict((pluginName, lane.getStats()) for pluginName, lane in lanes)
+
+
+##
+#
+# wait for the queued alarms and stop the workers
+#
+def shutdown(timeout=10):
+	"""
+	Process the waiting alarms and stop the worker pool
+
+	@type    timeout: float
+	@param   timeout: Maximum time to wait in seconds
+
+	@return:    nothing
+	"""
+	global alarmQueue
+	with alarmQueueLock:
+		queue = alarmQueue
+		alarmQueue = None
+	if queue is not None:
+		logging.debug("waiting for %s queued alarm(s)...", queue.depth())
+		queue.stop(timeout)
+	# the alarm queue is drained now, the plugin lanes get no new alarms
+	with alarmQueueLock:
+		lanes = pluginLanes.items()
+		pluginLanes.clear()
+	for pluginName, lane in lanes:
+		logging.debug("waiting for %s queued alarm(s) of %s...", lane.depth(), pluginName)
+		lane.stop(timeout)
+
 ##
 #
 # decide to run AlarmHandler sync or async
@@ -35,25 +167,27 @@ def processAlarmHandler(typ, freq, data):
 	@requires:  Configuration has to be set in the config.ini
 
 	@return:    nothing
-	@exception: Exception if starting a Thread failed
+	@exception: Exception if queueing the alarm failed
 	"""
-	if globalVars.config.getboolean("BOSWatch","processAlarmAsync") == True:
-		logging.debug("starting processAlarm async")
+	# the trace of the telegram goes with the alarm into the queue
+	metrics.mark("description")
+	trace = metrics.getTrace()
+	if globalVars.settings.BOSWatch.processAlarmAsync:
+		logging.debug("queue processAlarm async")
 		try:
-			from threading import Thread
-			Thread(target=processAlarm, args=(typ, freq, deepcopy(data))).start()
+			getAlarmQueue().put((typ, freq, deepcopy(data), trace), expendable=(typ == "FMS"))
 		except:
 			logging.error("Error in starting alarm processing async")
 			logging.debug("Error in starting alarm processing async", exc_info=True)
 	else:
-		processAlarm(typ, freq, data)
+		processAlarm(typ, freq, data, trace)
 
 
 ##
 #
 # main function for central filtering and calling the plugins
 #
-def processAlarm(typ, freq, data):
+def processAlarm(typ, freq, data, trace=None):
 	"""
 	Function to process filters and plugins at Alarm
 
@@ -63,6 +197,8 @@ def processAlarm(typ, freq, data):
 	@param   freq: frequency of the SDR Stick
 	@type    data: map of data (structure see readme.md in plugin folder)
 	@param   data: Contains the parameter
+	@type    trace: metrics.Trace
+	@param   trace: timestamps of the telegram (None if unknown)
 
 	@requires:  active plugins in pluginList
 
@@ -70,31 +206,73 @@ def processAlarm(typ, freq, data):
 	@exception: Exception if Alarm processing itself failed
 	"""
 	try:
+		if trace:
+			trace.mark("queue")
+		settings = globalVars.settings
 		logging.debug("[  ALARM  ]")
 		# timestamp, to make sure, that all plugins use the same time
 		data['timestamp'] = int(time.time())
+		pluginList = globalVars.pluginList.items()
+		# if enabled use RegEx-filter, all plugins are checked at once
+		if settings.BOSWatch.useRegExFilter:
+			from includes import regexFilter
+			filterStart = time.time()
+			allowedPlugins = regexFilter.getAllowedPlugins(typ, data, freq, [pluginName for pluginName, plugin in pluginList])
+			metrics.observe("regexFilter", time.time() - filterStart)
 		# Go to all plugins in pluginList
-		for pluginName, plugin in globalVars.pluginList.items():
-			# if enabled use RegEx-filter
-			if globalVars.config.getint("BOSWatch","useRegExFilter"):
-				from includes import regexFilter
-				if regexFilter.checkFilters(typ, data, pluginName, freq):
-					logging.debug("call Plugin: %s", pluginName)
-					try:
-						plugin.run(typ, freq, deepcopy(data))
-						logging.debug("return from: %s", pluginName)
-					except:
-						# call next plugin, if one has thrown an exception
-						pass
-			else: # RegEX filter off - call plugin directly
-				logging.debug("call Plugin: %s", pluginName)
-				try:
-					plugin.run(typ, freq, deepcopy(data))
-					logging.debug("return from: %s", pluginName)
-				except:
-					# call next plugin, if one has thrown an exception
-					pass
+		for pluginName, plugin in pluginList:
+			if settings.BOSWatch.useRegExFilter and pluginName not in allowedPlugins:
+				metrics.count("regex_filter_drops", (("type", typ), ("plugin", pluginName)))
+				continue
+			# every plugin in his own lane or one after another
+			if settings.BOSWatch.processPluginLanes:
+				logging.debug("queue Plugin: %s", pluginName)
+				getPluginLane(pluginName).put((pluginName, plugin, typ, freq, deepcopy(data), trace), expendable=(typ == "FMS"))
+			else:
+				callPlugin(pluginName, plugin, typ, freq, deepcopy(data), trace)
 		logging.debug("[END ALARM]")
 	except:
 		logging.error("Error in alarm processing")
 		logging.debug("Error in alarm processing", exc_info=True)
+
+
+##
+#
+# call the run() function of one plugin
+#
+def callPlugin(pluginName, plugin, typ, freq, data, trace=None):
+	"""
+	Function to call a single plugin
+	The run time is added to the histogram plugin.NAME.run, with a trace the time
+	since the alarm processing (plugin.NAME.wait) and since the pipe read (plugin.NAME.total) too
+
+	@type    pluginName: string
+	@param   pluginName: Name of the plugin
+	@type    plugin: module
+	@param   plugin: the loaded plugin
+	@type    typ:  string (FMS|ZVEI|POC)
+	@param   typ:  Typ of the dataset
+	@type    freq: string
+	@param   freq: frequency of the SDR Stick
+	@type    data: map of data (structure see readme.md in plugin folder)
+	@param   data: Contains the parameter
+	@type    trace: metrics.Trace
+	@param   trace: timestamps of the telegram (None if unknown)
+
+	@return:    nothing
+	@exception: none
+	"""
+	logging.debug("call Plugin: %s", pluginName)
+	runStart = time.time()
+	try:
+		plugin.run(typ, freq, data)
+		logging.debug("return from: %s", pluginName)
+	except:
+		# call next plugin, if one has thrown an exception
+		metrics.count("plugin_errors", (("plugin", pluginName),))
+	runEnd = time.time()
+	metrics.count("plugin_calls", (("plugin", pluginName),))
+	metrics.observe("plugin."+pluginName+".run", runEnd - runStart)
+	if trace:
+		metrics.observe("plugin."+pluginName+".wait", runStart - trace.last)
+		metrics.observe("plugin."+pluginName+".total", runEnd - trace.start)
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Channelizer for a wideband IQ stream (f.e. from rtl_sdr or a recorded IQ file)
+Each channel is mixed down, filtered and decimated by a polyphase filter bank
+and FM demodulated to 22050 Hz audio for multimon-ng.
+All channels are processed together with vectorized NumPy operations.
+
+@author: Bastian Schroll
+
+@requires: numpy
+"""
+
+import logging
+
+import numpy
+
+# audio sample rate expected by multimon-ng
+AUDIO_RATE = 22050
+
+
+def designLowpass(numTaps, cutoff):
+	"""
+	Design a FIR lowpass filter with the window method (Hamming window)
+
+	@type    numTaps: integer
+	@param   numTaps: Number of filter coefficients
+	@type    cutoff: float
+	@param   cutoff: Cutoff frequency relative to the sample rate (0..0.5)
+
+	@return:    numpy array with the coefficients
+	"""
+	n = numpy.arange(numTaps) - (numTaps - 1) / 2.0
+	taps = 2 * cutoff * numpy.sinc(2 * cutoff * n) * numpy.hamming(numTaps)
+	return taps / numpy.sum(taps)
+
+
+class Channelizer(object):
+	"""Polyphase channelizer with FM demodulation for several channels of one IQ stream"""
+
+	def __init__(self, sampleRate, centerFreq, channelFreqs, bandwidth=9000, tapsPerPhase=12):
+		"""
+		@type    sampleRate: integer
+		@param   sampleRate: Sample rate of the IQ stream, must be a multiple of 22050
+		@type    centerFreq: integer
+		@param   centerFreq: Center frequency of the IQ stream in Hz
+		@type    channelFreqs: list of integer
+		@param   channelFreqs: Frequencies of the channels in Hz
+		@type    bandwidth: integer
+		@param   bandwidth: Cutoff of the channel filter in Hz
+		@type    tapsPerPhase: integer
+		@param   tapsPerPhase: Length of each polyphase branch
+
+		@exception: ValueError if the sample rate or a channel is invalid
+		"""
+		if sampleRate % AUDIO_RATE:
+			raise ValueError("sample rate %s is no multiple of %s" % (sampleRate, AUDIO_RATE))
+		for freq in channelFreqs:
+			if abs(freq - centerFreq) > sampleRate / 2 - bandwidth:
+				raise ValueError("channel %s Hz is outside of the band" % freq)
+		self.sampleRate = sampleRate
+		self.decimation = sampleRate // AUDIO_RATE
+		self.channelFreqs = list(channelFreqs)
+
+		# polyphase branches: taps[p, d] = h[p*D + d]
+		numTaps = self.decimation * tapsPerPhase
+		self.taps = designLowpass(numTaps, float(bandwidth) / sampleRate).reshape(tapsPerPhase, self.decimation)
+		self.tapsPerPhase = tapsPerPhase
+
+		# phase increment of the mixer for each channel
+		offsets = numpy.array([centerFreq - freq for freq in channelFreqs], dtype=numpy.float64)
+		self.phaseStep = 2 * numpy.pi * offsets / sampleRate
+		self.phase = numpy.zeros(len(channelFreqs))
+
+		# state between the blocks
+		self.rest = numpy.zeros(0, dtype=numpy.uint8)
+		self.history = numpy.zeros((len(channelFreqs), (tapsPerPhase - 1) * self.decimation), dtype=numpy.complex64)
+		self.lastSample = numpy.ones(len(channelFreqs), dtype=numpy.complex64)
+		logging.debug("channelizer: %s channel(s), decimation %s, %s taps", len(channelFreqs), self.decimation, numTaps)
+
+
+	def process(self, iqBytes):
+		"""
+		Channelize a block of unsigned 8 bit IQ samples (rtl_sdr format)
+		Incomplete samples are kept for the next block.
+
+		@type    iqBytes: string
+		@param   iqBytes: interleaved I/Q bytes
+
+		@return:    numpy array [channel, sample] with 16 bit audio for each channel
+		"""
+		raw = numpy.concatenate((self.rest, numpy.frombuffer(iqBytes, dtype=numpy.uint8)))
+		# only use complete output samples (2 bytes per IQ sample, D samples per output)
+		usable = len(raw) // (2 * self.decimation) * 2 * self.decimation
+		self.rest = raw[usable:]
+		if not usable:
+			return numpy.zeros((len(self.channelFreqs), 0), dtype=numpy.int16)
+
+		iq = (raw[:usable].astype(numpy.float32) - 127.5) / 127.5
+		samples = (iq[0::2] + 1j * iq[1::2]).astype(numpy.complex64)
+		count = len(samples)
+
+		# mix all channels to baseband at once
+		n = numpy.arange(count)
+		phases = self.phase[:, None] + self.phaseStep[:, None] * n[None, :]
+		mixed = samples[None, :] * numpy.exp(1j * phases).astype(numpy.complex64)
+		self.phase = numpy.mod(self.phase + self.phaseStep * count, 2 * numpy.pi)
+
+		# polyphase decimation: y[m] = sum_p sum_d h[p*D+d] * x[(m-p)*D + D-1-d]
+		buffered = numpy.concatenate((self.history, mixed), axis=1)
+		self.history = buffered[:, -self.history.shape[1]:] if self.history.shape[1] else self.history
+		frames = buffered.reshape(len(self.channelFreqs), -1, self.decimation)[:, :, ::-1]
+		outputs = count // self.decimation
+		baseband = numpy.zeros((len(self.channelFreqs), outputs), dtype=numpy.complex64)
+		for p in range(self.tapsPerPhase):
+			start = self.tapsPerPhase - 1 - p
+			baseband += numpy.dot(frames[:, start:start + outputs, :], self.taps[p])
+
+		# FM demodulation with the phase difference of two samples
+		previous = numpy.concatenate((self.lastSample[:, None], baseband[:, :-1]), axis=1)
+		self.lastSample = baseband[:, -1]
+		audio = numpy.angle(baseband * numpy.conj(previous))
+		return numpy.clip(audio * (16384 / numpy.pi), -32768, 32767).astype(numpy.int16)
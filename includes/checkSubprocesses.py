@@ -9,46 +9,117 @@ Used in boswatch.py at startup and designated for watching-service
 """
 
 import logging
+import os
+import time
 
 from includes import globalVars  # Global variables
 
+# error messages in the logfiles of the subprocesses
+# rtl_fm and rtl_sdr report a lost USB device with transfer errors
+RTL_ERRORS = ("exiting", "Failed to open", "cb transfer status", "Failed to submit transfer", "No supported devices found")
+MULTIMON_ERRORS = ("invalid", "error")
 
-def checkRTL():
+# messages of the subprocesses when they are ready
+# rtl_fm and rtl_sdr have opened the stick and tuned the frequency, multimon-ng lists the demodulators
+RTL_READY = ("Tuned to",)
+MULTIMON_READY = ("Enabled demodulators",)
+
+
+def findError(logFile, patterns, offset=0):
 	"""
-	check startup of rtl_fm
+	Search the logfile of a subprocess for an error message
+
+	@type    logFile: string
+	@param   logFile: name of the logfile in the log_path
+	@type    patterns: tuple
+	@param   patterns: error messages to search for
+	@type    offset: integer
+	@param   offset: search only after this position (the end of the last search)
 
-	@exception: OSError when rtl_fm returns an error
-	@exception: Exception when checkRTL throws an unexpected error
+	@return:    (line with the error or None, new offset)
+	@exception: IOError if the logfile cannot be read
 	"""
-	try:
-		rtlLog = open(globalVars.log_path+"rtl_fm.log","r").read()
-		if ("exiting" in rtlLog) or  ("Failed to open" in rtlLog):
-			logging.debug("\n%s", rtlLog)
-			raise OSError("starting rtl_fm returns an error")
-	except OSError:
-		raise
-	except:
-		# we couldn't work without rtl_fm
-		logging.critical("cannot check rtl_fm.log")
-		logging.debug("cannot check rtl_fm.log", exc_info=True)
-		raise
+	with open(globalVars.log_path+logFile, "r") as log:
+		if offset > os.fstat(log.fileno()).st_size:
+			# the logfile was cleared
+			offset = 0
+		log.seek(offset)
+		content = log.read()
+	# an unfinished line will be searched again next time
+	end = content.rfind("\n") + 1
+	for line in content[:end].splitlines():
+		for pattern in patterns:
+			if pattern in line:
+				return (line.strip(), offset + end)
+	return (None, offset + end)
 
-def checkMultimon():
+
+def waitReady(name, process, logFile, readyPatterns, errorPatterns, offset=0, timeout=10):
 	"""
-	check startup of multimon-ng
+	Wait until a subprocess reports in his logfile that it is ready
+
+	@type    name: string
+	@param   name: name of the subprocess (for the log)
+	@type    process: subprocess.Popen
+	@param   process: the started subprocess
+	@type    logFile: string
+	@param   logFile: name of the logfile of the subprocess in the log_path
+	@type    readyPatterns: tuple
+	@param   readyPatterns: messages of the ready subprocess
+	@type    errorPatterns: tuple
+	@param   errorPatterns: error messages
+	@type    offset: integer
+	@param   offset: check only the messages after this position (restart)
+	@type    timeout: float
+	@param   timeout: maximum time to wait for the ready message in seconds,
+	                  without error or exit the subprocess is accepted after this time
+
+	@return:    seconds until the subprocess was ready
+	@exception: OSError when the subprocess returns an error or terminates
+	"""
+	start = time.time()
+	while True:
+		with open(globalVars.log_path+logFile, "r") as log:
+			log.seek(offset)
+			content = log.read()
+		if [pattern for pattern in errorPatterns if pattern in content]:
+			logging.debug("\n%s", content)
+			raise OSError("starting %s returns an error" % name)
+		if process.poll() is not None:
+			logging.debug("\n%s", content)
+			raise OSError("%s terminated at startup with %s" % (name, process.returncode))
+		if [pattern for pattern in readyPatterns if pattern in content]:
+			logging.debug("%s ready after %.3f s", name, time.time() - start)
+			return time.time() - start
+		if time.time() - start > timeout:
+			logging.warning("%s didn't report ready within %s s - continue without", name, timeout)
+			return time.time() - start
+		time.sleep(0.01)
+
+
+def getStartupTimeout():
+	"""
+	Returns the maximum time to wait for a subprocess at the startup (startupTimeout)
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    seconds
+	"""
+	if globalVars.config.has_option("BOSWatch", "startupTimeout"):
+		return globalVars.config.getfloat("BOSWatch", "startupTimeout")
+	return 10
+
+
+def getLogSize(logFile):
+	"""
+	Returns the size of the logfile of a subprocess (0 if it doesn't exist)
+
+	@type    logFile: string
+	@param   logFile: name of the logfile in the log_path
 
-	@exception: OSError when multimon-ng returns an error
-	@exception: Exception when checkMultimon throws an unexpected error
+	@return:    integer
 	"""
 	try:
-		multimonLog = open(globalVars.log_path+"multimon.log","r").read()
-		if ("invalid" in multimonLog) or ("error" in multimonLog):
-			logging.debug("\n%s", multimonLog)
-			raise OSError("starting multimon-ng returns an error")
+		return os.path.getsize(globalVars.log_path+logFile)
 	except OSError:
-		raise
-	except:
-		# we couldn't work without multimon-ng
-		logging.critical("cannot check multimon.log")
-		logging.debug("cannot check multimon.log", exc_info=True)
-		raise
+		return 0
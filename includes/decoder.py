@@ -10,8 +10,23 @@ Search for decode string and call the right decoder function
 """
 
 import logging # Global logger
+import threading
+import time    # timestamp of the raw data
 
-def decode(freq, decoded):
+from includes import globalVars  # Global variables
+from includes import metrics  # latency of the stages
+
+#
+# decoded telegrams for each type (multimon-ng and native)
+#
+telegrams = {"FMS": 0, "ZVEI": 0, "POC": 0}
+
+#
+# held while a telegram is decoded, the reload swaps the config and lists between two telegrams
+#
+decodeLock = threading.Lock()
+
+def decode(freq, decoded, readTime=None):
 	"""
 	Search for decode string and call the right decoder function
 
@@ -19,31 +34,97 @@ def decode(freq, decoded):
 	@param   freq: frequency of the SDR Stick
 	@type    decoded: string
 	@param   decoded: RAW Information from Multimon-NG
+	@type    readTime: float
+	@param   readTime: timestamp of the read from the pipe (None = now)
 
 	@return:    nothing
 	@exception: Exception if decoder file call failed
 	"""
-	try:
-		# FMS Decoder Section
-		# check FMS: -> check CRC -> validate -> check double alarm -> log
-		if "FMS:" in decoded:
-			logging.debug("received FMS")
-			from includes.decoders import fms
-			fms.decode(freq, decoded)
-
-		# ZVEI Decoder Section
-		# check ZVEI: -> validate -> check double alarm -> log
-		elif "ZVEI1:" in decoded:
-			logging.debug("received ZVEI")
-			from includes.decoders import zvei
-			zvei.decode(freq, decoded)
-
-		# POCSAG Decoder Section
-		# check POCSAG -> validate -> check double alarm -> log
-		elif "POCSAG512:" in decoded or "POCSAG1200:" in decoded or "POCSAG2400:" in decoded:
-			logging.debug("received POCSAG")
-			from includes.decoders import poc
-			poc.decode(freq, decoded)
-
-	except:
-		logging.exception("cannot start decoder")
+	with decodeLock:
+		try:
+			metrics.startTrace(readTime)
+			# FMS Decoder Section
+			# check FMS: -> check CRC -> validate -> check double alarm -> log
+			if "FMS:" in decoded:
+				logging.debug("received FMS")
+				telegrams["FMS"] += 1
+				metrics.count("telegrams", (("type", "FMS"), ("bitrate", "1200")))
+				from includes.decoders import fms
+				fms.decode(freq, decoded)
+
+			# ZVEI Decoder Section
+			# check ZVEI: -> validate -> check double alarm -> log
+			elif "ZVEI1:" in decoded:
+				logging.debug("received ZVEI")
+				telegrams["ZVEI"] += 1
+				metrics.count("telegrams", (("type", "ZVEI"), ("bitrate", "")))
+				from includes.decoders import zvei
+				zvei.decode(freq, decoded)
+
+			# POCSAG Decoder Section
+			# check POCSAG -> validate -> check double alarm -> log
+			elif "POCSAG512:" in decoded or "POCSAG1200:" in decoded or "POCSAG2400:" in decoded:
+				logging.debug("received POCSAG")
+				telegrams["POC"] += 1
+				for bitrate in ("512", "1200", "2400"):
+					if "POCSAG"+bitrate+":" in decoded:
+						metrics.count("telegrams", (("type", "POC"), ("bitrate", bitrate)))
+				from includes.decoders import poc
+				poc.decode(freq, decoded)
+
+		except:
+			logging.exception("cannot start decoder")
+
+
+def decodeNative(typ, args, readTime=None):
+	"""
+	Call the process function of the right decoder for a telegram of a native demodulator
+
+	@type    typ: string
+	@param   typ: Typ of the telegram (ZVEI|POC)
+	@type    args: tuple
+	@param   args: Arguments for the process function (frequency first)
+	@type    readTime: float
+	@param   readTime: timestamp of the read of the audio block (None = now)
+
+	@return:    nothing
+	"""
+	with decodeLock:
+		try:
+			metrics.startTrace(readTime)
+			logging.debug("received native %s", typ)
+			telegrams[typ] += 1
+			# the bitrate of POCSAG follows the frequency
+			metrics.count("telegrams", (("type", typ), ("bitrate", str(args[1]) if typ == "POC" else "")))
+			if typ == "ZVEI":
+				from includes.decoders import zvei
+				zvei.process(*args)
+			elif typ == "POC":
+				from includes.decoders import poc
+				poc.process(*args)
+		except:
+			logging.exception("cannot start decoder")
+
+
+def writeRaw(decoded):
+	"""
+	Write the multimon-ng raw data into mm_raw.txt (if writeMultimonRaw is enabled)
+	With writeMultimonRawTime each line starts with the timestamp, needed for a timed replay
+
+	@type    decoded: string
+	@param   decoded: RAW Information from Multimon-NG
+
+	@return:    nothing
+	"""
+	settings = globalVars.settings
+	if settings.BOSWatch.writeMultimonRaw:
+		try:
+			rawMmOut = open(globalVars.log_path+"mm_raw.txt", "a")
+			if settings.BOSWatch.writeMultimonRawTime:
+				rawMmOut.write("%.3f %s" % (time.time(), decoded))
+			else:
+				rawMmOut.write(decoded)
+		except:
+			logging.warning("cannot write raw multimon data")
+		finally:
+			rawMmOut.close()
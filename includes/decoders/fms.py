@@ -14,6 +14,12 @@ import re      # Regex for validation
 
 from includes import globalVars  # Global variables
 from includes import doubleFilter  # double alarm filter
+from includes import metrics  # counters for the metrics endpoint
+
+# fields of the multimon-ng line, the spaces between them may change with the version of multimon-ng
+# FMS: 43f314170000 (9=Rotkreuz       3=Bayern 1         Ort 0x25=037FZG  7141Status  3=Einsatz Ab     0=FZG->LST 2=I  (ohneNA,ohneSIGNAL)) CRC correct
+FMS_LINE = re.compile(r"FMS:\s*\w+\s*\((\w)=[^=]*\s(\w)=[^=]*Ort 0x(\w\w)=\w*?FZG\s*(\w{4})Status\s*(\w)=[^=]*\s([01])=(\S+)\s+\w=(\w+)")
+FMS_ID = re.compile("[0-9a-f]{8}[0-9a-f]{1}[01]{1}")
 
 ##
 #
@@ -35,19 +41,18 @@ def decode(freq, decoded):
 	@exception: Exception if FMS decode failed
 	"""
 	try:
-		fms_service = decoded[19]            # Organisation
-		fms_country = decoded[36]            # Bundesland
-		fms_location = decoded[61:63]        # Ort
-		fms_vehicle = decoded[72:76]         # Fahrzeug
-		fms_status = decoded[84]             # Status
-		fms_direction = decoded[101]         # Richtung
-		fms_directionText = decoded[103:110] # Richtung (Text)
-		fms_tsi = decoded[114:117]           # Taktische Kruzinformation
+		fields = FMS_LINE.search(decoded)
+		if not fields:
+			logging.warning("No valid FMS: %s", decoded.strip())
+			metrics.count("invalid_ids", (("type", "FMS"),))
+			return
+		# Organisation, Bundesland, Ort, Fahrzeug, Status, Richtung, Richtung (Text), Taktische Kurzinformation
+		(fms_service, fms_country, fms_location, fms_vehicle, fms_status, fms_direction, fms_directionText, fms_tsi) = fields.groups()
 
 		proceed = True # no CRC-check required - proceed
 
 		# shall we use the CRC-check?
-		if (globalVars.config.getboolean("FMS", "CheckCRC")):
+		if globalVars.settings.FMS.CheckCRC:
 			if "CRC correct" not in decoded:
 				# if CRC must be checked and is not correct - dont proceed
 				proceed = False
@@ -55,13 +60,13 @@ def decode(freq, decoded):
 		if (proceed == True):
 			fms_id = fms_service+fms_country+fms_location+fms_vehicle+fms_status+fms_direction # build FMS id
 			# if FMS is valid
-			if re.search("[0-9a-f]{8}[0-9a-f]{1}[01]{1}", fms_id):
+			if FMS_ID.search(fms_id):
 				# check for double alarm
 				if doubleFilter.checkID("FMS", fms_id):
 					logging.info("FMS:%s Status:%s Richtung:%s TSI:%s", fms_id[0:8], fms_status, fms_direction, fms_tsi)
 					data = {"fms":fms_id[0:8], "status":fms_status, "direction":fms_direction, "directionText":fms_directionText, "tsi":fms_tsi, "description":fms_id[0:8]}
 					# If enabled, look up description
-					if globalVars.config.getint("FMS", "idDescribed"):
+					if globalVars.settings.FMS.idDescribed:
 						from includes import descriptionList
 						data["description"] = descriptionList.getDescription("FMS", fms_id[0:8])
 					# processing the alarm
@@ -75,8 +80,10 @@ def decode(freq, decoded):
 				doubleFilter.newEntry(fms_id)
 			else:
 				logging.warning("No valid FMS: %s", fms_id)
+				metrics.count("invalid_ids", (("type", "FMS"),))
 		else:
 			logging.warning("FMS CRC incorrect")
+			metrics.count("crc_failures", (("type", "FMS"),))
 	except:
 		logging.error("error while decoding")
 		logging.debug("error while decoding", exc_info=True)
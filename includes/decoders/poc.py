@@ -15,6 +15,15 @@ import re      # Regex for validation
 
 from includes import globalVars  # Global variables
 from includes import doubleFilter  # double alarm filter
+from includes import metrics  # counters for the metrics endpoint
+
+# fields of the multimon-ng line, the spaces between them may change with the version of multimon-ng
+# POCSAG1200: Address: 1234567  Function: 1  Alpha:   text (Numeric: with pocsagMode numeric or auto)
+POC_LINE = re.compile(r"POCSAG(512|1200|2400):\s*Address:\s*(\S+)\s+Function:\s*(\S)(?:.*?(?:Alpha|Numeric):(.*))?")
+# control characters of multimon-ng in the text
+POC_CONTROL = re.compile("<NUL>|<NUL|< NUL>|<EOT>")
+POC_ID = re.compile("[0-9]{7}")
+POC_SUB = re.compile("[1-4]{1}")
 
 ##
 #
@@ -35,43 +44,44 @@ def isAllowed(poc_id):
 
 	allowed = 0
 	has_geo = False
+	settings = globalVars.settings
 
 	# 1.) If allowed RICs is set, only they will path,
 	#       If RIC is the right one return True, else False
-	if globalVars.config.get("POC", "allow_ric"):
-		if poc_id in globalVars.config.get("POC", "allow_ric"):
+	if settings.POC.allow_ric:
+		if poc_id in settings.POC.allow_ric:
 			logging.info("RIC %s is allowed", poc_id)
 			return True
 		else:
 			logging.info("RIC %s is not in the allowed list", poc_id)
 			allowed = 0
 	# 2.) If denied RIC, return False
-	if poc_id in globalVars.config.get("POC", "deny_ric"):
+	if poc_id in settings.POC.deny_ric:
 		logging.info("RIC %s is denied by config.ini", poc_id)
 		return False # RIC is denied - strongest way to block
 	# 3.) Check Range, return False if outside def. range
-	if globalVars.config.getint("POC", "filter_range_start") < int(poc_id) < globalVars.config.getint("POC", "filter_range_end"):
+	if poc_id in settings.POC.filter_ranges:
 		logging.info("RIC %s in between filter range", poc_id)
 		return True
 	else:
 		logging.info("RIC %s out of filter range", poc_id)
 		allowed = 0
 	# 4.) Implementation for net identifiers
-	if globalVars.config.get("POC", "netIdent_ric"):
-		if poc_id in globalVars.config.get("POC", "netIdent_ric"):
+	if settings.POC.netIdent_ric:
+		if poc_id in settings.POC.netIdent_ric:
 			logging.info("RIC %s as net identifier", poc_id)
 			return True
 		else:
 			allowed = 0
 	# 5.) Implementation for multicastAlarm
-	if globalVars.config.get("multicastAlarm", "multicastAlarm_delimiter_ric"):
-		if poc_id in globalVars.config.get("multicastAlarm", "multicastAlarm_delimiter_ric"):
+	if settings.multicastAlarm.multicastAlarm_delimiter_ric:
+		if poc_id in settings.multicastAlarm.multicastAlarm_delimiter_ric:
 			logging.info("RIC %s as multicastAlarm delimiter", poc_id)
 			return True
 		else:
 			allowed = 0
-	if globalVars.config.get("multicastAlarm", "multicastAlarm_ric"):
-		if poc_id in globalVars.config.get("multicastAlarm", "multicastAlarm_ric"):
+	if settings.multicastAlarm.multicastAlarm_ric:
+		if poc_id in settings.multicastAlarm.multicastAlarm_ric:
 			logging.info("RIC %s as multicastAlarm message", poc_id)
 			return True
 		else:
@@ -83,11 +93,11 @@ def isAllowed(poc_id):
 ##
 #
 # POCSAG decoder function
-# validate -> check double alarm -> log
+# extract the fields of the multimon-ng string
 #
 def decode(freq, decoded):
 	"""
-	Export POCSAG information from Multimon-NG string and call alarmHandler.processAlarmHandler()
+	Export POCSAG information from Multimon-NG string and call process()
 
 	@type    freq: string
 	@param   freq: frequency of the SDR Stick
@@ -99,105 +109,127 @@ def decode(freq, decoded):
 	@return:    nothing
 	@exception: Exception if POCSAG decode failed
 	"""
-	has_geo = False
-	
 	try:
-		bitrate = 0
-
-		if "POCSAG512:" in decoded:
-			bitrate = 512
-			poc_id = decoded[20:27].replace(" ", "").zfill(7)
-			poc_sub = str(int(decoded[39])+1)
-
-		elif "POCSAG1200:" in decoded:
-			bitrate = 1200
-			poc_id = decoded[21:28].replace(" ", "").zfill(7)
-			poc_sub = str(int(decoded[40])+1)
-
-		elif "POCSAG2400:" in decoded:
-			bitrate = 2400
-			poc_id = decoded[21:28].replace(" ", "").zfill(7)
-			poc_sub = str(int(decoded[40])+1)
-
-		if bitrate is 0:
+		fields = POC_LINE.search(decoded)
+		if not fields:
 			logging.warning("POCSAG Bitrate not found")
 			logging.debug(" - (%s)", decoded)
 		else:
+			(bitrate, poc_id, poc_sub, poc_text) = fields.groups()
+			bitrate = int(bitrate)
 			logging.debug("POCSAG Bitrate: %s", bitrate)
+			poc_id = poc_id.zfill(7)
+			poc_sub = str(int(poc_sub)+1)
 
-			if "Alpha:" in decoded: #check if there is a text message
-                		poc_text = decoded.split('Alpha:   ')[1].strip().replace('<NUL><NUL>','').replace('<NUL>','').replace('<NUL','').replace('< NUL>','').replace('<EOT>','').strip()
-                		if globalVars.config.getint("POC","geo_enable"):
-                    			try:
-                        			logging.debug("Using %s to find geo-tag in %s", globalVars.config.get("POC","geo_format"),poc_text)
-                        			m = re.search(globalVars.config.get("POC","geo_format"),poc_text)
-                        			if m:
-                            				logging.debug("Found geo-tag in message, parsing...")
-                            				has_geo = True
-                            				geo_order = globalVars.config.get("POC","geo_order").split(',')
-							if geo_order[0].lower == "lon":
-								lat = m.group(1) + "." + m.group(2)
-								lon = m.group(3) + "." + m.group(4)
-							else:
-								lon = m.group(1) + "." + m.group(2)
-								lat = m.group(3) + "." + m.group(4)
-								logging.debug("Finished parsing geo; lon: %s, lat: %s", lon, lat)
-						else:
-							logging.debug("No geo-tag found")
-							has_geo = False
-					except:
-						has_geo = False
-						logging.error("Exception parsing geo-information",exc_info=true)
-				else:
-					has_geo = False
+			if poc_text is not None: #check if there is a text message
+				poc_text = POC_CONTROL.sub("", poc_text.strip()).strip()
 			else:
 				poc_text = ""
-			if re.search("[0-9]{7}", poc_id) and re.search("[1-4]{1}", poc_sub): #if POC is valid
-				if isAllowed(poc_id):
-
-					# check for double alarm
-					if doubleFilter.checkID("POC", poc_id+poc_sub, poc_text):
-						data = {"ric":poc_id, "function":poc_sub, "msg":poc_text, "bitrate":bitrate, "description":poc_id, "has_geo":has_geo}
-						if has_geo == True:
-							data["lon"] = lon
-							data["lat"] = lat
-						# Add function as character a-d to dataset
-						data["functionChar"] = data["function"].replace("1", "a").replace("2", "b").replace("3", "c").replace("4", "d")
-						data["ricFuncChar"] = data["ric"] + data["functionChar"]
-
-						logging.info("POCSAG%s: %s %s %s ", data["bitrate"], data["ric"], data["function"], data["msg"])
-
-						# If enabled, look up description
-						if globalVars.config.getint("POC", "idDescribed"):
-							from includes import descriptionList
-							data["description"] = descriptionList.getDescription("POC", data["ric"]+data["functionChar"])
-
-						# multicastAlarm processing if enabled and a message without text or delimiter RIC or netIdent_ric received
-						if globalVars.config.getint("multicastAlarm", "multicastAlarm") and data["ric"] != globalVars.config.get("POC", "netIdent_ric") and (data["msg"] == "" or data["ric"] in globalVars.config.get("multicastAlarm", "multicastAlarm_delimiter_ric")):
-							logging.debug(" - multicastAlarm without msg")
-							from includes import multicastAlarm
-							multicastAlarm.newEntrymultiList(data)
-
-						# multicastAlarm processing if enabled and alarm message has been received
-						elif globalVars.config.getint("multicastAlarm", "multicastAlarm") and data["msg"] != "" and data["ric"] in globalVars.config.get("multicastAlarm", "multicastAlarm_ric"):
-							logging.debug(" - multicastAlarm with message")
-							from includes import multicastAlarm
-							multicastAlarm.multicastAlarmExec(freq, data)
-
-						else:
-							# processing the alarm
-							try:
-								from includes import alarmHandler
-								alarmHandler.processAlarmHandler("POC", freq, data)
-							except:
-								logging.error("processing alarm failed")
-								logging.debug("processing alarm failed", exc_info=True)
-					# in every time save old data for double alarm
-					doubleFilter.newEntry(poc_id+poc_sub, poc_text)
-				else:
-					logging.debug("POCSAG%s: %s is not allowed", bitrate, poc_id)
-			else:
-				logging.warning("No valid POCSAG%s RIC: %s SUB: %s", bitrate, poc_id, poc_sub)
+			process(freq, bitrate, poc_id, poc_sub, poc_text)
 	except:
 		logging.error("error while decoding")
 		logging.debug("error while decoding", exc_info=True)
+
+
+##
+#
+# POCSAG process function
+# validate -> check double alarm -> log
+#
+def process(freq, bitrate, poc_id, poc_sub, poc_text):
+	"""
+	Process a POCSAG telegram and call alarmHandler.processAlarmHandler()
+	The telegram comes from multimon-ng (see decode()) or from the native demodulator
+
+	@type    freq: string
+	@param   freq: frequency of the SDR Stick
+	@type    bitrate: integer
+	@param   bitrate: Bitrate of the telegram (512|1200|2400)
+	@type    poc_id: string
+	@param   poc_id: RIC with 7 digits
+	@type    poc_sub: string
+	@param   poc_sub: Function/Sub-RIC (1-4)
+	@type    poc_text: string
+	@param   poc_text: cleaned message text ("" if there is no message)
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	@exception: Exception if POCSAG processing failed
+	"""
+	has_geo = False
+	settings = globalVars.settings
+
+	try:
+		if poc_text and settings.POC.geo_enable:
+			try:
+				logging.debug("Using %s to find geo-tag in %s", settings.POC.geo_format,poc_text)
+				m = settings.POC.geo_regex.search(poc_text)
+				if m:
+					logging.debug("Found geo-tag in message, parsing...")
+					has_geo = True
+					geo_order = settings.POC.geo_order
+					if geo_order[0].lower == "lon":
+						lat = m.group(1) + "." + m.group(2)
+						lon = m.group(3) + "." + m.group(4)
+					else:
+						lon = m.group(1) + "." + m.group(2)
+						lat = m.group(3) + "." + m.group(4)
+						logging.debug("Finished parsing geo; lon: %s, lat: %s", lon, lat)
+				else:
+					logging.debug("No geo-tag found")
+					has_geo = False
+			except:
+				has_geo = False
+				logging.error("Exception parsing geo-information",exc_info=True)
+
+		if POC_ID.search(poc_id) and POC_SUB.search(poc_sub): #if POC is valid
+			if isAllowed(poc_id):
+
+				# check for double alarm
+				if doubleFilter.checkID("POC", poc_id+poc_sub, poc_text):
+					data = {"ric":poc_id, "function":poc_sub, "msg":poc_text, "bitrate":bitrate, "description":poc_id, "has_geo":has_geo}
+					if has_geo == True:
+						data["lon"] = lon
+						data["lat"] = lat
+					# Add function as character a-d to dataset
+					data["functionChar"] = data["function"].replace("1", "a").replace("2", "b").replace("3", "c").replace("4", "d")
+					data["ricFuncChar"] = data["ric"] + data["functionChar"]
+
+					logging.info("POCSAG%s: %s %s %s ", data["bitrate"], data["ric"], data["function"], data["msg"])
+
+					# If enabled, look up description
+					if settings.POC.idDescribed:
+						from includes import descriptionList
+						data["description"] = descriptionList.getDescription("POC", data["ric"]+data["functionChar"])
+
+					# multicastAlarm processing if enabled and a message without text or delimiter RIC or netIdent_ric received
+					if settings.multicastAlarm.multicastAlarm and data["ric"] not in settings.POC.netIdent_ric and (data["msg"] == "" or data["ric"] in settings.multicastAlarm.multicastAlarm_delimiter_ric):
+						logging.debug(" - multicastAlarm without msg")
+						from includes import multicastAlarm
+						multicastAlarm.newEntrymultiList(data)
+
+					# multicastAlarm processing if enabled and alarm message has been received
+					elif settings.multicastAlarm.multicastAlarm and data["msg"] != "" and data["ric"] in settings.multicastAlarm.multicastAlarm_ric:
+						logging.debug(" - multicastAlarm with message")
+						from includes import multicastAlarm
+						multicastAlarm.multicastAlarmExec(freq, data)
+
+					else:
+						# processing the alarm
+						try:
+							from includes import alarmHandler
+							alarmHandler.processAlarmHandler("POC", freq, data)
+						except:
+							logging.error("processing alarm failed")
+							logging.debug("processing alarm failed", exc_info=True)
+				# in every time save old data for double alarm
+				doubleFilter.newEntry(poc_id+poc_sub, poc_text)
+			else:
+				logging.debug("POCSAG%s: %s is not allowed", bitrate, poc_id)
+		else:
+			logging.warning("No valid POCSAG%s RIC: %s SUB: %s", bitrate, poc_id, poc_sub)
+			metrics.count("invalid_ids", (("type", "POC"),))
+	except:
+		logging.error("error while processing")
+		logging.debug("error while processing", exc_info=True)
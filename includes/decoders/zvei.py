@@ -14,6 +14,11 @@ import re      # Regex for validation
 
 from includes import globalVars  # Global variables
 from includes import doubleFilter  # double alarm filter
+from includes import metrics  # counters for the metrics endpoint
+
+# code of the multimon-ng line (ZVEI1: 12345)
+ZVEI_LINE = re.compile(r"ZVEI1:\s*(\S{0,5})")
+ZVEI_ID = re.compile("[0-9]{5}")
 
 ##
 #
@@ -40,11 +45,11 @@ def removeE(zvei):
 ##
 #
 # ZVEI decoder function
-# validate -> check double alarm -> log
+# extract the code of the multimon-ng string
 #
 def decode(freq, decoded):
 	"""
-	Export ZVEI Information from Multimon-NG RAW String and call alarmHandler.processAlarmHandler()
+	Export ZVEI Information from Multimon-NG RAW String and call process()
 
 	@type    freq: string
 	@param   freq: frequency of the SDR Stick
@@ -57,15 +62,41 @@ def decode(freq, decoded):
 	@exception: Exception if ZVEI decode failed
 	"""
 	try:
-		zvei_id = decoded[7:12]    # ZVEI Code
+		zvei_id = ZVEI_LINE.search(decoded).group(1) # ZVEI Code
 		zvei_id = removeE(zvei_id) # remove E (repeated tone)
-		if re.search("[0-9]{5}", zvei_id): # if ZVEI is valid
+		process(freq, zvei_id)
+	except:
+		logging.error("error while decoding")
+		logging.debug("error while decoding", exc_info=True)
+
+##
+#
+# ZVEI process function
+# validate -> check double alarm -> log
+#
+def process(freq, zvei_id):
+	"""
+	Process a ZVEI code and call alarmHandler.processAlarmHandler()
+	The code comes from multimon-ng (see decode()) or from the native decoder
+
+	@type    freq: string
+	@param   freq: frequency of the SDR Stick
+	@type    zvei_id: string
+	@param   zvei_id: ZVEI code without repeat tone
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	@exception: Exception if ZVEI processing failed
+	"""
+	try:
+		if ZVEI_ID.search(zvei_id): # if ZVEI is valid
 			# check for double alarm
 			if doubleFilter.checkID("ZVEI", zvei_id):
 				logging.info("5-Ton: %s", zvei_id)
 				data = {"zvei":zvei_id, "description":zvei_id}
 				# If enabled, look up description
-				if globalVars.config.getint("ZVEI", "idDescribed"):
+				if globalVars.settings.ZVEI.idDescribed:
 					from includes import descriptionList
 					data["description"] = descriptionList.getDescription("ZVEI", zvei_id)
 				# processing the alarm
@@ -79,6 +110,7 @@ def decode(freq, decoded):
 			doubleFilter.newEntry(zvei_id)
 		else:
 			logging.warning("No valid ZVEI: %s", zvei_id)
+			metrics.count("invalid_ids", (("type", "ZVEI"),))
 	except:
-		logging.error("error while decoding")
-		logging.debug("error while decoding", exc_info=True)
+		logging.error("error while processing")
+		logging.debug("error while processing", exc_info=True)
@@ -0,0 +1,472 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Native POCSAG 512/1200/2400 demodulator
+Works on blocks of 22050 Hz audio (output of rtl_fm or the channelizer):
+batched clock recovery, codeword sync, BCH error correction and alpha/numeric
+decoding with vectorized NumPy operations instead of the text output of multimon-ng.
+Like "multimon-ng -f alpha|numeric|auto" the messages are decoded as alpha, as numeric
+or with the guess of multimon-ng (both if it is unsure).
+
+@author: Bastian Schroll
+
+@requires: numpy
+"""
+
+import logging
+
+import numpy
+
+from includes import metrics  # counters for the metrics endpoint
+
+# POCSAG codewords
+SYNC = 0x7CD215D8
+IDLE = 0x7A89C197
+# BCH(31,21) generator polynomial x^10+x^9+x^8+x^6+x^5+x^3+1
+BCH_POLY = 0x769
+
+# bits for one clock phase estimation
+CHUNK_BITS = 32
+# allowed bit errors in a sync codeword (search / inside a transmission)
+SYNC_ERRORS_SEARCH = 2
+SYNC_ERRORS_BATCH = 4
+
+# names of the control characters as written by multimon-ng
+CONTROL_NAMES = ["NUL", "SOH", "STX", "ETX", "EOT", "ENQ", "ACK", "BEL", "BS", "HT", "LF", "VT", "FF", "CR", "SO", "SI",
+				"DLE", "DC1", "DC2", "DC3", "DC4", "NAK", "SYN", "ETB", "CAN", "EM", "SUB", "ESC", "FS", "GS", "RS", "US"]
+
+# characters of the 4 bit BCD codes of numeric messages (multimon-ng)
+NUMERIC_CHARS = "0123456789*U -]["
+
+# decoding of the messages like "multimon-ng -f"
+MODES = ("alpha", "numeric", "auto")
+# score of the guess of multimon-ng for a decoding (auto mode)
+GUESS_MIN = 20
+
+# number of set bits for each byte value
+POPCOUNT = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.int64)
+
+
+def bchSyndrome(words):
+	"""
+	Calculate the BCH(31,21) syndromes
+
+	@type    words: numpy array (int64)
+	@param   words: 31 bit codewords (without the parity bit)
+
+	@return:    numpy array with the 10 bit syndromes
+	"""
+	remainder = numpy.array(words, dtype=numpy.int64)
+	for i in range(30, 9, -1):
+		remainder ^= ((remainder >> i) & 1) * (BCH_POLY << (i - 10))
+	return remainder & 0x3FF
+
+
+def bchEncode(data):
+	"""
+	Build a complete 32 bit codeword with BCH check bits and even parity
+
+	@type    data: integer
+	@param   data: 21 bit data (flag and payload)
+
+	@return:    codeword as integer
+	"""
+	word = (data << 10) | int(bchSyndrome([data << 10])[0])
+	return (word << 1) | (bin(word).count("1") & 1)
+
+
+def buildCorrectionTable():
+	"""
+	Build the table syndrome -> error pattern for all single and double bit errors
+
+	@return:    numpy array with 1024 entries (-1 if not correctable)
+	"""
+	table = numpy.full(1024, -1, dtype=numpy.int64)
+	table[0] = 0
+	errors = [1 << i for i in range(31)]
+	errors += [(1 << i) | (1 << j) for i in range(31) for j in range(i + 1, 31)]
+	errors = numpy.array(errors, dtype=numpy.int64)
+	table[bchSyndrome(errors)] = errors
+	return table
+
+CORRECTION = buildCorrectionTable()
+
+
+def popcount(values):
+	"""
+	Count the set bits of 32 bit values
+
+	@return:    numpy array with the counts
+	"""
+	values = numpy.asarray(values, dtype=numpy.int64)
+	return POPCOUNT[values & 0xFF] + POPCOUNT[(values >> 8) & 0xFF] + POPCOUNT[(values >> 16) & 0xFF] + POPCOUNT[(values >> 24) & 0xFF]
+
+
+def bitsToWords(bits):
+	"""
+	Pack a bit array (first bit = MSB) into 32 bit words
+
+	@return:    numpy array (int64) with one word per 32 bits
+	"""
+	weights = numpy.int64(1) << numpy.arange(31, -1, -1, dtype=numpy.int64)
+	return numpy.dot(bits[:len(bits) // 32 * 32].reshape(-1, 32).astype(numpy.int64), weights)
+
+
+def slidingWords(bits):
+	"""
+	The 32 bit value starting at every bit position
+
+	@return:    numpy array (int64) with len(bits)-31 values
+	"""
+	if len(bits) < 32:
+		return numpy.zeros(0, dtype=numpy.int64)
+	windows = numpy.lib.stride_tricks.as_strided(bits, shape=(len(bits) - 31, 32), strides=(bits.strides[0], bits.strides[0]))
+	weights = numpy.int64(1) << numpy.arange(31, -1, -1, dtype=numpy.int64)
+	return numpy.dot(windows.astype(numpy.int64), weights)
+
+
+def correctWords(words):
+	"""
+	Correct up to two bit errors in each codeword
+
+	@type    words: numpy array (int64)
+	@param   words: 32 bit codewords
+
+	@return:    (corrected codewords, numpy bool array if a codeword was correctable)
+	"""
+	errors = CORRECTION[bchSyndrome(words >> 1)]
+	valid = errors >= 0
+	return (words ^ (numpy.where(valid, errors, 0) << 1)), valid
+
+
+def decodeAlpha(bits):
+	"""
+	Decode the 7 bit characters (LSB first) of the message bits
+
+	@type    bits: numpy array
+	@param   bits: payload bits of all message codewords
+
+	@return:    text with removed <NUL>/<EOT>
+	"""
+	count = len(bits) // 7
+	codes = numpy.dot(bits[:count * 7].reshape(count, 7).astype(numpy.int64), numpy.int64(1) << numpy.arange(7, dtype=numpy.int64))
+	text = []
+	for code in codes:
+		if code == 0 or code == 4:
+			# <NUL> and <EOT> are only padding
+			continue
+		elif code < 32:
+			text.append("<" + CONTROL_NAMES[code] + ">")
+		elif code == 127:
+			text.append("<DEL>")
+		else:
+			text.append(chr(code))
+	return "".join(text).strip()
+
+
+def decodeNumeric(bits):
+	"""
+	Decode the 4 bit BCD characters (LSB first) of the message bits
+
+	@type    bits: numpy array
+	@param   bits: payload bits of all message codewords
+
+	@return:    text without the padding spaces
+	"""
+	count = len(bits) // 4
+	codes = numpy.dot(bits[:count * 4].reshape(count, 4).astype(numpy.int64), numpy.int64(1) << numpy.arange(4, dtype=numpy.int64))
+	return "".join([NUMERIC_CHARS[code] for code in codes]).strip()
+
+
+def guessAlpha(bits):
+	"""
+	Score of the alpha decoding like the guess of multimon-ng (printable characters count)
+
+	@type    bits: numpy array
+	@param   bits: payload bits of all message codewords
+
+	@return:    integer
+	"""
+	count = len(bits) // 7
+	codes = numpy.dot(bits[:count * 7].reshape(count, 7).astype(numpy.int64), numpy.int64(1) << numpy.arange(7, dtype=numpy.int64))
+	# <NUL> and <EOT> are only padding
+	codes = codes[(codes != 0) & (codes != 4)]
+	# control characters are uncommon, special characters are penalized
+	control = (codes < 32) | (codes == 127)
+	special = ((codes > 32) & (codes < 48)) | ((codes > 57) & (codes < 65)) | ((codes > 90) & (codes < 97)) | ((codes > 122) & (codes < 127))
+	return int(numpy.sum(numpy.where(control, -5, numpy.where(special, -2, 1))))
+
+
+def guessNumeric(text):
+	"""
+	Score of the numeric decoding like the guess of multimon-ng (short messages of digits count)
+
+	@type    text: string
+	@param   text: numeric decoded message
+
+	@return:    integer
+	"""
+	score = 0
+	for position, char in enumerate(text):
+		if char == "U":
+			score -= 10
+		elif char in "[]":
+			score -= 5
+		elif char in " *-":
+			score -= 2
+		elif position < 10:
+			score += 5
+	return score
+
+
+def decodeMessage(bits, mode="alpha"):
+	"""
+	Decode the message bits like "multimon-ng -f mode"
+
+	@type    bits: numpy array
+	@param   bits: payload bits of all message codewords
+	@type    mode: string
+	@param   mode: alpha, numeric or auto (see MODES)
+
+	@return:    list of texts (auto: alpha and/or numeric, both if the guess is unsure)
+	"""
+	if mode == "alpha":
+		return [decodeAlpha(bits)]
+	if mode == "numeric":
+		return [decodeNumeric(bits)]
+	numeric = decodeNumeric(bits)
+	numericScore = guessNumeric(numeric)
+	alphaScore = guessAlpha(bits)
+	unsure = numericScore < GUESS_MIN and alphaScore < GUESS_MIN
+	texts = []
+	if numericScore >= GUESS_MIN or unsure:
+		texts.append(numeric)
+	if alphaScore >= GUESS_MIN or unsure:
+		texts.append(decodeAlpha(bits))
+	return texts
+
+
+class POCSAGDemodulator(object):
+	"""Streaming POCSAG demodulator for one bitrate"""
+
+	def __init__(self, bitrate, sampleRate=22050, mode="alpha"):
+		"""
+		@type    bitrate: integer
+		@param   bitrate: 512, 1200 or 2400
+		@type    sampleRate: integer
+		@param   sampleRate: Sample rate of the audio
+		@type    mode: string
+		@param   mode: decoding of the messages: alpha, numeric or auto (like multimon-ng -f)
+
+		@exception: ValueError if the mode is unknown
+		"""
+		if mode not in MODES:
+			raise ValueError("unknown POCSAG mode %s" % mode)
+		self.bitrate = bitrate
+		self.mode = mode
+		self.bitLength = float(sampleRate) / bitrate
+		# trailing moving averages: lowpass over half a bit, DC over 32 bits
+		self.lowpassLength = max(1, int(self.bitLength / 2))
+		self.dcLength = int(self.bitLength * 32)
+		self.rawHistory = numpy.zeros(self.dcLength)
+
+		# filtered signal with the absolute index of his first sample
+		self.signal = numpy.zeros(0)
+		self.signalStart = 0
+		self.sampleCount = 0
+		self.lastValue = 0.0
+
+		# clock phase (in bits, unwrapped) and the next bit to sample
+		self.phase = 0.0
+		self.nextBit = 0
+
+		# framing
+		self.bits = numpy.zeros(0, dtype=numpy.uint8)
+		self.state = "search"
+		self.inverted = False
+		self.message = None
+		self.telegrams = []
+
+
+	def process(self, samples):
+		"""
+		Demodulate a block of audio
+
+		@type    samples: numpy array
+		@param   samples: 16 bit audio samples
+
+		@return:    list of ("POC", (bitrate, ric, function, text)) for every received telegram
+		"""
+		self.telegrams = []
+		if len(samples):
+			self.appendBits(self.recoverBits(self.filter(samples)))
+			self.frame()
+		return self.telegrams
+
+
+	def filter(self, samples):
+		"""
+		Lowpass and DC removal with trailing moving averages
+
+		@return:    filtered samples
+		"""
+		raw = numpy.concatenate((self.rawHistory, numpy.asarray(samples, dtype=numpy.float64)))
+		cumulated = numpy.concatenate(([0.0], numpy.cumsum(raw)))
+		end = numpy.arange(self.dcLength, len(raw)) + 1
+		lowpass = (cumulated[end] - cumulated[end - self.lowpassLength]) / self.lowpassLength
+		dc = (cumulated[end] - cumulated[end - self.dcLength]) / self.dcLength
+		self.rawHistory = raw[-self.dcLength:]
+		return lowpass - dc
+
+
+	def recoverBits(self, filtered):
+		"""
+		Estimate the clock phase from the zero crossings (one estimation per
+		CHUNK_BITS bits) and sample the signal in the middle of every bit
+
+		@return:    numpy array with the sampled bits
+		"""
+		start = self.sampleCount
+		end = start + len(filtered)
+		self.sampleCount = end
+		self.signal = numpy.concatenate((self.signal, filtered))
+
+		# zero crossings with linear interpolation (absolute sample time)
+		values = numpy.concatenate(([self.lastValue], filtered))
+		self.lastValue = filtered[-1]
+		crossing = numpy.nonzero(numpy.signbit(values[:-1]) != numpy.signbit(values[1:]))[0]
+		times = (start - 1 + crossing) + values[crossing] / (values[crossing] - values[crossing + 1])
+
+		# circular mean of the crossing phases for each chunk
+		startPhase = self.phase
+		chunkIds = numpy.zeros(0, dtype=numpy.int64)
+		chunkPhases = numpy.zeros(1)
+		if len(times):
+			bitTimes = times / self.bitLength
+			angles = 2 * numpy.pi * numpy.mod(bitTimes, 1.0)
+			chunkIds, inverse = numpy.unique(numpy.floor(bitTimes / CHUNK_BITS).astype(numpy.int64), return_inverse=True)
+			counts = numpy.bincount(inverse)
+			sums = numpy.bincount(inverse, numpy.cos(angles)) + 1j * numpy.bincount(inverse, numpy.sin(angles))
+			chunkPhases = numpy.zeros(len(chunkIds))
+			for i in range(len(chunkIds)):
+				if counts[i] > 1:
+					# unwrap against the last estimation and smooth a little bit
+					delta = numpy.mod(numpy.angle(sums[i]) / (2 * numpy.pi) - self.phase + 0.5, 1.0) - 0.5
+					self.phase += 0.5 * delta
+				chunkPhases[i] = self.phase
+
+		# sample times of the bits, the phase of a bit is the last estimation of his chunk
+		lastBit = int(numpy.floor((end - 1) / self.bitLength - self.phase - 0.5)) + 1
+		if lastBit <= self.nextBit:
+			return numpy.zeros(0, dtype=numpy.uint8)
+		bitIndex = numpy.arange(self.nextBit, lastBit)
+		position = numpy.searchsorted(chunkIds, bitIndex // CHUNK_BITS, side="right") - 1
+		phases = numpy.where(position >= 0, chunkPhases[numpy.maximum(position, 0)], startPhase)
+		centers = numpy.rint((bitIndex + phases + 0.5) * self.bitLength).astype(numpy.int64)
+		usable = (centers < end) & (centers >= self.signalStart)
+		centers = centers[usable]
+		if len(centers) == 0:
+			return numpy.zeros(0, dtype=numpy.uint8)
+		self.nextBit = int(bitIndex[usable][-1]) + 1
+
+		bits = (self.signal[centers - self.signalStart] > 0).astype(numpy.uint8)
+		# keep the signal from two bits before the next sample time
+		keep = max(self.signalStart, int((self.nextBit + self.phase - 1.5) * self.bitLength))
+		self.signal = self.signal[keep - self.signalStart:]
+		self.signalStart = keep
+		return bits
+
+
+	def appendBits(self, bits):
+		"""
+		Append bits to the framing buffer
+
+		@return:    nothing
+		"""
+		if len(bits):
+			if self.inverted:
+				bits = 1 - bits
+			self.bits = numpy.concatenate((self.bits, bits))
+
+
+	def frame(self):
+		"""
+		State machine for sync search and batch decoding
+
+		@return:    nothing
+		"""
+		while True:
+			if self.state == "search":
+				words = slidingWords(self.bits)
+				errors = popcount(words ^ SYNC)
+				inverted = popcount(words ^ (~SYNC & 0xFFFFFFFF))
+				found = numpy.nonzero((errors <= SYNC_ERRORS_SEARCH) | (inverted <= SYNC_ERRORS_SEARCH))[0]
+				if not len(found):
+					# keep the last bits, they may be the start of a sync codeword
+					self.bits = self.bits[-31:]
+					return
+				position = found[0]
+				if inverted[position] <= SYNC_ERRORS_SEARCH:
+					self.inverted = not self.inverted
+					self.bits = 1 - self.bits
+				logging.debug("POCSAG%s: sync found", self.bitrate)
+				self.bits = self.bits[position + 32:]
+				self.state = "batch"
+
+			elif self.state == "batch":
+				if len(self.bits) < 512:
+					return
+				self.decodeBatch(self.bits[:512])
+				self.bits = self.bits[512:]
+				self.state = "sync"
+
+			elif self.state == "sync":
+				if len(self.bits) < 32:
+					return
+				if popcount(bitsToWords(self.bits[:32]) ^ SYNC)[0] <= SYNC_ERRORS_BATCH:
+					self.bits = self.bits[32:]
+					self.state = "batch"
+				else:
+					# end of transmission
+					self.flushMessage()
+					self.state = "search"
+
+
+	def decodeBatch(self, bits):
+		"""
+		Decode the 16 codewords of one batch
+
+		@return:    nothing
+		"""
+		words, valid = correctWords(bitsToWords(bits))
+		for index in range(16):
+			word = int(words[index])
+			if not valid[index]:
+				logging.debug("POCSAG%s: codeword not correctable", self.bitrate)
+				metrics.count("crc_failures", (("type", "POC"),))
+				self.flushMessage()
+			elif word == IDLE:
+				self.flushMessage()
+			elif word >> 31 == 0:
+				# address codeword: 18 bit address + frame number -> RIC
+				self.flushMessage()
+				self.message = {"ric": (((word >> 13) & 0x3FFFF) << 3) | (index // 2), "function": (word >> 11) & 3, "bits": []}
+			elif self.message is not None:
+				self.message["bits"].append((word >> numpy.arange(30, 10, -1)) & 1)
+
+
+	def flushMessage(self):
+		"""
+		Finish the current message and add it to the telegrams
+
+		@return:    nothing
+		"""
+		if self.message is None:
+			return
+		texts = [""]
+		if self.message["bits"]:
+			texts = decodeMessage(numpy.concatenate(self.message["bits"]), self.mode)
+		for text in texts:
+			self.telegrams.append(("POC", (self.bitrate, "%07d" % self.message["ric"], str(self.message["function"] + 1), text)))
+		self.message = None
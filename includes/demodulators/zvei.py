@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+
+"""
+Native ZVEI 5-tone decoder
+A bank of Goertzel filters (one per ZVEI1 tone) runs vectorized over
+overlapping frames of a 22050 Hz audio block, the tone segmentation
+builds the 5-tone code and resolves the repeat tone directly.
+
+@author: Bastian Schroll
+
+@requires: numpy
+"""
+
+import logging
+
+import numpy
+
+# ZVEI1 tone frequencies, E is the repeat tone
+TONES = [("0", 2400), ("1", 1060), ("2", 1160), ("3", 1270), ("4", 1400), ("5", 1530),
+		("6", 1670), ("7", 1830), ("8", 2000), ("9", 2200), ("E", 2600)]
+
+# frames of 20 ms every 10 ms (a tone is 70 ms long)
+FRAME_TIME = 0.02
+HOP_TIME = 0.01
+# frames with the same tone needed to accept a tone
+MIN_FRAMES = 3
+# frames without a tone which end a sequence
+MAX_GAP = 3
+# part of the frame energy in the strongest tone / minimal level
+TONE_RATIO = 0.5
+MIN_LEVEL = 300
+
+
+class ZVEIDemodulator(object):
+	"""Streaming ZVEI1 decoder"""
+
+	def __init__(self, sampleRate=22050):
+		"""
+		@type    sampleRate: integer
+		@param   sampleRate: Sample rate of the audio
+		"""
+		self.frameLength = int(sampleRate * FRAME_TIME)
+		self.hopLength = int(sampleRate * HOP_TIME)
+		frequencies = numpy.array([freq for (digit, freq) in TONES], dtype=numpy.float64)
+		omega = 2 * numpy.pi * frequencies / sampleRate
+		self.coeff = 2 * numpy.cos(omega)
+		self.cosine = numpy.cos(omega)
+		self.sine = numpy.sin(omega)
+		self.rest = numpy.zeros(0)
+
+		# segmentation
+		self.label = None
+		self.count = 0
+		self.gap = 0
+		self.tones = ""
+		self.lastTone = None
+		self.telegrams = []
+
+
+	def goertzel(self, frames):
+		"""
+		Power of all tones for all frames
+
+		@type    frames: numpy array
+		@param   frames: [frame, sample]
+
+		@return:    numpy array [frame, tone]
+		"""
+		s1 = numpy.zeros((len(frames), len(TONES)))
+		s2 = numpy.zeros((len(frames), len(TONES)))
+		for n in range(frames.shape[1]):
+			s0 = frames[:, n:n + 1] + self.coeff * s1 - s2
+			s2 = s1
+			s1 = s0
+		real = s1 - s2 * self.cosine
+		imag = s2 * self.sine
+		return real * real + imag * imag
+
+
+	def process(self, samples):
+		"""
+		Decode a block of audio
+
+		@type    samples: numpy array
+		@param   samples: 16 bit audio samples
+
+		@return:    list of ("ZVEI", (zvei_id,)) for every received code
+		"""
+		self.telegrams = []
+		data = numpy.concatenate((self.rest, numpy.asarray(samples, dtype=numpy.float64)))
+		count = (len(data) - self.frameLength) // self.hopLength + 1
+		if count <= 0:
+			self.rest = data
+			return self.telegrams
+		self.rest = data[count * self.hopLength:]
+
+		frames = numpy.lib.stride_tricks.as_strided(data, shape=(count, self.frameLength), strides=(data.strides[0] * self.hopLength, data.strides[0]))
+		power = self.goertzel(frames)
+		# a pure tone has a power of energy * N / 2
+		energy = numpy.sum(frames * frames, axis=1)
+		best = numpy.argmax(power, axis=1)
+		ratio = power[numpy.arange(count), best] / numpy.maximum(energy * self.frameLength / 2.0, 1e-9)
+		valid = (ratio > TONE_RATIO) & (energy / self.frameLength > MIN_LEVEL * MIN_LEVEL)
+		for index in range(count):
+			self.segment(TONES[best[index]][0] if valid[index] else None)
+		return self.telegrams
+
+
+	def segment(self, label):
+		"""
+		Tone segmentation with the label of one frame
+
+		@type    label: string
+		@param   label: detected tone or None
+
+		@return:    nothing
+		"""
+		if label is None:
+			self.gap += 1
+			if self.gap >= MAX_GAP:
+				if self.tones:
+					logging.debug("ZVEI: incomplete sequence %s dropped", self.tones)
+				self.tones = ""
+				self.lastTone = None
+			self.label = None
+			self.count = 0
+			return
+
+		self.gap = 0
+		if label == self.label:
+			self.count += 1
+		else:
+			self.label = label
+			self.count = 1
+		if self.count != MIN_FRAMES or label == self.lastTone:
+			return
+
+		# new tone, the repeat tone stands for the tone before
+		self.lastTone = label
+		if label == "E":
+			if not self.tones:
+				return
+			label = self.tones[-1]
+		self.tones += label
+		if len(self.tones) == 5:
+			self.telegrams.append(("ZVEI", (self.tones,)))
+			self.tones = ""
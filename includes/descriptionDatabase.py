@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+SQLite backend for the description lists
+The csv-file is converted once into a SQLite database next to it (csv/poc.db),
+it is built again if the csv-file is newer. The descriptions are looked up in
+the database with the first alarm of an id and kept in a LRU cache, so large
+lists need neither time at the start nor memory for all entries.
+The prefixes and ranges of the csv-file are few, they are loaded into memory.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import collections
+import csv # for loading the description files
+import logging # Global logger
+import os
+import re # for matching IDs with a regular expression
+import sqlite3
+import threading
+
+from includes.helper import stringConverter
+from includes.helper import patternIndex  # prefixes and ranges
+
+# version of the tables, an older database is built again
+SCHEMA_VERSION = 1
+
+# only rows with a hex id are imported (like descriptionList.loadCSV)
+ID_PATTERN = re.compile("^[0-9A-F]+$", re.IGNORECASE)
+
+
+def build(csvPath, dbPath, idField):
+	"""
+	Convert the csv-file into the database
+	the database is written to a temporary file and renamed at the end,
+	so a running BOSWatch or a crash never sees an incomplete database
+
+	@type    csvPath: string
+	@param   csvPath: path of the csv-file
+	@type    dbPath: string
+	@param   dbPath: path of the database
+	@type    idField: string
+	@param   idField: name of the column with the id
+
+	@return:    number of entries
+	@exception: Exception if the csv-file cannot be read or the database cannot be written
+	"""
+	tmpPath = dbPath + ".tmp"
+	if os.path.exists(tmpPath):
+		os.remove(tmpPath)
+	connection = sqlite3.connect(tmpPath)
+	connection.text_factory = str
+	try:
+		connection.execute("CREATE TABLE descriptions (id TEXT PRIMARY KEY, description TEXT NOT NULL)")
+		connection.execute("CREATE TABLE patterns (id TEXT PRIMARY KEY, description TEXT NOT NULL)")
+		connection.execute("PRAGMA user_version = %d" % SCHEMA_VERSION)
+		with open(csvPath) as csvfile:
+			# DictReader expected structure described in first line of csv-file
+			reader = csv.DictReader(csvfile)
+			rows = []
+			for row in reader:
+				if row[idField] and ID_PATTERN.match(row[idField]):
+					try:
+						rows.append((row[idField].lower(), stringConverter.convertToUTF8(row['description'])))
+					except:
+						# skip entry in case of an exception
+						pass
+				elif row[idField] and patternIndex.isPattern(row[idField]):
+					try:
+						connection.execute("INSERT OR REPLACE INTO patterns VALUES (?, ?)", (row[idField], stringConverter.convertToUTF8(row['description'])))
+					except:
+						# skip entry in case of an exception
+						pass
+				if len(rows) >= 10000:
+					connection.executemany("INSERT OR REPLACE INTO descriptions VALUES (?, ?)", rows)
+					rows = []
+			connection.executemany("INSERT OR REPLACE INTO descriptions VALUES (?, ?)", rows)
+		connection.commit()
+		count = connection.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+	finally:
+		connection.close()
+	os.rename(tmpPath, dbPath)
+	return count
+
+
+class DescriptionDatabase(object):
+	"""Description list in a SQLite database with a LRU cache, used like the DescriptionList of the memory backend"""
+
+	def __init__(self, dbPath, cacheSize=1000):
+		"""
+		@type    dbPath: string
+		@param   dbPath: path of the database
+		@type    cacheSize: integer
+		@param   cacheSize: number of cached ids (found and not found)
+
+		@exception: sqlite3.Error if the database cannot be opened
+		"""
+		self.dbPath = dbPath
+		self.cacheSize = cacheSize
+		self.cache = collections.OrderedDict()
+		self.lock = threading.Lock()
+		# opened in the loader thread, used in the thread of the decoder
+		self.connection = sqlite3.connect(dbPath, check_same_thread=False)
+		self.connection.text_factory = str
+		self.patterns = patternIndex.PatternIndex()
+		for (id, description) in self.connection.execute("SELECT id, description FROM patterns"):
+			try:
+				self.patterns.add(id, description)
+			except ValueError:
+				logging.debug("invalid pattern %s", id)
+		self.patterns.build()
+
+
+	def __getitem__(self, key):
+		try:
+			return self.getExact(key)
+		except KeyError:
+			description = self.patterns.find(key)
+			if description is None:
+				raise
+			return description
+
+
+	def getExact(self, key):
+		"""
+		Returns the description of an exact entry (without prefixes and ranges)
+
+		@exception: KeyError if there is no exact entry
+		"""
+		with self.lock:
+			if key in self.cache:
+				# most recently used at the end
+				description = self.cache.pop(key)
+			else:
+				row = self.connection.execute("SELECT description FROM descriptions WHERE id = ?", (key,)).fetchone()
+				description = row[0] if row else None
+				if len(self.cache) >= self.cacheSize:
+					self.cache.popitem(last=False)
+			self.cache[key] = description
+		if description is None:
+			raise KeyError(key)
+		return description
+
+
+	def __contains__(self, key):
+		try:
+			self[key]
+			return True
+		except KeyError:
+			return False
+
+
+	def __len__(self):
+		with self.lock:
+			return self.connection.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0]
+
+
+	def close(self):
+		"""
+		Close the database
+
+		@return:    nothing
+		"""
+		with self.lock:
+			self.connection.close()
+
+
+def getVersion(dbPath):
+	"""
+	Returns the version of the tables of a database
+
+	@type    dbPath: string
+	@param   dbPath: path of the database
+
+	@return:    integer (0 for a database without version)
+	"""
+	connection = sqlite3.connect(dbPath)
+	try:
+		return connection.execute("PRAGMA user_version").fetchone()[0]
+	finally:
+		connection.close()
+
+
+def load(csvPath, idField, cacheSize=1000):
+	"""
+	Open the database of a csv-file, build it if it is missing or older than the csv-file
+
+	@type    csvPath: string
+	@param   csvPath: path of the csv-file
+	@type    idField: string
+	@param   idField: name of the column with the id
+	@type    cacheSize: integer
+	@param   cacheSize: number of cached ids
+
+	@return:    DescriptionDatabase
+	@exception: Exception if the database cannot be built or opened
+	"""
+	dbPath = os.path.splitext(csvPath)[0] + ".db"
+	if not os.path.exists(dbPath) or os.path.getmtime(dbPath) < os.path.getmtime(csvPath) or getVersion(dbPath) != SCHEMA_VERSION:
+		logging.debug("-- building %s", dbPath)
+		count = build(csvPath, dbPath, idField)
+		logging.debug("-- %s entries written to %s", count, dbPath)
+	return DescriptionDatabase(dbPath, cacheSize)
@@ -4,6 +4,13 @@
 """
 Function to expand the dataset with a description.
 
+The lists are loaded into memory (descriptionBackend = memory) or
+looked up in a SQLite database built from the csv-file (descriptionBackend = sqlite,
+see descriptionDatabase.py).
+Besides exact ids a csv-file can describe prefixes (12345*) and numeric
+ranges (1000000-1000999), an exact id takes precedence over a prefix and
+a prefix over a range.
+
 @author: Jens Herrmann
 
 @requires: Configuration has to be set in the config.ini
@@ -15,6 +22,7 @@ import re # for matching IDs with a regular expression
 
 from includes import globalVars  # Global variables
 from includes.helper import stringConverter
+from includes.helper import patternIndex  # prefixes and ranges
 
 
 # local variables
@@ -23,6 +31,32 @@ zveiDescribtionList = {}
 ricDescribtionList  = {}
 
 
+class DescriptionList(dict):
+	"""Exact ids in the dict, prefixes and ranges in a PatternIndex for the ids without an exact entry"""
+
+	def __init__(self):
+		dict.__init__(self)
+		self.patterns = patternIndex.PatternIndex()
+
+
+	def __missing__(self, key):
+		description = self.patterns.find(key)
+		if description is None:
+			raise KeyError(key)
+		return description
+
+
+	def getExact(self, key):
+		"""
+		Returns the description of an exact entry (without prefixes and ranges)
+
+		@exception: KeyError if there is no exact entry
+		"""
+		if not dict.__contains__(self, key):
+			raise KeyError(key)
+		return dict.__getitem__(self, key)
+
+
 ##
 #
 # Local function will load the csv-file
@@ -32,9 +66,9 @@ def loadCSV(typ, idField):
 	Local function for loading csv-file into python list
 	Structure: [id] = description
 
-	@return:    Python list of descriptions
+	@return:    DescriptionList
 	"""
-	resultList = {}
+	resultList = DescriptionList()
 	try:
 		logging.debug("-- loading %s.csv", typ)
 		with open(globalVars.script_path+'/csv/'+typ+'.csv') as csvfile:
@@ -49,6 +83,13 @@ def loadCSV(typ, idField):
 					except:
 						# skip entry in case of an exception
 						pass
+				elif patternIndex.isPattern(row[idField]):
+					try:
+						resultList.patterns.add(row[idField], stringConverter.convertToUTF8(row['description']))
+					except:
+						# skip entry in case of an exception
+						pass
+			resultList.patterns.build()
 		logging.debug("-- loading csv finished")
 	except:
 		logging.error("loading csvList for typ: %s failed", typ)
@@ -57,6 +98,31 @@ def loadCSV(typ, idField):
 	return resultList;
 
 
+##
+#
+# Local function will load a list with the configured backend
+#
+def loadList(typ, idField, config):
+	"""
+	Local function for loading a description list with the descriptionBackend of the config.ini
+
+	@type    config: ConfigParser
+	@param   config: the read config.ini
+
+	@return:    DescriptionList or descriptionDatabase.DescriptionDatabase
+	"""
+	backend = "memory"
+	if config.has_option("BOSWatch", "descriptionBackend"):
+		backend = config.get("BOSWatch", "descriptionBackend")
+	if backend == "sqlite":
+		from includes import descriptionDatabase
+		cacheSize = 1000
+		if config.has_option("BOSWatch", "descriptionCacheSize"):
+			cacheSize = config.getint("BOSWatch", "descriptionCacheSize")
+		return descriptionDatabase.load(globalVars.script_path+'/csv/'+typ+'.csv', idField, cacheSize)
+	return loadCSV(typ, idField)
+
+
 ##
 #
 # call this for loading the description lists
@@ -69,26 +135,56 @@ def loadDescriptionLists():
 	@exception: Exception if loading failed
 	"""
 	try:
-		logging.debug("loading description lists")
+		setDescriptionLists(buildDescriptionLists(globalVars.config, globalVars.settings))
+	except:
+		logging.error("cannot load description lists")
+		logging.debug("cannot load description lists", exc_info=True)
 
-		if globalVars.config.getint("FMS", "idDescribed"):
-			logging.debug("- load FMS description list")
-			global fmsDescribtionList
-			fmsDescribtionList = loadCSV("fms", "fms")
 
-		if globalVars.config.getint("ZVEI", "idDescribed"):
-			logging.debug("- load ZVEI description list")
-			global zveiDescribtionList
-			zveiDescribtionList = loadCSV("zvei", "zvei")
+def buildDescriptionLists(config, settings):
+	"""
+	Load the description lists of the typs with idDescribed (used by loadDescriptionLists() and the reload)
 
-		if globalVars.config.getint("POC", "idDescribed"):
-			logging.debug("- load pocsag description list")
-			global ricDescribtionList
-			ricDescribtionList = loadCSV("poc", "ric")
+	@type    config: ConfigParser
+	@param   config: the read config.ini
+	@type    settings: settings.Settings
+	@param   settings: snapshot of the config.ini
 
-	except:
-		logging.error("cannot load description lists")
-		logging.debug("cannot load description lists", exc_info=True)
+	@return:    Python dict [typ] = description list for setDescriptionLists()
+	@exception: Exception if loading failed
+	"""
+	logging.debug("loading description lists")
+	lists = {}
+
+	if settings.FMS.idDescribed:
+		logging.debug("- load FMS description list")
+		lists["FMS"] = loadList("fms", "fms", config)
+
+	if settings.ZVEI.idDescribed:
+		logging.debug("- load ZVEI description list")
+		lists["ZVEI"] = loadList("zvei", "zvei", config)
+
+	if settings.POC.idDescribed:
+		logging.debug("- load pocsag description list")
+		lists["POC"] = loadList("poc", "ric", config)
+	return lists
+
+
+def setDescriptionLists(lists):
+	"""
+	Replace the description lists
+
+	@type    lists: dict
+	@param   lists: [typ] = description list of buildDescriptionLists(), a missing typ gets an empty list
+
+	@return:    the replaced lists
+	"""
+	global fmsDescribtionList, zveiDescribtionList, ricDescribtionList
+	oldLists = [fmsDescribtionList, zveiDescribtionList, ricDescribtionList]
+	fmsDescribtionList = lists.get("FMS", DescriptionList())
+	zveiDescribtionList = lists.get("ZVEI", DescriptionList())
+	ricDescribtionList = lists.get("POC", DescriptionList())
+	return oldLists
 
 
 ##
@@ -110,11 +206,12 @@ def getDescription(typ, data):
 		elif typ == "ZVEI":
 			resultStr = zveiDescribtionList[data]
 		elif typ == "POC":
-			if globalVars.config.getint("POC", "onlysubric"):
+			if globalVars.settings.POC.onlysubric:
 				resultStr = ricDescribtionList[data] # only SubRIC
 			else:
 				resultStr = ricDescribtionList[data[:-1]] # MainRIC
-				resultStr += " " + ricDescribtionList[data] # SubRIC
+				# a prefix or range of the MainRIC isn't repeated for the SubRIC
+				resultStr += " " + ricDescribtionList.getExact(data) # SubRIC
 		else:
 			logging.warning("Invalid Typ: %s", typ)
 
@@ -6,20 +6,45 @@ doubleFilter is the central function to filter out double alarms.
 You can set the number of historical entries the filter will check
 and the time ignoring the id in case of a double alarm
 
+The entries are kept in time order (for the eviction of the oldest ones)
+and indexed by their id, so a check only looks at the entries of the same id
+and the cost doesn't grow with doubleFilter_ignore_entries.
+
+With doubleFilter_file the entries are appended to a file too. At the start
+the entries within doubleFilter_ignore_time are loaded from it, so a repeated
+alarm is filtered after a restart of BOSWatch as well.
+
 @author: Jens Herrmann
 
 @requires: Configuration has to be set in the config.ini
 """
 
 import logging # Global logger
+import operator
+import os
 import time    # timestamp for doublealarm
 
+from collections import deque
+
 from includes import globalVars  # Global variables
+from includes import metrics  # latency of the stages
 
 #
-# ListStructure [0..n] = (Data, TimeStamp, msg)
+# ListStructure [0..n] = (Data, TimeStamp, msg) - oldest first
 #
-doubleList = []
+doubleList = deque()
+
+#
+# ListStructure [Data] = deque of the entries of doubleList with this id - oldest first
+#
+doubleIndex = {}
+
+# local variables
+stateFile = None
+stateFileEntries = 0
+
+# the file is rewritten with the current entries when it has this many entries more than the window
+COMPACT_ENTRIES = 100
 
 
 def checkID(typ, data, msg=""):
@@ -31,42 +56,277 @@ def checkID(typ, data, msg=""):
 	@return:    True if check was OK
 	@return:    False if double was found
 	"""
+	metrics.mark("decode")
+	settings = globalVars.settings
 	timestamp = int(time.time()) # Get Timestamp
+	ignoreTime = settings.BOSWatch.doubleFilter_ignore_time
+	maxDistance = settings.BOSWatch.doubleFilter_msg_distance
 
 	logging.debug("checkID: %s (%s)", data, msg)
-	for (xID, xTimestamp, xMsg) in doubleList:
+	for (xID, xTimestamp, xMsg) in doubleIndex.get(data, ()):
 		# given ID found?
 		# return False if the first entry in double_ignore_time is found, we will not check for younger ones...
-		if data == xID and timestamp < xTimestamp + globalVars.config.getint("BOSWatch", "doubleFilter_ignore_time"):
-			logging.debug("-- previous id %s is within doubleFilter_ignore_time (%ss)", xID, globalVars.config.getint("BOSWatch", "doubleFilter_ignore_time"))
+		if data == xID and timestamp < xTimestamp + ignoreTime:
+			logging.debug("-- previous id %s is within doubleFilter_ignore_time (%ss)", xID, ignoreTime)
 			# if wanted, we have to check the msg additional
-			if "POC" in typ and globalVars.config.getint("BOSWatch", "doubleFilter_check_msg"):
+			if "POC" in typ and settings.BOSWatch.doubleFilter_check_msg:
 				logging.debug("-- compare msg:")
 				logging.debug("---- current msg: (%s)", msg.strip())
 				logging.debug("---- previous msg: (%s)", xMsg)
-				# if msg is a substring of xMsg we found a double
-				if msg.strip() in xMsg:
+				# if msg is a substring of xMsg or differs only in a few characters (bit errors) we found a double
+				if msg.strip() in xMsg or (maxDistance and isSimilar(msg.strip(), xMsg, maxDistance)):
 					logging.info("%s double alarm (id+msg): %s within %s second(s)", typ, xID, timestamp-xTimestamp)
+					metrics.mark("doubleFilter")
+					metrics.count("double_alarms", (("type", typ),))
 					return False
 			else:
 				logging.info("%s double alarm (id): %s within %s second(s)", typ, xID, timestamp-xTimestamp)
+				metrics.mark("doubleFilter")
+				metrics.count("double_alarms", (("type", typ),))
 				return False
+	metrics.mark("doubleFilter")
 	return True
 
 
+def isSimilar(msg, xMsg, maxDistance):
+	"""
+	Check if the edit distance (inserted, deleted or changed characters) of two messages
+	is at most maxDistance. Bit errors change characters without changing the length,
+	so messages of the same length are compared char by char first. Otherwise only the
+	band of the diagonal is calculated and the calculation stops as soon as the
+	distance exceeds maxDistance.
+
+	@type    msg: string
+	@param   msg: current msg
+	@type    xMsg: string
+	@param   xMsg: previous msg
+	@type    maxDistance: integer
+	@param   maxDistance: doubleFilter_msg_distance
+
+	@return:    True if the distance is at most maxDistance
+	"""
+	if abs(len(msg) - len(xMsg)) > maxDistance:
+		return False
+	if len(msg) == len(xMsg) and sum(map(operator.ne, msg, xMsg)) <= maxDistance:
+		return True
+	# the same start and end don't change the distance, only the part between the errors is calculated
+	length = min(len(msg), len(xMsg))
+	prefix = 0
+	while prefix < length and msg[prefix] == xMsg[prefix]:
+		prefix += 1
+	suffix = 0
+	while suffix < length - prefix and msg[-1 - suffix] == xMsg[-1 - suffix]:
+		suffix += 1
+	msg = msg[prefix:len(msg) - suffix]
+	xMsg = xMsg[prefix:len(xMsg) - suffix]
+
+	tooFar = maxDistance + 1
+	# previous[j] = distance of msg[:i-1] and xMsg[:j], outside of the band tooFar
+	previous = range(len(xMsg) + 1)
+	for i in range(1, len(msg) + 1):
+		start = max(1, i - maxDistance)
+		end = min(len(xMsg), i + maxDistance)
+		current = [tooFar] * (len(xMsg) + 1)
+		if i <= maxDistance:
+			current[0] = i
+		char = msg[i - 1]
+		best = current[0]
+		for j in range(start, end + 1):
+			value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != xMsg[j - 1]))
+			current[j] = value if value < tooFar else tooFar
+			if value < best:
+				best = value
+		if best > maxDistance:
+			return False
+		previous = current
+	return previous[len(xMsg)] <= maxDistance
+
+
 def newEntry(data, msg = ""):
 	"""
 	new entry in double alarm list
 
 	@return:    nothing
 	"""
-	global doubleList
+	settings = globalVars.settings
 	timestamp = int(time.time()) # Get Timestamp
-	doubleList.append((data, timestamp, msg.strip()))
+	entry = (data, timestamp, msg.strip())
+	doubleList.append(entry)
+	if data in doubleIndex:
+		doubleIndex[data].append(entry)
+	else:
+		doubleIndex[data] = deque((entry,))
 
 	logging.debug("Added %s to doubleList", data)
+	if stateFile is not None:
+		writeEntry(entry)
 
+	# expired entries are the oldest ones, they can't be a double alarm anymore
+	removeExpired(timestamp, settings.BOSWatch.doubleFilter_ignore_time)
 	# now check if list has more than n entries:
-	if len(doubleList) > globalVars.config.getint("BOSWatch", "doubleFilter_ignore_entries"):
+	while len(doubleList) > settings.BOSWatch.doubleFilter_ignore_entries:
 		# we have to kill the oldest one
-		doubleList.pop(0)
+		removeOldest()
+
+	if stateFile is not None and stateFileEntries > len(doubleList) + COMPACT_ENTRIES:
+		compact()
+
+
+def removeOldest():
+	"""
+	remove the oldest entry from doubleList and the index
+
+	@return:    the removed entry
+	"""
+	entry = doubleList.popleft()
+	entries = doubleIndex[entry[0]]
+	# the oldest entry of the list is the oldest of his id too
+	entries.popleft()
+	if not entries:
+		del doubleIndex[entry[0]]
+	return entry
+
+
+def removeExpired(timestamp, ignoreTime):
+	"""
+	remove the entries older than ignoreTime from the start of doubleList
+
+	@type    timestamp: integer
+	@param   timestamp: current time
+	@type    ignoreTime: integer
+	@param   ignoreTime: doubleFilter_ignore_time
+
+	@return:    number of removed entries
+	"""
+	count = 0
+	while doubleList and timestamp >= doubleList[0][1] + ignoreTime:
+		removeOldest()
+		count += 1
+	return count
+
+
+def expireEntries():
+	"""
+	remove all entries older than doubleFilter_ignore_time
+	they can't be a double alarm anymore
+
+	@return:    nothing
+	"""
+	count = removeExpired(int(time.time()), globalVars.settings.BOSWatch.doubleFilter_ignore_time)
+	if count:
+		logging.debug("%s expired entries removed from doubleList", count)
+
+
+def getStatePath():
+	"""
+	Returns the path of the doubleFilter_file (relative to the log folder)
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    path or None if the entries are not saved
+	"""
+	fileName = globalVars.settings.BOSWatch.doubleFilter_file
+	if not fileName:
+		return None
+	return os.path.join(globalVars.log_path, fileName)
+
+
+def writeEntry(entry):
+	"""
+	Append an entry to the doubleFilter_file
+	one line per entry: timestamp, id and msg separated by tabs (escaped)
+
+	@type    entry: tuple
+	@param   entry: (Data, TimeStamp, msg)
+
+	@return:    nothing
+	"""
+	global stateFileEntries
+	try:
+		stateFile.write("%d\t%s\t%s\n" % (entry[1], entry[0].encode("string_escape"), entry[2].encode("string_escape")))
+		# to the OS at once, a crash of BOSWatch doesn't lose the entry
+		stateFile.flush()
+		stateFileEntries += 1
+	except:
+		# It's an error, but we could work without that stuff...
+		logging.error("cannot write doubleFilter_file - entries are no longer saved")
+		logging.debug("cannot write doubleFilter_file", exc_info=True)
+		close()
+
+
+def compact():
+	"""
+	Rewrite the doubleFilter_file with the current entries
+	the new file replaces the old one with a rename, so it is complete at any time
+
+	@return:    nothing
+	"""
+	global stateFile, stateFileEntries
+	path = getStatePath()
+	close()
+	try:
+		with open(path + ".tmp", "w") as newFile:
+			for (xID, xTimestamp, xMsg) in doubleList:
+				newFile.write("%d\t%s\t%s\n" % (xTimestamp, xID.encode("string_escape"), xMsg.encode("string_escape")))
+		os.rename(path + ".tmp", path)
+		stateFile = open(path, "a")
+		stateFileEntries = len(doubleList)
+		logging.debug("doubleFilter_file compacted to %s entries", stateFileEntries)
+	except:
+		# It's an error, but we could work without that stuff...
+		logging.error("cannot write doubleFilter_file - entries are no longer saved")
+		logging.debug("cannot write doubleFilter_file", exc_info=True)
+
+
+def load():
+	"""
+	Load the entries within doubleFilter_ignore_time from the doubleFilter_file
+	and append the following entries to it
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	@exception: Exception if the file cannot be written
+	"""
+	path = getStatePath()
+	if path is None:
+		return
+	settings = globalVars.settings
+	timestamp = int(time.time())
+	ignoreTime = settings.BOSWatch.doubleFilter_ignore_time
+	if os.path.exists(path):
+		with open(path, "r") as oldFile:
+			for line in oldFile:
+				try:
+					(xTimestamp, xID, xMsg) = line.rstrip("\n").split("\t")
+					entry = (xID.decode("string_escape"), int(xTimestamp), xMsg.decode("string_escape"))
+				except ValueError:
+					# f.e. the last line of a crash while writing
+					logging.debug("invalid line in doubleFilter_file: %s", line.strip())
+					continue
+				if timestamp >= entry[1] + ignoreTime:
+					continue
+				doubleList.append(entry)
+				doubleIndex.setdefault(entry[0], deque()).append(entry)
+				if len(doubleList) > settings.BOSWatch.doubleFilter_ignore_entries:
+					removeOldest()
+		logging.debug("%s entries loaded from doubleFilter_file", len(doubleList))
+	# start the file with the loaded entries
+	compact()
+	if stateFile is None:
+		raise IOError("cannot write %s" % path)
+
+
+def close():
+	"""
+	Close the doubleFilter_file
+
+	@return:    nothing
+	"""
+	global stateFile
+	if stateFile is not None:
+		try:
+			stateFile.close()
+		except:
+			logging.debug("cannot close doubleFilter_file", exc_info=True)
+		stateFile = None
@@ -0,0 +1,315 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Event loop for the ingestion of the multimon-ng output
+The streams are read non-blocking with select(), complete lines are handed
+over to the pipeline thread, so a burst of telegrams never backs up in the OS pipe.
+Timers (f.e. expiry of the doubleFilter) run on the same loop and their
+callbacks are queued into the pipeline too, so they never run in parallel with the decoder.
+Producers without a stream (f.e. the native demodulators) hand over their
+telegrams with submit() and keep the loop running until they are finished.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import errno
+import logging
+import os
+import select
+import threading
+import time
+
+from includes.workQueue import WorkQueue
+
+# bytes to read with one call
+READ_SIZE = 65536
+# wanted size of the OS pipe buffer (Linux only)
+PIPE_SIZE = 1048576
+# fcntl command F_SETPIPE_SZ (not defined by python's fcntl module)
+F_SETPIPE_SZ = 1031
+
+#
+# ListStructure [fd] = {"stream", "freq", "buffer", "lastRead"}
+#
+streamList = {}
+
+#
+# ListStructure [0..n] = [interval, nextRun, callback, inPipeline]
+#
+timerList = []
+
+# local variables
+pipeline = None
+pipelineLock = threading.Lock()
+producers = 0
+running = False
+wakeupPipe = None
+
+
+def getPipeline():
+	"""
+	Returns the pipeline queue, it is created with the first call
+
+	@return:    WorkQueue
+	"""
+	global pipeline
+	with pipelineLock:
+		if pipeline is None:
+			pipeline = WorkQueue("pipeline", lambda function, args: function(*args), workers=1)
+			pipeline.start()
+		return pipeline
+
+
+def addStream(stream, freq):
+	"""
+	Register a stream with multimon-ng output
+
+	@type    stream: file object
+	@param   stream: stdout of multimon-ng (or a file with test data)
+	@type    freq: integer
+	@param   freq: frequency of the SDR Stick in Hz
+
+	@return:    nothing
+	"""
+	fd = stream.fileno()
+	try:
+		import fcntl
+		fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+		fcntl.fcntl(fd, F_SETPIPE_SZ, PIPE_SIZE)
+	except:
+		# no pipe or not supported - the default buffer is fine too
+		logging.debug("cannot enlarge pipe buffer of fd %s", fd)
+	streamList[fd] = {"stream": stream, "freq": freq, "buffer": "", "lastRead": None}
+	logging.debug("added stream fd %s for %s Hz", fd, freq)
+
+
+def removeStream(stream):
+	"""
+	Unregister a stream, an unfinished line is dropped
+
+	@type    stream: file object
+	@param   stream: a registered stream
+
+	@return:    nothing
+	"""
+	streamList.pop(stream.fileno(), None)
+
+
+def getLastRead(stream):
+	"""
+	Returns the time of the last read of a stream
+
+	@type    stream: file object
+	@param   stream: a registered stream
+
+	@return:    timestamp or None (nothing read or not registered)
+	"""
+	entry = streamList.get(stream.fileno())
+	if entry is None:
+		return None
+	return entry["lastRead"]
+
+
+def addTimer(interval, callback, inPipeline=True):
+	"""
+	Register a periodic timer
+
+	@type    interval: float
+	@param   interval: seconds between two calls
+	@type    callback: function
+	@param   callback: function to call without arguments
+	@type    inPipeline: boolean
+	@param   inPipeline: run the callback in the pipeline thread (needed if the
+	                     callback changes data used by the decoders)
+
+	@return:    nothing
+	"""
+	timerList.append([interval, time.time() + interval, callback, inPipeline])
+	logging.debug("added timer %s every %ss", callback.__name__, interval)
+
+
+def addProducer():
+	"""
+	Register a producer, the loop keeps running until all producers are removed
+
+	@return:    nothing
+	"""
+	global producers
+	with pipelineLock:
+		producers += 1
+
+
+def removeProducer():
+	"""
+	Unregister a finished producer, can be called from any thread
+
+	@return:    nothing
+	"""
+	global producers
+	with pipelineLock:
+		producers -= 1
+	wakeup()
+
+
+def submit(function, args):
+	"""
+	Queue a function call into the pipeline thread, can be called from any thread
+
+	@type    function: function
+	@param   function: function to call (f.e. poc.process)
+	@type    args: tuple
+	@param   args: arguments of the function
+
+	@return:    nothing
+	"""
+	getPipeline().put((function, args))
+
+
+def processLine(freq, decoded, readTime=None):
+	"""
+	Hand over one line of multimon-ng to the decoder
+	runs in the pipeline thread
+
+	@type    freq: integer
+	@param   freq: frequency of the SDR Stick in Hz
+	@type    decoded: string
+	@param   decoded: RAW Information from Multimon-NG
+	@type    readTime: float
+	@param   readTime: timestamp of the read from the pipe
+
+	@return:    nothing
+	"""
+	from includes import decoder
+	decoder.decode(freq, decoded, readTime)
+
+	# write multimon-ng raw data
+	decoder.writeRaw(decoded)
+
+
+def runCallback(callback):
+	"""
+	Call a timer callback, runs in the pipeline thread
+
+	@return:    nothing
+	"""
+	callback()
+
+
+def readStream(fd):
+	"""
+	Read all available data of a stream and queue the complete lines
+
+	@return:    False if the stream was closed
+	"""
+	entry = streamList[fd]
+	try:
+		chunk = os.read(fd, READ_SIZE)
+	except OSError:
+		# EAGAIN - nothing to read at the moment
+		return True
+	readTime = time.time()
+	entry["lastRead"] = readTime
+	if not chunk:
+		# end of stream - queue the last unterminated line
+		if entry["buffer"]:
+			pipeline.put((processLine, (entry["freq"], entry["buffer"] + "\n", readTime)))
+		return False
+
+	lines = (entry["buffer"] + chunk).split("\n")
+	entry["buffer"] = lines.pop()
+	for line in lines:
+		pipeline.put((processLine, (entry["freq"], line + "\n", readTime)))
+	return True
+
+
+def runTimers(now):
+	"""
+	Call or queue all timers which are due
+
+	@return:    seconds until the next timer is due (or None if there is no timer)
+	"""
+	nextDue = None
+	for timer in timerList:
+		if timer[1] <= now:
+			timer[1] = now + timer[0]
+			if timer[3]:
+				pipeline.put((runCallback, (timer[2],)))
+			else:
+				try:
+					timer[2]()
+				except (KeyboardInterrupt, SystemExit):
+					raise
+				except:
+					logging.error("error in timer %s", timer[2].__name__)
+					logging.debug("error in timer %s", timer[2].__name__, exc_info=True)
+		if nextDue is None or timer[1] < nextDue:
+			nextDue = timer[1]
+	if nextDue is None:
+		return None
+	return max(0, nextDue - now)
+
+
+def run():
+	"""
+	Run the event loop until stop() is called or all streams are closed
+
+	@return:    nothing
+	"""
+	global pipeline, running, wakeupPipe
+	getPipeline()
+	wakeupPipe = os.pipe()
+	running = True
+	logging.debug("event loop started")
+	try:
+		while running and (streamList or producers > 0):
+			timeout = runTimers(time.time())
+			try:
+				readable = select.select(streamList.keys() + [wakeupPipe[0]], [], [], timeout)[0]
+			except select.error as e:
+				# interrupted by a signal (f.e. HUP for the reload)
+				if e.args[0] == errno.EINTR:
+					continue
+				raise
+			for fd in readable:
+				if fd == wakeupPipe[0]:
+					os.read(fd, READ_SIZE)
+				elif not readStream(fd):
+					logging.warning("stream fd %s closed", fd)
+					del streamList[fd]
+	finally:
+		running = False
+		# process the remaining lines
+		pipeline.stop(60)
+		pipeline = None
+		os.close(wakeupPipe[0])
+		os.close(wakeupPipe[1])
+		wakeupPipe = None
+		logging.debug("event loop stopped")
+
+
+def stop():
+	"""
+	Stop the event loop, can be called from any thread
+
+	@return:    nothing
+	"""
+	global running
+	running = False
+	wakeup()
+
+
+def wakeup():
+	"""
+	Interrupt the waiting select() of the loop
+
+	@return:    nothing
+	"""
+	if wakeupPipe:
+		try:
+			os.write(wakeupPipe[1], "x")
+		except OSError:
+			pass
@@ -18,5 +18,8 @@ config = 0
 script_path = ""
 log_path = ""
 
+# typed snapshot of the config (see settings.py)
+settings = None
+
 # pluginLoader
 pluginList = {}
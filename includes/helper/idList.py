@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+
+"""
+List of ids (RIC, FMS, ZVEI) with exact values, numeric ranges and prefixes
+The values are kept in a set, the ranges merged in a sorted list for a binary
+search and the prefixes in a set per length, so a lookup costs the same for
+a few or thousands of entries.
+
+@author: Bastian Schroll
+"""
+
+from bisect import bisect_right
+
+
+class IdList(object):
+	"""Exact values, numeric ranges and prefixes of ids for the lookup with 'in'"""
+
+	def __init__(self, values=(), ranges=(), prefixes=()):
+		"""
+		@type    values: iterable
+		@param   values: exact ids (strings)
+		@type    ranges: iterable
+		@param   ranges: (first, last) numbers, last included
+		@type    prefixes: iterable
+		@param   prefixes: starts of ids (strings)
+		"""
+		self.values = frozenset(values)
+		self.prefixes = frozenset(prefixes)
+		self.prefixLengths = sorted(set(len(prefix) for prefix in self.prefixes))
+
+		# merge overlapping and adjacent ranges
+		merged = []
+		for (first, last) in sorted(ranges):
+			if merged and first <= merged[-1][1] + 1:
+				merged[-1][1] = max(merged[-1][1], last)
+			else:
+				merged.append([first, last])
+		self.starts = [first for (first, last) in merged]
+		self.ends = [last for (first, last) in merged]
+
+
+	def __contains__(self, value):
+		if value in self.values:
+			return True
+		for length in self.prefixLengths:
+			if value[:length] in self.prefixes:
+				return True
+		if self.starts:
+			try:
+				number = int(value)
+			except ValueError:
+				return False
+			index = bisect_right(self.starts, number) - 1
+			return index >= 0 and number <= self.ends[index]
+		return False
+
+
+	def __nonzero__(self):
+		return bool(self.values or self.prefixes or self.starts)
+
+
+	def __len__(self):
+		return len(self.values) + len(self.prefixes) + len(self.starts)
+
+
+def parseRange(entry):
+	"""
+	Parse a numeric range like 1000000-1999999
+
+	@type    entry: string
+	@param   entry: first-last
+
+	@return:    (first, last)
+	@exception: ValueError if the range is invalid
+	"""
+	(first, last) = [int(number) for number in entry.split("-")]
+	if first > last:
+		raise ValueError("invalid range %s" % entry)
+	return (first, last)
+
+
+def parseIdList(text, width=0):
+	"""
+	Parse a comma separated list of ids, ranges (first-last) and prefixes (start*)
+	f.e. 1234567, 1000000-1000999, 12345*
+
+	@type    text: string
+	@param   text: list of the config.ini
+	@type    width: integer
+	@param   width: numeric ids are filled with leading zeros to this width (f.e. 7 for RICs)
+
+	@return:    IdList
+	@exception: ValueError if a range is invalid
+	"""
+	values = []
+	ranges = []
+	prefixes = []
+	for entry in text.split(","):
+		entry = entry.strip()
+		if not entry:
+			continue
+		if entry.endswith("*"):
+			prefixes.append(entry[:-1])
+		elif "-" in entry:
+			ranges.append(parseRange(entry))
+		elif entry.isdigit():
+			values.append(entry.zfill(width))
+		else:
+			values.append(entry)
+	return IdList(values, ranges, prefixes)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+
+"""
+Index of prefixes (12345*) and numeric ranges (1000000-1000999) with a value each
+A lookup returns the value of the longest prefix of the id in a trie,
+else the value of the narrowest range containing the id (binary search).
+After adding the entries build() has to be called.
+
+@author: Bastian Schroll
+"""
+
+import re
+from bisect import bisect_right
+
+PREFIX_PATTERN = re.compile("^[0-9A-F]+\*$", re.IGNORECASE)
+RANGE_PATTERN = re.compile("^[0-9]+-[0-9]+$")
+
+
+def isPattern(id):
+	"""
+	Check if an id of a list is a prefix or a range
+
+	@type    id: string
+	@param   id: id of the csv-file
+
+	@return:    True for a prefix or a range
+	"""
+	return bool(PREFIX_PATTERN.match(id) or RANGE_PATTERN.match(id))
+
+
+class PatternIndex(object):
+	"""Prefixes in a trie and ranges in sorted segments"""
+
+	def __init__(self):
+		# trie: dict per character, the value of a prefix at the key None
+		self.trie = {}
+		self.prefixCount = 0
+		# ranges as they are added: (first, last, value)
+		self.ranges = []
+		# non overlapping segments of the ranges: sorted starts, ends and values
+		self.starts = []
+		self.ends = []
+		self.values = []
+
+
+	def add(self, id, value):
+		"""
+		Add a prefix (12345*) or a range (1000000-1000999)
+
+		@type    id: string
+		@param   id: prefix or range
+		@type    value: string
+		@param   value: description
+
+		@return:    nothing
+		@exception: ValueError if the id is no prefix or range
+		"""
+		if PREFIX_PATTERN.match(id):
+			node = self.trie
+			for char in id[:-1].lower():
+				node = node.setdefault(char, {})
+			if None not in node:
+				self.prefixCount += 1
+			node[None] = value
+		elif RANGE_PATTERN.match(id):
+			(first, last) = [int(number) for number in id.split("-")]
+			if first > last:
+				raise ValueError("invalid range %s" % id)
+			self.ranges.append((first, last, value))
+		else:
+			raise ValueError("no prefix or range: %s" % id)
+
+
+	def build(self):
+		"""
+		Split the ranges into non overlapping segments, a narrower range wins over a wider one
+		has to be called after adding the entries
+
+		@return:    nothing
+		"""
+		segments = []
+		# the widest range first, the narrower ones are painted over it
+		for (first, last, value) in sorted(self.ranges, key=lambda entry: entry[0] - entry[1]):
+			painted = []
+			for (start, end, oldValue) in segments:
+				if end < first or start > last:
+					painted.append((start, end, oldValue))
+					continue
+				if start < first:
+					painted.append((start, first - 1, oldValue))
+				if end > last:
+					painted.append((last + 1, end, oldValue))
+			painted.append((first, last, value))
+			segments = sorted(painted)
+		self.starts = [start for (start, end, value) in segments]
+		self.ends = [end for (start, end, value) in segments]
+		self.values = [value for (start, end, value) in segments]
+
+
+	def find(self, id):
+		"""
+		Returns the value of the longest prefix or the narrowest range of the id
+
+		@type    id: string
+		@param   id: id to look up
+
+		@return:    value or None if no prefix or range matches
+		"""
+		result = None
+		node = self.trie
+		# the prefixes are stored lowercase (hex ids)
+		for char in id.lower():
+			node = node.get(char)
+			if node is None:
+				break
+			if None in node:
+				result = node[None]
+		if result is not None or not self.starts:
+			return result
+		try:
+			number = int(id)
+		except ValueError:
+			return None
+		index = bisect_right(self.starts, number) - 1
+		if index >= 0 and number <= self.ends[index]:
+			return self.values[index]
+		return None
+
+
+	def __len__(self):
+		return self.prefixCount + len(self.ranges)
@@ -52,10 +52,7 @@ def replaceWildcards(text, data):
 		if "ric" in data: text = text.replace("%RIC%", data["ric"])
 		if "function" in data:
 			text = text.replace("%FUNC%", data["function"])
-			if data["function"] == "1": text = text.replace("%FUNCTEXT%", globalVars.config.get("POC","rica"))
-			if data["function"] == "2": text = text.replace("%FUNCTEXT%", globalVars.config.get("POC","ricb"))
-			if data["function"] == "3": text = text.replace("%FUNCTEXT%", globalVars.config.get("POC","ricc"))
-			if data["function"] == "4": text = text.replace("%FUNCTEXT%", globalVars.config.get("POC","ricd"))
+			if data["function"] in globalVars.settings.POC.functionText: text = text.replace("%FUNCTEXT%", globalVars.settings.POC.functionText[data["function"]])
 		if "functionChar" in data: text = text.replace("%FUNCCHAR%", data["functionChar"])
 		if "msg" in data: text = text.replace("%MSG%", data["msg"])
 		if "bitrate" in data: text = text.replace("%BITRATE%", str(data["bitrate"]))
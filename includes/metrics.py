@@ -0,0 +1,346 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Metrics of the pipeline
+Every telegram gets a trace with the timestamps of its stages, from the read
+of the pipe over decoder, doubleFilter and alarm queue to the end of each plugin.
+The time of each stage is aggregated into a histogram per stage and per plugin.
+Counters (telegrams, CRC failures, filter hits, plugin calls...) and gauges
+(queue depth) complete the histograms, render() formats all of them in the
+Prometheus text format for the metrics endpoint (see metricsServer).
+
+Python 2 has no monotonic clock, the timestamps are taken with time.time()
+and negative durations (clock changes) are counted as 0.
+
+@author: Bastian Schroll
+
+@requires: none
+"""
+
+import logging
+import threading
+import time
+
+from bisect import bisect_left
+
+# upper bounds of the histogram buckets in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+#
+# ListStructure [name] = Histogram
+#
+histogramList = {}
+histogramLock = threading.Lock()
+
+#
+# ListStructure [(name, labels)] = value
+# labels is a tuple of (label, value) pairs
+#
+counterList = {}
+
+#
+# ListStructure [name] = (help, function returning a list of (labels, value))
+#
+gaugeList = {}
+
+# help texts of the counters
+COUNTERS = {
+	"telegrams": "Decoded telegrams",
+	"crc_failures": "Telegrams or codewords with a CRC error",
+	"invalid_ids": "Telegrams with an invalid id (FMS, ZVEI, RIC)",
+	"double_alarms": "Telegrams dropped by the doubleFilter",
+	"regex_filter_drops": "Alarms not passed to a plugin by the regexFilter",
+	"plugin_calls": "Calls of the run() function of a plugin",
+	"plugin_errors": "Calls of a plugin which raised an exception",
+	"subprocess_restarts": "Restarts of rtl_fm, rtl_sdr and multimon-ng",
+	"downtime_seconds": "Seconds without reception while the subprocesses of a receiver were restarted",
+	"reloads": "Reloads of the config.ini, filters and description lists"}
+
+# trace of the telegram in process (per thread)
+local = threading.local()
+
+
+class Histogram(object):
+	"""Histogram with fixed buckets, count, sum and maximum (values are added by observe())"""
+
+	def __init__(self):
+		# last bucket counts the values above the highest bound
+		self.buckets = [0] * (len(BUCKETS) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+
+	def percentile(self, percent):
+		"""
+		Estimate a percentile with the upper bound of its bucket
+
+		@type    percent: float
+		@param   percent: 0-100
+
+		@return:    seconds
+		"""
+		if not self.count:
+			return 0.0
+		rank = self.count * percent / 100.0
+		total = 0
+		for index, count in enumerate(self.buckets):
+			total += count
+			if total >= rank and count:
+				return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+		return self.max
+
+
+	def getSnapshot(self):
+		"""
+		Returns a copy of the values, has to be called with the histogramLock
+
+		@return:    Python Dict with buckets, count, sum, max, avg, p50 and p99
+		"""
+		return {"buckets": list(self.buckets),
+				"count": self.count,
+				"sum": self.sum,
+				"max": self.max,
+				"avg": self.sum / self.count if self.count else 0.0,
+				"p50": self.percentile(50),
+				"p99": self.percentile(99)}
+
+
+class Trace(object):
+	"""Timestamps of the stages of one telegram"""
+
+	def __init__(self, start):
+		"""
+		@type    start: float
+		@param   start: timestamp of the read from the pipe
+		"""
+		self.start = start
+		self.last = start
+		# ListStructure [0..n] = (stage, TimeStamp)
+		self.stamps = [("read", start)]
+
+
+	def mark(self, stage):
+		"""
+		Set the timestamp at the end of a stage, the time since the last mark is added to the histogram of the stage
+
+		@type    stage: string
+		@param   stage: name of the stage
+
+		@return:    timestamp
+		"""
+		now = time.time()
+		self.stamps.append((stage, now))
+		observe(stage, now - self.last)
+		self.last = now
+		return now
+
+
+def observe(name, value):
+	"""
+	Add a duration to a histogram, it is created with the first value
+
+	@type    name: string
+	@param   name: name of the stage (plugins: plugin.NAME.run|wait|total)
+	@type    value: float
+	@param   value: duration in seconds
+
+	@return:    nothing
+	"""
+	if value < 0:
+		value = 0.0
+	# the histogram is updated inline, this runs several times for each telegram
+	index = bisect_left(BUCKETS, value)
+	histogramLock.acquire()
+	try:
+		histogram = histogramList.get(name)
+		if histogram is None:
+			histogram = histogramList[name] = Histogram()
+		histogram.buckets[index] += 1
+		histogram.count += 1
+		histogram.sum += value
+		if value > histogram.max:
+			histogram.max = value
+	finally:
+		histogramLock.release()
+
+
+def count(name, labels=(), value=1):
+	"""
+	Increase a counter, it is created with the first call
+
+	@type    name: string
+	@param   name: name of the counter (see COUNTERS)
+	@type    labels: tuple
+	@param   labels: tuple of (label, value) pairs, always in the same order
+	@type    value: integer
+	@param   value: increment (0 registers the counter only)
+
+	@return:    nothing
+	"""
+	key = (name, labels)
+	histogramLock.acquire()
+	try:
+		counterList[key] = counterList.get(key, 0) + value
+	finally:
+		histogramLock.release()
+
+
+def addGauge(name, helpText, function):
+	"""
+	Register a gauge, the function is called with each scrape of the endpoint
+
+	@type    name: string
+	@param   name: name of the gauge
+	@type    helpText: string
+	@param   helpText: description of the gauge
+	@type    function: function
+	@param   function: returns a list of (labels, value)
+
+	@return:    nothing
+	"""
+	gaugeList[name] = (helpText, function)
+
+
+def startTrace(readTime=None):
+	"""
+	Start the trace of a new telegram in this thread
+	With the time of the pipe read, the wait for the pipeline is counted as stage pipeline
+
+	@type    readTime: float
+	@param   readTime: timestamp of the read from the pipe (None = now)
+
+	@return:    Trace
+	"""
+	if readTime is None:
+		local.trace = Trace(time.time())
+	else:
+		local.trace = Trace(readTime)
+		local.trace.mark("pipeline")
+	return local.trace
+
+
+def getTrace():
+	"""
+	Returns the trace of the telegram in process in this thread
+
+	@return:    Trace or None
+	"""
+	return getattr(local, "trace", None)
+
+
+def mark(stage):
+	"""
+	Set the end of a stage in the trace of this thread (if there is one)
+
+	@type    stage: string
+	@param   stage: name of the stage
+
+	@return:    nothing
+	"""
+	trace = getattr(local, "trace", None)
+	if trace is not None:
+		trace.mark(stage)
+
+
+def getHistograms():
+	"""
+	Returns a snapshot of all histograms, can be called at runtime from any thread
+
+	@return:    Python Dict [name] = snapshot of the histogram
+	"""
+	with histogramLock:
+		return dict((name, histogram.getSnapshot()) for name, histogram in histogramList.items())
+
+
+def getCounters():
+	"""
+	Returns a snapshot of all counters, can be called at runtime from any thread
+
+	@return:    Python Dict [(name, labels)] = value
+	"""
+	with histogramLock:
+		return dict(counterList)
+
+
+def formatLabels(labels):
+	"""
+	Format labels for the Prometheus text format
+
+	@type    labels: tuple
+	@param   labels: tuple of (label, value) pairs
+
+	@return:    string ("" without labels)
+	"""
+	if not labels:
+		return ""
+	return "{%s}" % ",".join(['%s="%s"' % (label, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for (label, value) in labels])
+
+
+def render():
+	"""
+	Format all counters, gauges and histograms in the Prometheus text format (version 0.0.4)
+	The histograms of the stages are exported as boswatch_stage_seconds,
+	the histograms plugin.NAME.run|wait|total as boswatch_plugin_seconds
+
+	@return:    string
+	"""
+	lines = []
+	counters = {}
+	for ((name, labels), value) in getCounters().items():
+		counters.setdefault(name, []).append((labels, value))
+	for name, values in sorted(counters.items()):
+		lines.append("# HELP boswatch_%s_total %s" % (name, COUNTERS.get(name, name)))
+		lines.append("# TYPE boswatch_%s_total counter" % name)
+		for (labels, value) in sorted(values):
+			lines.append("boswatch_%s_total%s %s" % (name, formatLabels(labels), value))
+
+	for name, (helpText, function) in sorted(gaugeList.items()):
+		try:
+			values = function()
+		except:
+			logging.debug("cannot get gauge %s", name, exc_info=True)
+			continue
+		lines.append("# HELP boswatch_%s %s" % (name, helpText))
+		lines.append("# TYPE boswatch_%s gauge" % name)
+		for (labels, value) in values:
+			lines.append("boswatch_%s%s %s" % (name, formatLabels(labels), value))
+
+	histograms = {"stage": [], "plugin": []}
+	for name, snapshot in sorted(getHistograms().items()):
+		if name.startswith("plugin."):
+			(pluginName, kind) = name[7:].rsplit(".", 1)
+			histograms["plugin"].append(((("plugin", pluginName), ("kind", kind)), snapshot))
+		else:
+			histograms["stage"].append(((("stage", name),), snapshot))
+	for (name, helpText) in (("stage", "Time of each stage of the pipeline"), ("plugin", "Run time, time since the alarm (wait) and since the pipe read (total) of each plugin")):
+		if not histograms[name]:
+			continue
+		lines.append("# HELP boswatch_%s_seconds %s" % (name, helpText))
+		lines.append("# TYPE boswatch_%s_seconds histogram" % name)
+		for (labels, snapshot) in histograms[name]:
+			total = 0
+			for index, bound in enumerate(BUCKETS):
+				total += snapshot["buckets"][index]
+				lines.append("boswatch_%s_seconds_bucket%s %s" % (name, formatLabels(labels + (("le", repr(bound)),)), total))
+			lines.append("boswatch_%s_seconds_bucket%s %s" % (name, formatLabels(labels + (("le", "+Inf"),)), snapshot["count"]))
+			lines.append("boswatch_%s_seconds_sum%s %r" % (name, formatLabels(labels), snapshot["sum"]))
+			lines.append("boswatch_%s_seconds_count%s %s" % (name, formatLabels(labels), snapshot["count"]))
+	return "\n".join(lines) + "\n"
+
+
+def dump():
+	"""
+	Log a table with the latencies of all stages and plugins
+
+	@return:    nothing
+	"""
+	histograms = getHistograms()
+	if not histograms:
+		return
+	logging.info("latency %-32s %8s %9s %9s %9s %9s", "stage", "count", "avg ms", "p50 ms", "p99 ms", "max ms")
+	for name, snapshot in sorted(histograms.items()):
+		logging.info("latency %-32s %8d %9.2f %9.2f %9.2f %9.2f", name, snapshot["count"], 1000 * snapshot["avg"],
+			1000 * snapshot["p50"], 1000 * snapshot["p99"], 1000 * snapshot["max"])
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+HTTP endpoint for the metrics in the Prometheus text format
+The server runs in its own thread, the metrics are only formatted when they are
+scraped, so the endpoint costs nothing in the pipeline.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import BaseHTTPServer
+import logging
+import threading
+
+from includes import globalVars  # Global variables
+from includes import metrics
+
+# local variables
+server = None
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	"""Answers GET /metrics with the rendered metrics"""
+
+	def do_GET(self):
+		if self.path.split("?")[0] not in ("/", "/metrics"):
+			self.send_error(404)
+			return
+		try:
+			body = metrics.render()
+		except:
+			logging.error("cannot render metrics")
+			logging.debug("cannot render metrics", exc_info=True)
+			self.send_error(500)
+			return
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+	def log_message(self, format, *args):
+		logging.debug("metrics endpoint: %s - %s", self.client_address[0], format % args)
+
+
+def getQueueDepths():
+	"""
+	Returns the waiting items of the pipeline, the alarm queue and the plugin lanes
+
+	@return:    list of (labels, value)
+	"""
+	from includes import alarmHandler
+	from includes import eventLoop
+	depths = []
+	if eventLoop.pipeline is not None:
+		depths.append(((("queue", "pipeline"),), eventLoop.pipeline.depth()))
+	if alarmHandler.alarmQueue is not None:
+		depths.append(((("queue", "alarmQueue"),), alarmHandler.alarmQueue.depth()))
+	for pluginName, lane in sorted(alarmHandler.pluginLanes.items()):
+		depths.append(((("queue", "lane-"+pluginName),), lane.depth()))
+	return depths
+
+
+def start():
+	"""
+	Start the metrics endpoint if metricsPort is set
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	@exception: Exception if the port cannot be opened
+	"""
+	global server
+	if not globalVars.config.has_option("BOSWatch", "metricsPort") or not globalVars.config.getint("BOSWatch", "metricsPort"):
+		return
+	address = "127.0.0.1"
+	if globalVars.config.has_option("BOSWatch", "metricsAddress"):
+		address = globalVars.config.get("BOSWatch", "metricsAddress")
+	port = globalVars.config.getint("BOSWatch", "metricsPort")
+
+	metrics.addGauge("queue_depth", "Waiting items of the pipeline, the alarm queue and the plugin lanes", getQueueDepths)
+	for process in ("rtl_fm", "multimon-ng"):
+		metrics.count("subprocess_restarts", (("process", process),), 0)
+
+	server = BaseHTTPServer.HTTPServer((address, port), MetricsHandler)
+	thread = threading.Thread(target=server.serve_forever, name="metricsServer")
+	thread.daemon = True
+	thread.start()
+	logging.info("metrics endpoint on http://%s:%s/metrics", address, port)
+
+
+def stop():
+	"""
+	Stop the metrics endpoint
+
+	@return:    nothing
+	"""
+	global server
+	if server is not None:
+		server.shutdown()
+		server.server_close()
+		server = None
+		logging.debug("metrics endpoint stopped")
@@ -28,17 +28,28 @@ def newEntrymultiList(data):
 	global multiList
 	timestamp = int(time.time())
 	# multicastAlarm processing if enabled and delimiter RIC has been received
-	if data['ric'] == globalVars.config.get("multicastAlarm", "multicastAlarm_delimiter_ric"):
+	if data['ric'] in globalVars.settings.multicastAlarm.multicastAlarm_delimiter_ric:
 		del multiList[:]
 		logging.debug("delimiter RIC received - buffer cleared")
 	else:
 		multiList.append([data, timestamp])
 		logging.debug("Added %s to multiList", data['ric'])
 		# check for old entries in multiList
-		for (xData, xTimestamp) in multiList[:]:
-			if xTimestamp < timestamp-globalVars.config.getint("multicastAlarm", "multicastAlarm_ignore_time"):
-				multiList.remove([xData, xTimestamp])
-				logging.debug("RIC %s removed - %s sec. older than current timestamp", xData['ric'], xTimestamp-timestamp)
+		expireEntries()
+
+
+def expireEntries():
+	"""
+	remove entries older than multicastAlarm_ignore_time from multiList
+
+	@return:    nothing
+	"""
+	timestamp = int(time.time())
+	ignoreTime = globalVars.settings.multicastAlarm.multicastAlarm_ignore_time
+	for (xData, xTimestamp) in multiList[:]:
+		if xTimestamp < timestamp-ignoreTime:
+			multiList.remove([xData, xTimestamp])
+			logging.debug("RIC %s removed - %s sec. older than current timestamp", xData['ric'], xTimestamp-timestamp)
 
 
 def multicastAlarmExec(freq, data):
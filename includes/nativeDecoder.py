@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Decoding of the audio in BOSWatch itself (without multimon-ng)
+The demodulators listed in nativeDemods run on the audio blocks of a receiver,
+their telegrams are handed over to the decoders in the pipeline thread of the event loop.
+
+@author: Bastian Schroll
+
+@requires: numpy, Configuration has to be set in the config.ini
+"""
+
+import logging
+import time
+
+from includes import globalVars  # Global variables
+from includes import decoder
+from includes import eventLoop
+
+# demods with a native demodulator
+nativeDemodulators = ("ZVEI", "POC512", "POC1200", "POC2400")
+
+
+def getNativeDemods():
+	"""
+	Returns the demods which should be decoded natively
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    list of demods
+	@exception: ValueError if a demod has no native demodulator
+	"""
+	demods = []
+	if globalVars.config.has_option("BOSWatch", "nativeDemods"):
+		demods = [demod.strip() for demod in globalVars.config.get("BOSWatch", "nativeDemods").split(",") if demod.strip()]
+	for demod in demods:
+		if demod not in nativeDemodulators:
+			raise ValueError("no native demodulator for %s" % demod)
+	return demods
+
+
+def getPocsagMode():
+	"""
+	Returns the decoding of POCSAG messages for multimon-ng (-f) and the native demodulator
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    alpha, numeric or auto
+	"""
+	if globalVars.config.has_option("BOSWatch", "pocsagMode"):
+		return globalVars.config.get("BOSWatch", "pocsagMode")
+	return "alpha"
+
+
+def splitDemods(demods):
+	"""
+	Split the demods of a receiver into native and multimon-ng demods
+
+	@type    demods: list
+	@param   demods: Demodulation functions (FMS|ZVEI|POC512|POC1200|POC2400)
+
+	@return:    (list of native demods, list of multimon-ng demods)
+	"""
+	native = getNativeDemods()
+	return [demod for demod in demods if demod in native], [demod for demod in demods if demod not in native]
+
+
+class NativeDecoder(object):
+	"""Native demodulators for the audio of one frequency"""
+
+	def __init__(self, freq, demods):
+		"""
+		@type    freq: integer
+		@param   freq: frequency of the audio in Hz
+		@type    demods: list
+		@param   demods: demods with a native demodulator
+		"""
+		from includes.demodulators import pocsag, zvei
+		self.freq = freq
+		self.demodulators = []
+		for demod in demods:
+			if demod == "ZVEI":
+				self.demodulators.append(zvei.ZVEIDemodulator())
+			elif demod.startswith("POC"):
+				self.demodulators.append(pocsag.POCSAGDemodulator(int(demod[3:]), mode=getPocsagMode()))
+		logging.debug("native decoder for %s Hz: %s", freq, ", ".join(demods))
+
+
+	def process(self, samples):
+		"""
+		Demodulate a block of audio and submit the telegrams to the pipeline
+
+		@type    samples: numpy array
+		@param   samples: 16 bit audio samples with 22050 Hz
+
+		@return:    nothing
+		"""
+		readTime = time.time()
+		for demodulator in self.demodulators:
+			for typ, args in demodulator.process(samples):
+				logging.debug("native %s telegram on %s Hz", typ, self.freq)
+				eventLoop.submit(decoder.decodeNative, (typ, (self.freq,) + args, readTime))
+
+
+	def finish(self):
+		"""
+		Finish running transmissions at the end of the audio
+
+		@return:    nothing
+		"""
+		import numpy
+		# one second of silence ends every transmission
+		self.process(numpy.zeros(22050, dtype=numpy.int16))
@@ -0,0 +1,689 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+A receiver is one SDR stick with its own chain of rtl_fm and multimon-ng.
+In multi channel mode more receivers are defined in the [Receivers] section
+and all feed the same decoder, filters and plugins.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import logging
+import subprocess # for starting rtl_fm and multimon-ng
+import threading  # for the channelizer and the native decoder
+import time
+
+from includes import globalVars  # Global variables
+from includes import checkSubprocesses  # check startup of the subprocesses
+from includes import eventLoop
+from includes import nativeDecoder
+from includes.helper import freqConverter
+
+# multimon-ng demodulator for each demod argument
+demodulators = {"FMS": "FMSFSK", "ZVEI": "ZVEI1", "POC512": "POCSAG512", "POC1200": "POCSAG1200", "POC2400": "POCSAG2400"}
+
+
+def getDemodulation(demods):
+	"""
+	Build the multimon-ng arguments for the demodulation
+
+	@type    demods: list
+	@param   demods: Demodulation functions (FMS|ZVEI|POC512|POC1200|POC2400)
+
+	@return:    multimon-ng arguments as string
+	@exception: KeyError if an unknown demodulation is given
+	"""
+	demodulation = ""
+	for demod in ("FMS", "ZVEI", "POC512", "POC1200", "POC2400"):
+		if demod in demods:
+			demodulation += "-a "+demodulators[demod]+" "
+	for demod in demods:
+		if demod not in demodulators:
+			raise KeyError("unknown demodulation: %s" % demod)
+	return demodulation
+
+
+def loadReceivers():
+	"""
+	Create the receivers of the [Receivers] section
+	Syntax: NAME = DEVICE;FREQUENCY;DEMOD[,DEMOD];PPM-ERROR;SQUELCH;GAIN
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    list of Receiver
+	@exception: Exception if a receiver definition is invalid
+	"""
+	receivers = []
+	logging.debug("loading receivers")
+	for key,val in globalVars.config.items("Receivers"):
+		logging.debug(" - %s = %s", key, val)
+		receiverData = [field.strip() for field in val.split(";")]
+		# PPM-error, squelch and gain are optional
+		receiverData += ["0", "0", "100"][len(receiverData)-3:]
+		receivers.append(Receiver(key,
+			int(receiverData[0]),
+			receiverData[1],
+			[demod.strip() for demod in receiverData[2].split(",")],
+			receiverData[3],
+			int(receiverData[4]),
+			int(receiverData[5])))
+	return receivers
+
+
+def loadWideband():
+	"""
+	Create the wideband receiver of the [Wideband] section
+	with the channels of the [WidebandChannels] section
+	Syntax of a channel: NAME = FREQUENCY;DEMOD[,DEMOD]
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    WidebandReceiver
+	@exception: Exception if the definition is invalid
+	"""
+	logging.debug("loading wideband channels")
+	channels = []
+	for key,val in globalVars.config.items("WidebandChannels"):
+		logging.debug(" - %s = %s", key, val)
+		channelData = [field.strip() for field in val.split(";")]
+		channels.append((key, channelData[0], [demod.strip() for demod in channelData[1].split(",")]))
+	return WidebandReceiver(globalVars.config.getint("Wideband", "device"),
+		globalVars.config.get("Wideband", "centerFreq"),
+		globalVars.config.getint("Wideband", "sampleRate"),
+		channels,
+		globalVars.config.get("Wideband", "error"),
+		globalVars.config.getint("Wideband", "gain"),
+		globalVars.config.get("Wideband", "iqFile"))
+
+
+class Receiver(object):
+	"""
+	One SDR stick with its rtl_fm and multimon-ng subprocess
+	With native demods the audio of rtl_fm is read by BOSWatch, decoded natively
+	and passed through to multimon-ng for the remaining demods.
+	"""
+
+	# bytes of audio processed at once (0.1 seconds)
+	AUDIO_BLOCK = 4410
+
+	def __init__(self, name, device, freq, demods, error=0, squelch=0, gain=100):
+		"""
+		@type    name: string
+		@param   name: Name of the receiver ("" for the single receiver from the args)
+		@type    device: integer
+		@param   device: Device you want to use (check with rtl_test)
+		@type    freq: string
+		@param   freq: Frequency you want to listen to
+		@type    demods: list
+		@param   demods: Demodulation functions (FMS|ZVEI|POC512|POC1200|POC2400)
+		@type    error: string
+		@param   error: Frequency-error of your device in PPM
+		@type    squelch: integer
+		@param   squelch: Level of squelch
+		@type    gain: integer
+		@param   gain: Level of gain
+		"""
+		self.name = name
+		self.device = device
+		self.freq = freqConverter.freqToHz(freq)
+		self.demods = demods
+		self.nativeDemods, multimonDemods = nativeDecoder.splitDemods(demods)
+		self.demodulation = getDemodulation(multimonDemods)
+		self.decoder = None
+		self.thread = None
+		self.replay = None
+		self.error = error
+		self.squelch = squelch
+		self.gain = gain
+		self.rtl_fm = None
+		self.multimon_ng = None
+		# time of the last audio block read by BOSWatch
+		self.lastAudio = None
+		# ListStructure [logFile] = size of the logfile at the start of the subprocess
+		self.logOffsets = {}
+		if name:
+			self.rtlLog = "rtl_fm_"+name+".log"
+			self.multimonLog = "multimon_"+name+".log"
+		else:
+			self.rtlLog = "rtl_fm.log"
+			self.multimonLog = "multimon.log"
+
+
+	def __str__(self):
+		return "%s (device %s, %s Hz)" % (self.name or "receiver", self.device, self.freq)
+
+
+	def clearLogs(self):
+		"""
+		Clear the logfiles of the subprocesses
+
+		@return:    nothing
+		"""
+		for logFile in (self.rtlLog, self.multimonLog):
+			open(globalVars.log_path+logFile, "w").close()
+
+
+	def startRTL(self):
+		"""
+		Start rtl_fm
+
+		@return:    nothing
+		@exception: OSError when rtl_fm returns an error
+		"""
+		logging.debug("starting rtl_fm for %s", self)
+		command = ""
+		if globalVars.config.has_option("BOSWatch","rtl_path"):
+			command = globalVars.config.get("BOSWatch","rtl_path")
+		command = command+"rtl_fm -d "+str(self.device)+" -f "+str(self.freq)+" -M fm -p "+str(self.error)+" -E DC -F 0 -l "+str(self.squelch)+" -g "+str(self.gain)+" -s 22050"
+		self.logOffsets[self.rtlLog] = checkSubprocesses.getLogSize(self.rtlLog)
+		logFile = open(globalVars.log_path+self.rtlLog,"a")
+		try:
+			self.rtl_fm = subprocess.Popen(command.split(),
+					#stdin=rtl_fm.stdout,
+					stdout=subprocess.PIPE,
+					stderr=logFile,
+					shell=False)
+		finally:
+			# rtl_fm has its own handle of the logfile
+			logFile.close()
+		# rtl_fm doesn't self-destruct, when an error occurs
+		# wait until it has tuned the stick or written an error into the logfile
+		checkSubprocesses.waitReady("rtl_fm", self.rtl_fm, self.rtlLog, checkSubprocesses.RTL_READY, checkSubprocesses.RTL_ERRORS,
+			self.logOffsets[self.rtlLog], checkSubprocesses.getStartupTimeout())
+
+
+	def startReplay(self, fileName, speed=0):
+		"""
+		Use a recorded audio file instead of rtl_fm
+
+		@type    fileName: string
+		@param   fileName: WAV or raw file (16 bit, 22050 Hz, mono)
+		@type    speed: float
+		@param   speed: real-time factor (0 = as fast as possible)
+
+		@return:    nothing
+		@exception: Exception if the file cannot be opened
+		"""
+		from includes import replayHandler
+		self.replay = replayHandler.ReplaySource(fileName, 44100, speed)
+
+
+	def startMultimon(self):
+		"""
+		Start multimon-ng, reading the output of rtl_fm
+		With native demods or a replay the audio thread is started too,
+		multimon-ng is only needed if there are demods left for it
+
+		@return:    nothing
+		@exception: OSError when multimon-ng returns an error
+		"""
+		if self.demodulation:
+			logging.debug("starting multimon-ng for %s", self)
+			command = ""
+			if globalVars.config.has_option("BOSWatch","multimon_path"):
+				command = globalVars.config.get("BOSWatch","multimon_path")
+			command = command+"multimon-ng "+str(self.demodulation)+" -f "+nativeDecoder.getPocsagMode()+" -t raw /dev/stdin - "
+			self.logOffsets[self.multimonLog] = checkSubprocesses.getLogSize(self.multimonLog)
+			logFile = open(globalVars.log_path+self.multimonLog,"a")
+			try:
+				self.multimon_ng = subprocess.Popen(command.split(),
+					stdin=subprocess.PIPE if self.nativeDemods or self.replay else self.rtl_fm.stdout,
+					stdout=subprocess.PIPE,
+					stderr=logFile,
+					shell=False)
+			finally:
+				# multimon-ng has its own handle of the logfile
+				logFile.close()
+			# multimon-ng  doesn't self-destruct, when an error occurs
+			# wait until it has listed the demodulators or written an error into the logfile
+			checkSubprocesses.waitReady("multimon-ng", self.multimon_ng, self.multimonLog, checkSubprocesses.MULTIMON_READY, checkSubprocesses.MULTIMON_ERRORS,
+				self.logOffsets[self.multimonLog], checkSubprocesses.getStartupTimeout())
+
+		if self.nativeDemods or self.replay:
+			if self.nativeDemods:
+				self.decoder = nativeDecoder.NativeDecoder(self.freq, self.nativeDemods)
+			eventLoop.addProducer()
+			self.thread = threading.Thread(target=self.runAudio, name="audio-"+(self.name or "receiver"))
+			self.thread.daemon = True
+			self.thread.start()
+
+
+	def runAudio(self):
+		"""
+		Read the audio of rtl_fm (or the replay), decode it natively and pass it through to multimon-ng
+		runs in its own thread until the audio ends
+
+		@return:    nothing
+		"""
+		logging.debug("audio thread of %s started", self)
+		source = self.replay or self.rtl_fm.stdout
+		if self.decoder:
+			import numpy
+		try:
+			while True:
+				block = source.read(self.AUDIO_BLOCK)
+				if not block:
+					break
+				self.lastAudio = time.time()
+				if self.decoder:
+					self.decoder.process(numpy.frombuffer(block[:len(block)//2*2], dtype=numpy.int16))
+				if self.multimon_ng:
+					self.multimon_ng.stdin.write(block)
+		except:
+			logging.error("error in audio thread of %s", self)
+			logging.debug("error in audio thread of %s", self, exc_info=True)
+		finally:
+			if self.decoder:
+				self.decoder.finish()
+			if self.multimon_ng:
+				try:
+					self.multimon_ng.stdin.close()
+				except:
+					pass
+			eventLoop.removeProducer()
+			logging.debug("audio thread of %s finished", self)
+
+
+	def getStreams(self):
+		"""
+		Returns the output streams of multimon-ng
+
+		@return:    list of (stream, frequency in Hz)
+		"""
+		if not self.multimon_ng:
+			return []
+		return [(self.multimon_ng.stdout, self.freq)]
+
+
+	def stop(self):
+		"""
+		Terminate multimon-ng and rtl_fm
+
+		@return:    nothing
+		"""
+		if self.multimon_ng and self.multimon_ng.pid:
+			logging.debug("terminate multimon-ng (%s)", self.multimon_ng.pid)
+			if self.multimon_ng.poll() is None:
+				self.multimon_ng.terminate()
+			self.multimon_ng.wait()
+			logging.debug("multimon-ng terminated")
+		if self.rtl_fm and self.rtl_fm.pid:
+			logging.debug("terminate rtl_fm (%s)", self.rtl_fm.pid)
+			if self.rtl_fm.poll() is None:
+				self.rtl_fm.terminate()
+			self.rtl_fm.wait()
+			logging.debug("rtl_fm terminated")
+		if self.replay:
+			self.replay.close()
+
+
+	def isLive(self):
+		"""
+		Check if the receiver uses the SDR stick (no replay), only then it can be restarted
+
+		@return:    True with rtl_fm
+		"""
+		return self.rtl_fm is not None
+
+
+	def getProcesses(self):
+		"""
+		Returns the subprocesses for the supervisor
+
+		@return:    list of (name, Popen, logfile, error messages)
+		"""
+		processes = []
+		if self.rtl_fm:
+			processes.append(("rtl_fm", self.rtl_fm, self.rtlLog, checkSubprocesses.RTL_ERRORS))
+		if self.multimon_ng:
+			processes.append(("multimon-ng", self.multimon_ng, self.multimonLog, checkSubprocesses.MULTIMON_ERRORS))
+		return processes
+
+
+	def getLastAudio(self):
+		"""
+		Returns the time of the last audio block, if BOSWatch reads the audio itself
+
+		@return:    timestamp (0 if nothing was read yet) or None if rtl_fm feeds multimon-ng directly
+		"""
+		if not self.thread:
+			return None
+		return self.lastAudio or 0
+
+
+	def restart(self):
+		"""
+		Restart the chain of rtl_fm and multimon-ng
+		runs in the restart thread of the supervisor, the streams are removed from
+		the event loop before and the new ones added after
+
+		@return:    nothing
+		@exception: OSError when a subprocess returns an error
+		"""
+		for (stream, freq) in self.getStreams():
+			stream.close()
+		self.stop()
+		if self.thread:
+			# the audio thread ends with the stdout of rtl_fm
+			self.thread.join(5)
+			self.thread = None
+		# if the start fails, the next restart mustn't find the closed streams of the old chain
+		self.rtl_fm = None
+		self.multimon_ng = None
+		self.startRTL()
+		self.startMultimon()
+
+
+	def checkHealth(self):
+		"""
+		Check if the subprocesses are still running
+
+		@return:    True if both are running
+		"""
+		healthy = True
+		if self.rtl_fm and self.rtl_fm.poll() is not None:
+			logging.error("rtl_fm of %s terminated with %s", self, self.rtl_fm.returncode)
+			healthy = False
+		if self.multimon_ng and self.multimon_ng.poll() is not None:
+			logging.error("multimon-ng of %s terminated with %s", self, self.multimon_ng.returncode)
+			healthy = False
+		return healthy
+
+
+class WidebandReceiver(object):
+	"""
+	One SDR stick capturing a wideband IQ stream with rtl_sdr (or a recorded IQ file)
+	The channels are separated by the channelizer, each channel has its own multimon-ng
+	and/or native decoder
+	"""
+
+	# bytes of IQ data processed at once
+	BLOCK_SIZE = 262144
+
+	def __init__(self, device, centerFreq, sampleRate, channels, error=0, gain=100, iqFile=""):
+		"""
+		@type    device: integer
+		@param   device: Device you want to use (check with rtl_test)
+		@type    centerFreq: string
+		@param   centerFreq: Center frequency of the stick
+		@type    sampleRate: integer
+		@param   sampleRate: Sample rate, must be a multiple of 22050
+		@type    channels: list
+		@param   channels: (name, frequency, demods) for each channel
+		@type    error: string
+		@param   error: Frequency-error of your device in PPM
+		@type    gain: integer
+		@param   gain: Level of gain
+		@type    iqFile: string
+		@param   iqFile: Recorded IQ file (unsigned 8 bit) to use instead of rtl_sdr
+		"""
+		from includes.channelizer import Channelizer
+		self.name = "wideband"
+		self.device = device
+		self.centerFreq = freqConverter.freqToHz(centerFreq)
+		self.freq = self.centerFreq
+		self.sampleRate = sampleRate
+		self.error = error
+		self.gain = gain
+		self.iqFile = iqFile
+		self.channels = []
+		for (name, freq, demods) in channels:
+			nativeDemods, multimonDemods = nativeDecoder.splitDemods(demods)
+			channel = {"name": name, "freq": freqConverter.freqToHz(freq), "demodulation": getDemodulation(multimonDemods), "multimon_ng": None, "decoder": None}
+			if nativeDemods:
+				channel["decoder"] = nativeDecoder.NativeDecoder(channel["freq"], nativeDemods)
+			self.channels.append(channel)
+		self.channelizer = Channelizer(sampleRate, self.centerFreq, [channel["freq"] for channel in self.channels])
+		self.rtl_sdr = None
+		self.source = None
+		self.thread = None
+		self.rtlLog = "rtl_sdr.log"
+		# time of the last IQ block
+		self.lastAudio = None
+		# ListStructure [logFile] = size of the logfile at the start of the subprocess
+		self.logOffsets = {}
+
+
+	def __str__(self):
+		return "wideband receiver (device %s, %s Hz, %s channels)" % (self.device, self.centerFreq, len(self.channels))
+
+
+	def clearLogs(self):
+		"""
+		Clear the logfiles of the subprocesses
+
+		@return:    nothing
+		"""
+		open(globalVars.log_path+self.rtlLog, "w").close()
+		for channel in self.channels:
+			open(globalVars.log_path+"multimon_"+channel["name"]+".log", "w").close()
+
+
+	def startRTL(self):
+		"""
+		Start rtl_sdr or open the IQ file
+
+		@return:    nothing
+		@exception: OSError when rtl_sdr returns an error
+		"""
+		if self.iqFile:
+			logging.debug("reading IQ file %s", self.iqFile)
+			self.source = open(self.iqFile, "rb")
+			return
+		logging.debug("starting rtl_sdr for %s", self)
+		command = ""
+		if globalVars.config.has_option("BOSWatch","rtl_path"):
+			command = globalVars.config.get("BOSWatch","rtl_path")
+		command = command+"rtl_sdr -d "+str(self.device)+" -f "+str(self.centerFreq)+" -s "+str(self.sampleRate)+" -p "+str(self.error)+" -g "+str(self.gain)+" -"
+		self.logOffsets[self.rtlLog] = checkSubprocesses.getLogSize(self.rtlLog)
+		logFile = open(globalVars.log_path+self.rtlLog,"a")
+		try:
+			self.rtl_sdr = subprocess.Popen(command.split(),
+					stdout=subprocess.PIPE,
+					stderr=logFile,
+					shell=False)
+		finally:
+			# rtl_sdr has its own handle of the logfile
+			logFile.close()
+		self.source = self.rtl_sdr.stdout
+		# wait until it has tuned the stick or written an error into the logfile
+		checkSubprocesses.waitReady("rtl_sdr", self.rtl_sdr, self.rtlLog, checkSubprocesses.RTL_READY, checkSubprocesses.RTL_ERRORS,
+			self.logOffsets[self.rtlLog], checkSubprocesses.getStartupTimeout())
+
+
+	def startReplay(self, fileName, speed=0):
+		"""
+		Use a recorded IQ file (unsigned 8 bit) instead of rtl_sdr
+
+		@type    fileName: string
+		@param   fileName: raw IQ file with the sample rate of the [Wideband] section
+		@type    speed: float
+		@param   speed: real-time factor (0 = as fast as possible)
+
+		@return:    nothing
+		@exception: Exception if the file cannot be opened
+		"""
+		from includes import replayHandler
+		self.source = replayHandler.ReplaySource(fileName, self.sampleRate * 2, speed)
+
+
+	def startMultimon(self):
+		"""
+		Start one multimon-ng for each channel and the channelizer thread
+
+		@return:    nothing
+		@exception: OSError when multimon-ng returns an error
+		"""
+		for channel in [channel for channel in self.channels if channel["demodulation"]]:
+			logging.debug("starting multimon-ng for channel %s (%s Hz)", channel["name"], channel["freq"])
+			command = ""
+			if globalVars.config.has_option("BOSWatch","multimon_path"):
+				command = globalVars.config.get("BOSWatch","multimon_path")
+			command = command+"multimon-ng "+channel["demodulation"]+" -f "+nativeDecoder.getPocsagMode()+" -t raw /dev/stdin - "
+			self.logOffsets["multimon_"+channel["name"]+".log"] = checkSubprocesses.getLogSize("multimon_"+channel["name"]+".log")
+			logFile = open(globalVars.log_path+"multimon_"+channel["name"]+".log","a")
+			try:
+				channel["multimon_ng"] = subprocess.Popen(command.split(),
+					stdin=subprocess.PIPE,
+					stdout=subprocess.PIPE,
+					stderr=logFile,
+					shell=False)
+			finally:
+				# multimon-ng has its own handle of the logfile
+				logFile.close()
+		# all multimon-ng start in parallel, wait until each one has listed the demodulators or written an error
+		for channel in [channel for channel in self.channels if channel["demodulation"]]:
+			checkSubprocesses.waitReady("multimon-ng", channel["multimon_ng"], "multimon_"+channel["name"]+".log", checkSubprocesses.MULTIMON_READY, checkSubprocesses.MULTIMON_ERRORS,
+				self.logOffsets["multimon_"+channel["name"]+".log"], checkSubprocesses.getStartupTimeout())
+
+		eventLoop.addProducer()
+		self.thread = threading.Thread(target=self.runChannelizer, name="channelizer")
+		self.thread.daemon = True
+		self.thread.start()
+
+
+	def runChannelizer(self):
+		"""
+		Read the IQ stream, channelize it and feed the audio to multimon-ng
+		runs in its own thread until the stream ends
+
+		@return:    nothing
+		"""
+		logging.debug("channelizer started")
+		try:
+			while True:
+				block = self.source.read(self.BLOCK_SIZE)
+				if not block:
+					break
+				self.lastAudio = time.time()
+				audio = self.channelizer.process(block)
+				for index, channel in enumerate(self.channels):
+					if channel["decoder"]:
+						channel["decoder"].process(audio[index])
+					if channel["multimon_ng"]:
+						channel["multimon_ng"].stdin.write(audio[index].tostring())
+		except:
+			logging.error("error in channelizer")
+			logging.debug("error in channelizer", exc_info=True)
+		finally:
+			# multimon-ng ends with the end of his input
+			for channel in self.channels:
+				if channel["decoder"]:
+					channel["decoder"].finish()
+				try:
+					channel["multimon_ng"].stdin.close()
+				except:
+					pass
+			eventLoop.removeProducer()
+			logging.debug("channelizer finished")
+
+
+	def getStreams(self):
+		"""
+		Returns the output streams of multimon-ng
+
+		@return:    list of (stream, frequency in Hz)
+		"""
+		return [(channel["multimon_ng"].stdout, channel["freq"]) for channel in self.channels if channel["multimon_ng"]]
+
+
+	def stop(self):
+		"""
+		Terminate rtl_sdr and all multimon-ng
+
+		@return:    nothing
+		"""
+		if self.rtl_sdr and self.rtl_sdr.pid:
+			logging.debug("terminate rtl_sdr (%s)", self.rtl_sdr.pid)
+			if self.rtl_sdr.poll() is None:
+				self.rtl_sdr.terminate()
+			self.rtl_sdr.wait()
+			logging.debug("rtl_sdr terminated")
+		for channel in self.channels:
+			if channel["multimon_ng"] and channel["multimon_ng"].pid:
+				logging.debug("terminate multimon-ng (%s)", channel["multimon_ng"].pid)
+				if channel["multimon_ng"].poll() is None:
+					channel["multimon_ng"].terminate()
+				channel["multimon_ng"].wait()
+				logging.debug("multimon-ng terminated")
+		if self.source and not self.rtl_sdr:
+			self.source.close()
+
+
+	def isLive(self):
+		"""
+		Check if the receiver uses the SDR stick (no IQ file or replay), only then it can be restarted
+
+		@return:    True with rtl_sdr
+		"""
+		return self.rtl_sdr is not None
+
+
+	def getProcesses(self):
+		"""
+		Returns the subprocesses for the supervisor
+
+		@return:    list of (name, Popen, logfile, error messages)
+		"""
+		processes = []
+		if self.rtl_sdr:
+			processes.append(("rtl_sdr", self.rtl_sdr, self.rtlLog, checkSubprocesses.RTL_ERRORS))
+		for channel in self.channels:
+			if channel["multimon_ng"]:
+				processes.append(("multimon-ng", channel["multimon_ng"], "multimon_"+channel["name"]+".log", checkSubprocesses.MULTIMON_ERRORS))
+		return processes
+
+
+	def getLastAudio(self):
+		"""
+		Returns the time of the last IQ block
+
+		@return:    timestamp (0 if nothing was read yet)
+		"""
+		return self.lastAudio or 0
+
+
+	def restart(self):
+		"""
+		Restart rtl_sdr, all multimon-ng and the channelizer
+		runs in the restart thread of the supervisor, the streams are removed from
+		the event loop before and the new ones added after
+
+		@return:    nothing
+		@exception: OSError when a subprocess returns an error
+		"""
+		for (stream, freq) in self.getStreams():
+			stream.close()
+		self.stop()
+		if self.thread:
+			# the channelizer ends with the stdout of rtl_sdr
+			self.thread.join(5)
+			self.thread = None
+		# if the start fails, the next restart mustn't find the closed streams of the old chain
+		self.rtl_sdr = None
+		self.source = None
+		for channel in self.channels:
+			channel["multimon_ng"] = None
+		self.startRTL()
+		self.startMultimon()
+
+
+	def checkHealth(self):
+		"""
+		Check if the subprocesses are still running
+
+		@return:    True if all are running
+		"""
+		healthy = True
+		if self.rtl_sdr and self.rtl_sdr.poll() is not None:
+			logging.error("rtl_sdr terminated with %s", self.rtl_sdr.returncode)
+			healthy = False
+		for channel in self.channels:
+			if channel["multimon_ng"] and channel["multimon_ng"].poll() is not None:
+				logging.error("multimon-ng of channel %s terminated with %s", channel["name"], channel["multimon_ng"].returncode)
+				healthy = False
+		return healthy
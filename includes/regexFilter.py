@@ -4,6 +4,14 @@
 """
 Functions for the RegEX filter
 
+Besides a RegEX a filter can be a set of values (set:), numeric ranges (range:)
+or prefixes (prefix:), they are looked up in a hash set or with a binary search.
+
+The filters are compiled once at loading and grouped by typ, plugin and frequency
+(with the filters for all plugins and all frequencies merged in), so an alarm is
+only checked against the filters of its plugins and every filter is evaluated at
+most once per alarm.
+
 @author: Bastian Schroll
 
 @requires: Configuration has to be set in the config.ini
@@ -14,11 +22,17 @@ import re #Regex for Filter Check
 
 from includes import globalVars  # Global variables
 from includes.helper import freqConverter  # converter functions
+from includes.helper import idList  # sets, ranges and prefixes
 
 
 # local variables
 filterList = []
 
+#
+# ListStructure [(typ, plugin, freq)] = filters of filterList for this typ, plugin or "*" and freq or "*" - in order of the config.ini
+#
+routeCache = {}
+
 
 def loadFilters():
 	"""
@@ -29,28 +43,159 @@ def loadFilters():
 	@return:    nothing
 	"""
 	try:
-		logging.debug("loading filters")
-		# For each entry in config.ini [Filters] section
-		for key,val in globalVars.config.items("Filters"):
-			logging.debug(" - %s = %s", key, val)
-			filterData = val.split(";")
-
-			# resolve the * for freqToHz()
-			if not filterData[3] == "*":
-				filterData[3] = freqConverter.freqToHz(filterData[3])
-
-			# insert splitet data into filterList
-			filterList.append({"name": key, "typ": filterData[0], "dataField": filterData[1], "plugin": filterData[2], "freq": filterData[3], "regex": filterData[4]})
+		setFilters(buildFilters(globalVars.config))
 	except:
 		logging.error("cannot read config file")
 		logging.debug("cannot read config file", exc_info=True)
 		return
 
 
+def buildFilters(config):
+	"""
+	Build the filters of the [Filters] section (used by loadFilters() and the reload)
+
+	@type    config: ConfigParser
+	@param   config: the read config.ini
+
+	@return:    list of filters for setFilters()
+	@exception: Exception if the section cannot be read
+	"""
+	logging.debug("loading filters")
+	newFilterList = []
+	# For each entry in config.ini [Filters] section
+	for key,val in config.items("Filters"):
+		logging.debug(" - %s = %s", key, val)
+		filterData = val.split(";")
+
+		# resolve the * for freqToHz()
+		if not filterData[3] == "*":
+			filterData[3] = freqConverter.freqToHz(filterData[3])
+
+		try:
+			match = getMatch(filterData[4])
+		except (re.error, ValueError):
+			# like the check of an invalid RegEX with every alarm before, the alarm will pass
+			logging.error("invalid rule in filter %s: %s - the filter lets all alarms pass", key, filterData[4])
+			match = lambda value: True
+
+		# insert splitet data into filterList
+		newFilterList.append({"name": key, "typ": filterData[0], "dataField": filterData[1], "plugin": filterData[2], "freq": filterData[3], "regex": filterData[4], "match": match})
+	return newFilterList
+
+
+def setFilters(newFilterList):
+	"""
+	Replace the filters, the routes are built again with the first alarm of each typ, plugin and freq
+
+	@type    newFilterList: list
+	@param   newFilterList: filters of buildFilters()
+
+	@return:    nothing
+	"""
+	global filterList, routeCache
+	filterList = newFilterList
+	routeCache = {}
+
+
+def getMatch(rule):
+	"""
+	Returns the function to check the value of the data field with the rule of a filter
+
+	set:1234567,1234568          - one of the values
+	range:1000000-1999999,...    - a number in one of the ranges (first and last included)
+	prefix:12345,23456           - starts with one of the prefixes
+	everything else              - RegEX
+
+	@type    rule: string
+	@param   rule: rule of the filter in the config.ini
+
+	@return:    function(value) - True (or a match) if the value passes
+	@exception: re.error if the RegEX is invalid
+	@exception: ValueError if a range is invalid
+	"""
+	(kind, separator, entries) = rule.partition(":")
+	entries = [entry.strip() for entry in entries.split(",") if entry.strip()]
+	if separator and kind == "set":
+		return idList.IdList(values=entries).__contains__
+	if separator and kind == "range":
+		return idList.IdList(ranges=[idList.parseRange(entry) for entry in entries]).__contains__
+	if separator and kind == "prefix":
+		return idList.IdList(prefixes=entries).__contains__
+	return re.compile(rule).search
+
+
+def getRoute(typ, plugin, freq):
+	"""
+	Returns the filters of the plugin for the typ at the frequency (built with the first call)
+
+	@type    typ:  string (FMS|ZVEI|POC)
+	@param   typ:  Typ of the dataset
+	@type    plugin: string
+	@param   plugin: Name of the plugin
+	@type    freq: string
+	@param   freq: frequency of the SDR Stick
+
+	@return:    list of filters in order of the config.ini
+	"""
+	# setFilters() replaces filterList before routeCache, a route of the old filters never gets into the new cache
+	cache = routeCache
+	route = cache.get((typ, plugin, freq))
+	if route is None:
+		route = [i for i in filterList if i["typ"] == typ and (i["plugin"] == plugin or i["plugin"] == "*") and (i["freq"] == freq or i["freq"] == "*")]
+		cache[(typ, plugin, freq)] = route
+	return route
+
+
+def getAllowedPlugins(typ, data, freq, plugins):
+	"""
+	Check the alarm with the RegEX filter for all plugins in one pass
+	A plugin is allowed if one of his filters (or a filter for all plugins) passes.
+	Plugins without a filter are not allowed.
+
+	@type    typ:  string (FMS|ZVEI|POC)
+	@param   typ:  Typ of the dataset
+	@type    data: map of data (structure see readme.md in plugin folder)
+	@param   data: Contains the parameter
+	@type    freq: string
+	@param   freq: frequency of the SDR Stick
+	@type    plugins: list
+	@param   plugins: Names of the plugins to check
+
+	@requires:  all filters in the filterList
+
+	@return:    set of the allowed plugin names
+	"""
+	logging.debug("search Filter for %s at %s Hz", typ, freq)
+	allowed = set()
+	# results of the filters shared by the plugins ("*")
+	results = {}
+	for plugin in plugins:
+		for i in getRoute(typ, plugin, freq):
+			passed = results.get(i["name"])
+			if passed is None:
+				try:
+					passed = bool(i["match"](data[i["dataField"]]))
+				except:
+					logging.error("Error in filter checking")
+					logging.debug("Error in filter checking", exc_info=True)
+					# something goes wrong, data will path
+					passed = True
+				results[i["name"]] = passed
+			if passed:
+				logging.debug("Filter passed: %s", i["name"])
+				if i["plugin"] == "*":
+					return set(plugins)
+				# his other filters needn't be checked
+				allowed.add(plugin)
+				break
+	logging.debug("Filter passed for: %s", ", ".join(sorted(allowed)) or "no plugin")
+	return allowed
+
+
 def checkFilters(typ, data, plugin, freq):
 	"""
 	Check the Typ/Plugin combination with the RegEX filter
-	If no filter for the combination is found, function returns True.
+	If no filter for the combination is found, function returns False.
 
 	@type    typ:  string (FMS|ZVEI|POC)
 	@param   typ:  Typ of the dataset
@@ -63,35 +208,6 @@ def checkFilters(typ, data, plugin, freq):
 
 	@requires:  all filters in the filterList
 
-	@return:    nothing
+	@return:    True if a filter passed
 	"""
-	global filterList
-	try:
-		logging.debug("search Filter for %s to %s at %s Hz", typ, plugin, freq)
-
-		foundFilter = False
-		# go to all filter in filterList
-		for i in filterList:
-			# if typ/plugin/freq combination is found
-			if i["typ"] == typ and (i["plugin"] == plugin or i['plugin'] == "*") and (i["freq"] == freq or i['freq'] == "*"):
-				foundFilter = True
-				logging.debug("found Filter: %s = %s", i["name"], i["regex"])
-				# Check the RegEX
-				if re.search(i["regex"], data[i["dataField"]]):
-					logging.debug("Filter passed: %s", i["name"])
-					return True
-				else:
-					logging.debug("Filter not passed: %s", i["name"])
-
-		if foundFilter:
-			logging.debug("no Filter passed")
-			return False
-		else:
-			logging.debug("no Filter found")
-			return False
-
-	except:
-		logging.error("Error in filter checking")
-		logging.debug("Error in filter checking", exc_info=True)
-		# something goes wrong, data will path
-		return True
+	return plugin in getAllowedPlugins(typ, data, freq, [plugin])
@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Reload of the config.ini, the filters and the description lists without a restart
+of rtl_fm and multimon-ng
+
+A reload is started with the HUP signal (kill -HUP <pid>) or, with reloadWatchInterval,
+when the config.ini or a csv-file changes. The new config, settings, filters and
+description lists are built in the reload thread beside the running ones and swapped
+between two telegrams (decoder.decodeLock). If the build fails, the old ones stay.
+The receivers, the plugins to load and the options of the event loop need a restart.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import ConfigParser # for parse the config file
+import logging # Global logger
+import os
+import signal
+import threading
+import time
+
+from includes import globalVars  # Global variables
+from includes import metrics  # count the reloads
+
+# set by the HUP signal
+reloadEvent = threading.Event()
+
+
+def getWatchedFiles():
+	"""
+	Returns the paths of the config.ini and the csv-files
+
+	@return:    list of paths
+	"""
+	return [globalVars.script_path+"/config/config.ini"] + [globalVars.script_path+"/csv/"+typ+".csv" for typ in ("fms", "zvei", "poc")]
+
+
+def getModificationTimes():
+	"""
+	Returns the modification times of the watched files
+
+	@return:    Python dict [path] = mtime (None for a missing file)
+	"""
+	times = {}
+	for path in getWatchedFiles():
+		try:
+			times[path] = os.path.getmtime(path)
+		except OSError:
+			times[path] = None
+	return times
+
+
+def reload(reason):
+	"""
+	Build the config, settings, filters and description lists again and swap them between two telegrams
+
+	@type    reason: string
+	@param   reason: cause of the reload for the log
+
+	@return:    nothing
+	@exception: Exception if the new config cannot be read or the lists cannot be built (nothing is swapped)
+	"""
+	from includes import decoder
+	from includes import descriptionList
+	from includes import regexFilter
+	from includes import settings
+
+	logging.info("reload started (%s)", reason)
+	startTime = time.time()
+	config = ConfigParser.ConfigParser()
+	if not config.read(globalVars.script_path+"/config/config.ini"):
+		raise IOError("cannot read config.ini")
+	newSettings = settings.Settings(config)
+	filters = []
+	if newSettings.BOSWatch.useRegExFilter:
+		filters = regexFilter.buildFilters(config)
+	lists = descriptionList.buildDescriptionLists(config, newSettings)
+
+	# swap between two telegrams
+	swapTime = time.time()
+	with decoder.decodeLock:
+		oldConfig = globalVars.config
+		globalVars.config = config
+		globalVars.settings = newSettings
+		regexFilter.setFilters(filters)
+		oldLists = descriptionList.setDescriptionLists(lists)
+	swapTime = time.time() - swapTime
+
+	# the databases of the sqlite backend are not used any longer
+	for oldList in oldLists:
+		if hasattr(oldList, "close"):
+			oldList.close()
+
+	if oldConfig.items("Plugins") != config.items("Plugins"):
+		logging.warning("reload: the [Plugins] section has changed - loading or unloading plugins needs a restart")
+	metrics.count("reloads")
+	logging.info("reload finished in %.2f s (swap %.1f ms)", time.time() - startTime, swapTime * 1000)
+
+
+def run(interval):
+	"""
+	Wait for the HUP signal or a change of the watched files and reload, runs in the reload thread
+
+	@type    interval: integer
+	@param   interval: seconds between the checks of the watched files (0 - only the HUP signal)
+
+	@return:    nothing
+	"""
+	times = getModificationTimes()
+	while True:
+		if reloadEvent.wait(interval or None):
+			reloadEvent.clear()
+			reason = "HUP signal"
+		else:
+			newTimes = getModificationTimes()
+			if newTimes == times:
+				continue
+			reason = "changed " + ", ".join(os.path.basename(path) for path in sorted(newTimes) if newTimes[path] != times[path])
+		# a change during the reload starts the next one
+		times = getModificationTimes()
+		try:
+			reload(reason)
+		except:
+			logging.error("reload failed - the old config stays active")
+			logging.debug("reload failed", exc_info=True)
+
+
+def sighup_handler(_signo, _stack_frame):
+	"""
+	HUP-Handler, starts a reload in the reload thread
+
+	@type    _signo: signalnum
+	@param   _signo: signal number
+	@type    _stack_frame: frame object
+	@param   _stack_frame: current stack frame
+
+	@return:    nothing
+	"""
+	logging.info("HUP signal received")
+	reloadEvent.set()
+
+
+def start():
+	"""
+	Install the HUP-Handler and start the reload thread, has to be called from the main thread
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	"""
+	interval = 0
+	if globalVars.config.has_option("BOSWatch", "reloadWatchInterval"):
+		interval = globalVars.config.getint("BOSWatch", "reloadWatchInterval")
+	metrics.count("reloads", value=0)
+	signal.signal(signal.SIGHUP, sighup_handler)
+	# restart the blocking reads of the main thread after the signal
+	signal.siginterrupt(signal.SIGHUP, False)
+	thread = threading.Thread(target=run, args=(interval,), name="reload")
+	thread.daemon = True
+	thread.start()
+	logging.debug("reload thread started (watch interval %s s)", interval)
@@ -0,0 +1,258 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Replay of recorded audio (WAV or raw 16 bit, 22050 Hz, mono) or IQ files
+(unsigned 8 bit, wideband mode) instead of the SDR stick.
+The file is read as fast as possible or paced with a real-time factor,
+at the end the decoded telegrams per second and the CPU time per audio second are reported.
+
+A capture of the multimon-ng output (mm_raw.txt) is replayed line by line into
+the decoder, with the original timing if it was written with writeMultimonRawTime.
+At the end the throughput and latency percentiles of each stage are reported.
+
+@author: Bastian Schroll
+
+@requires: none
+"""
+
+import logging
+import os
+import re
+import time
+import wave
+
+from includes import decoder
+
+# first line of a capture: optional timestamp and the prefix of a multimon-ng demod
+CAPTURE_LINE = re.compile(r"^(\d+\.\d+ )?[A-Z][A-Z0-9]*:")
+
+#
+# all opened replay sources and the start of the replay
+#
+sourceList = []
+startTime = None
+startCpu = None
+
+
+class ReplaySource(object):
+	"""File object replacing the stdout of rtl_fm or rtl_sdr"""
+
+	def __init__(self, fileName, bytesPerSecond, speed=0):
+		"""
+		@type    fileName: string
+		@param   fileName: WAV file or raw file
+		@type    bytesPerSecond: integer
+		@param   bytesPerSecond: bytes of one second (44100 for audio, 2 * sample rate for IQ)
+		@type    speed: float
+		@param   speed: real-time factor (0 = as fast as possible)
+
+		@exception: ValueError if the format of a WAV file doesn't fit
+		"""
+		self.fileName = fileName
+		self.bytesPerSecond = bytesPerSecond
+		self.speed = speed
+		self.bytes = 0
+		self.start = None
+		self.wav = None
+		self.file = None
+		if fileName.lower().endswith(".wav"):
+			self.wav = wave.open(fileName, "rb")
+			if self.wav.getframerate() != 22050 or self.wav.getnchannels() != 1 or self.wav.getsampwidth() != 2:
+				raise ValueError("%s: only WAV files with 22050 Hz, mono, 16 bit are supported" % fileName)
+		else:
+			self.file = open(fileName, "rb")
+		sourceList.append(self)
+		logging.debug("replay %s with speed %s", fileName, speed or "max")
+
+
+	def read(self, size):
+		"""
+		Read the next block, with a real-time factor it is returned not before its time
+
+		@type    size: integer
+		@param   size: bytes to read
+
+		@return:    string with the data ("" at the end of the file)
+		"""
+		global startTime, startCpu
+		if self.start is None:
+			self.start = time.time()
+			# the replay starts with the first read (after the start of multimon-ng)
+			if startTime is None:
+				startTime = self.start
+				startCpu = getCpuTime()
+		if self.wav:
+			block = self.wav.readframes(size // 2)
+		else:
+			block = self.file.read(size)
+		self.bytes += len(block)
+		if self.speed > 0:
+			wait = self.start + self.getAudioTime() / self.speed - time.time()
+			if wait > 0:
+				time.sleep(wait)
+		return block
+
+
+	def getAudioTime(self):
+		"""
+		Returns the replayed seconds of the recording
+
+		@return:    float
+		"""
+		return float(self.bytes) / self.bytesPerSecond
+
+
+	def close(self):
+		"""
+		Close the file
+
+		@return:    nothing
+		"""
+		if self.wav:
+			self.wav.close()
+		if self.file:
+			self.file.close()
+
+
+def getCpuTime():
+	"""
+	CPU time of BOSWatch and its finished subprocesses (multimon-ng)
+
+	@return:    seconds
+	"""
+	times = os.times()
+	return times[0] + times[1] + times[2] + times[3]
+
+
+def report():
+	"""
+	Log and print the results of the replay
+	Should be called after the subprocesses are stopped, so their CPU time is included
+
+	@return:    nothing
+	"""
+	if startTime is None:
+		return
+	wallTime = max(time.time() - startTime, 1e-6)
+	cpuTime = getCpuTime() - startCpu
+	# every receiver reads the same recording
+	audioTime = max([source.getAudioTime() for source in sourceList])
+	telegramCount = sum(decoder.telegrams.values())
+	result = "replay: %.1f s audio in %.1f s (%.1f x realtime), %s telegrams (%.1f/s), CPU %.2f s (%.3f s per audio second)" % (
+		audioTime, wallTime, audioTime / wallTime, telegramCount, telegramCount / wallTime, cpuTime, cpuTime / max(audioTime, 1e-6))
+	logging.info(result)
+	logging.info("replay: telegrams %s", ", ".join(["%s %s" % (typ, count) for (typ, count) in sorted(decoder.telegrams.items())]))
+	print result
+
+
+def isCapture(fileName):
+	"""
+	Check if the replay file is a capture of the multimon-ng output
+	The first line (without empty lines and # comments like in citest/testdata.txt) has to start
+	with the prefix of a multimon-ng demod (f.e. POCSAG1200:), with writeMultimonRawTime after the timestamp
+
+	@type    fileName: string
+	@param   fileName: file to replay
+
+	@return:    True for a mm_raw.txt capture
+	"""
+	if fileName.lower().endswith(".wav"):
+		return False
+	try:
+		with open(fileName, "rb") as replayFile:
+			for number in xrange(100):
+				line = replayFile.readline(1024)
+				if line.strip() and not line.startswith("#"):
+					return CAPTURE_LINE.match(line) is not None
+	except IOError:
+		# the replay reports the missing file
+		pass
+	return False
+
+
+def percentile(values, percent):
+	"""
+	Percentile of a list (nearest rank)
+
+	@type    values: list
+	@param   values: sorted values
+	@type    percent: integer
+	@param   percent: 0-100
+
+	@return:    value (0 for an empty list)
+	"""
+	if not values:
+		return 0
+	return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def replayCapture(fileName, speed, freq):
+	"""
+	Replay a capture of the multimon-ng output into the decoder
+	Lines with a timestamp (writeMultimonRawTime) are replayed with the original timing
+	divided by speed, all other lines as fast as possible
+
+	@type    fileName: string
+	@param   fileName: mm_raw.txt capture
+	@type    speed: float
+	@param   speed: real-time factor (0 = as fast as possible)
+	@type    freq: integer
+	@param   freq: frequency for the decoder in Hz
+
+	@return:    nothing
+	"""
+	from includes import alarmHandler
+
+	lineFormat = re.compile(r"^(\d+\.\d+) (.*\n?)$")
+	lags = []
+	durations = []
+	firstTime = None
+	replayStart = time.time()
+	logging.debug("replay capture %s with speed %s", fileName, speed or "max")
+	with open(fileName, "r") as capture:
+		for line in capture:
+			match = lineFormat.match(line)
+			dueTime = time.time()
+			if match:
+				line = match.group(2)
+				if speed > 0:
+					captureTime = float(match.group(1))
+					if firstTime is None:
+						firstTime = captureTime
+					dueTime = replayStart + (captureTime - firstTime) / speed
+					wait = dueTime - time.time()
+					if wait > 0:
+						time.sleep(wait)
+			startDecode = time.time()
+			decoder.decode(freq, line)
+			endDecode = time.time()
+			lags.append(startDecode - dueTime)
+			durations.append(endDecode - startDecode)
+	if speed > 0 and firstTime is None:
+		logging.warning("capture has no timestamps (writeMultimonRawTime) - replayed as fast as possible")
+	wallTime = max(time.time() - replayStart, 1e-6)
+
+	# wait for the queued alarms, the queues are needed for the statistics
+	queues = []
+	if alarmHandler.alarmQueue is not None:
+		queues.append(alarmHandler.alarmQueue)
+	queues += [lane for (pluginName, lane) in sorted(alarmHandler.pluginLanes.items())]
+	alarmHandler.shutdown()
+
+	stages = [("schedule lag", lags), ("decode", durations)]
+	for queue in queues:
+		samples = queue.getSamples()
+		stages.append((queue.name+" wait", [sample[0] for sample in samples]))
+		stages.append((queue.name+" run", [sample[1] for sample in samples]))
+
+	lines = ["replay: %s lines in %.1f s (%.1f lines/s), %s telegrams" % (len(durations), wallTime, len(durations) / wallTime, sum(decoder.telegrams.values())),
+			"%-24s %8s %10s %9s %9s %9s %9s" % ("stage", "count", "rate/s", "p50 ms", "p90 ms", "p99 ms", "max ms")]
+	for (name, values) in stages:
+		values = sorted(values)
+		lines.append("%-24s %8d %10.1f %9.2f %9.2f %9.2f %9.2f" % (name, len(values), len(values) / wallTime,
+			1000 * percentile(values, 50), 1000 * percentile(values, 90), 1000 * percentile(values, 99), 1000 * (values[-1] if values else 0)))
+	for line in lines:
+		logging.info(line)
+		print line
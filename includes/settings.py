@@ -0,0 +1,142 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Typed snapshot of the configuration for the processing of the telegrams
+The options are read, converted and precompiled once at the start, so the
+decoders, filters and helpers don't parse the config.ini with every telegram.
+Each section is an attribute of the snapshot, its options are attributes
+with the names of the config.ini (f.e. globalVars.settings.POC.allow_ric).
+
+A reload builds a new snapshot and replaces globalVars.settings with a single
+assignment. Functions read globalVars.settings once into a local variable,
+so a telegram is always processed with one consistent configuration.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import logging
+import re
+
+from includes import globalVars  # Global variables
+from includes.helper import idList  # sets and ranges of RICs
+
+#
+# ListStructure [section][option] = (typ, default)
+# typ is string|int|float|boolean|ricList, without default (None) the option is required
+# a ricList is a comma separated list of RICs, ranges and prefixes (see helper/idList.py)
+#
+OPTIONS = {
+	"BOSWatch": {
+		"processAlarmAsync": ("boolean", None),
+		"processPluginLanes": ("boolean", False),
+		"useRegExFilter": ("boolean", None),
+		"doubleFilter_ignore_entries": ("int", None),
+		"doubleFilter_ignore_time": ("int", None),
+		"doubleFilter_check_msg": ("boolean", None),
+		"doubleFilter_msg_distance": ("int", 0),
+		"doubleFilter_file": ("string", ""),
+		"writeMultimonRaw": ("boolean", None),
+		"writeMultimonRawTime": ("boolean", False)},
+	"FMS": {
+		"CheckCRC": ("boolean", None),
+		"idDescribed": ("boolean", None)},
+	"ZVEI": {
+		"idDescribed": ("boolean", None)},
+	"POC": {
+		"allow_ric": ("ricList", None),
+		"deny_ric": ("ricList", None),
+		"filter_range_start": ("int", None),
+		"filter_range_end": ("int", None),
+		"filter_ranges": ("ricList", ""),
+		"idDescribed": ("boolean", None),
+		"onlysubric": ("boolean", False),
+		"rica": ("string", ""),
+		"ricb": ("string", ""),
+		"ricc": ("string", ""),
+		"ricd": ("string", ""),
+		"netIdent_ric": ("ricList", None),
+		"geo_enable": ("boolean", False),
+		"geo_format": ("string", ""),
+		"geo_order": ("string", "")},
+	"multicastAlarm": {
+		"multicastAlarm": ("boolean", None),
+		"multicastAlarm_ignore_time": ("int", None),
+		"multicastAlarm_delimiter_ric": ("ricList", None),
+		"multicastAlarm_ric": ("ricList", None)}}
+
+
+class Section(object):
+	"""Options of one section of the config.ini as typed attributes"""
+
+	def __init__(self, config, section, options):
+		"""
+		@type    config: ConfigParser
+		@param   config: the read config.ini
+		@type    section: string
+		@param   section: name of the section
+		@type    options: dict
+		@param   options: [option] = (typ, default)
+
+		@exception: ConfigParser.Error if a required option is missing
+		@exception: ValueError if an option has the wrong typ or a ricList has an invalid range
+		"""
+		for option, (typ, default) in options.items():
+			if default is not None and not config.has_option(section, option):
+				value = default
+			elif typ == "boolean":
+				value = config.getboolean(section, option)
+			elif typ == "int":
+				value = config.getint(section, option)
+			elif typ == "float":
+				value = config.getfloat(section, option)
+			else:
+				value = config.get(section, option)
+			if typ == "ricList":
+				value = idList.parseIdList(value, 7)
+			setattr(self, option, value)
+
+
+class Settings(object):
+	"""Snapshot of all options needed for the processing of the telegrams"""
+
+	def __init__(self, config):
+		"""
+		@type    config: ConfigParser
+		@param   config: the read config.ini
+
+		@exception: Exception if an option is missing, has the wrong typ or a regex cannot be compiled
+		"""
+		for section, options in OPTIONS.items():
+			setattr(self, section, Section(config, section, options))
+
+		# idDescribed by the typ of the telegram
+		self.idDescribed = {"FMS": self.FMS.idDescribed, "ZVEI": self.ZVEI.idDescribed, "POC": self.POC.idDescribed}
+
+		# precompiled POC options
+		self.POC.geo_regex = None
+		if self.POC.geo_enable:
+			self.POC.geo_regex = re.compile(self.POC.geo_format)
+		self.POC.geo_order = self.POC.geo_order.split(',')
+		self.POC.functionText = {"1": self.POC.rica, "2": self.POC.ricb, "3": self.POC.ricc, "4": self.POC.ricd}
+		# without filter_ranges the range between filter_range_start and filter_range_end (both excluded)
+		if not self.POC.filter_ranges:
+			first = self.POC.filter_range_start + 1
+			last = self.POC.filter_range_end - 1
+			self.POC.filter_ranges = idList.IdList(ranges=[(first, last)] if first <= last else [])
+
+
+def load():
+	"""
+	Build a new snapshot of globalVars.config and replace globalVars.settings
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	@exception: Exception if the snapshot cannot be built (globalVars.settings is unchanged)
+	"""
+	globalVars.settings = Settings(globalVars.config)
+	logging.debug("settings loaded")
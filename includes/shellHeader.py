@@ -10,6 +10,8 @@ Shows the header in shell if quiet mode is not active
 @requires: none
 """
 
+import logging
+
 from includes import globalVars
 
 def printHeader(args):
@@ -35,26 +37,34 @@ def printHeader(args):
 		print "Build Date:	"+globalVars.buildDate
 		print ""
 
-		print "Frequency:   "+args.freq
-		print "Device-ID:   "+str(args.device)
-		print "Error in PPM:    "+str(args.error)
-		print "Active Demods:   "+str(len(args.demod))
-		if "FMS" in args.demod:
-			print "- FMS"
-		if "ZVEI" in args.demod:
-			print "- ZVEI"
-		if "POC512" in args.demod:
-			print "- POC512"
-		if "POC1200" in args.demod:
-			print "- POC1200"
-		if "POC2400" in args.demod:
-			print "- POC2400"
-		print "Squelch: "+str(args.squelch)
-		print "Gain: "+str(args.gain)
+		if args.multichannel or args.wideband:
+			if args.multichannel:
+				print "Multi channel mode - receivers from config.ini [Receivers]"
+			if args.wideband:
+				print "Wideband mode - channels from config.ini [WidebandChannels]"
+		else:
+			print "Frequency:   "+args.freq
+			print "Device-ID:   "+str(args.device)
+			print "Error in PPM:    "+str(args.error)
+			print "Active Demods:   "+str(len(args.demod))
+			if "FMS" in args.demod:
+				print "- FMS"
+			if "ZVEI" in args.demod:
+				print "- ZVEI"
+			if "POC512" in args.demod:
+				print "- POC512"
+			if "POC1200" in args.demod:
+				print "- POC1200"
+			if "POC2400" in args.demod:
+				print "- POC2400"
+			print "Squelch: "+str(args.squelch)
+			print "Gain: "+str(args.gain)
 		if args.verbose:
 			print "Verbose Mode!"
 		if args.test:
 			print "Test Mode!"
+		if args.replay:
+			print "Replay: "+args.replay+" (speed "+(str(args.speed) if args.speed else "max")+")"
 		print ""
 	except:
 		logging.error("cannot display shell header")
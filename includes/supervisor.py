@@ -0,0 +1,257 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Supervisor of the subprocesses of the receivers
+Every second the supervisor checks the chain of each receiver (rtl_fm or rtl_sdr
+and multimon-ng) for an exited subprocess, an error message in its logfile
+(f.e. a lost USB device) and a stall (no output for a configured time).
+A failed chain is restarted at once; if it fails again shortly after the restart,
+the next restart is delayed with an increasing backoff.
+The restart waits for the start of the subprocesses, so it runs in its own thread
+and the event loop keeps reading the other receivers. The next check after the
+restart adds the new streams to the event loop.
+The restarts and the downtime of the reception are counted in the metrics.
+
+@author: Bastian Schroll
+
+@requires: Configuration has to be set in the config.ini
+"""
+
+import logging
+import threading
+import time
+
+from includes import globalVars  # Global variables
+from includes import checkSubprocesses
+from includes import eventLoop
+from includes import metrics
+
+# seconds a restarted chain has to run until the backoff is reset
+STABLE_TIME = 60
+
+#
+# ListStructure [0..n] = Supervisor
+#
+supervisorList = []
+
+
+class Supervisor(object):
+	"""Watches and restarts the subprocesses of one receiver"""
+
+	def __init__(self, receiver, stallTimeout=0, audioStallTimeout=10, maxBackoff=60):
+		"""
+		@type    receiver: receiver.Receiver or receiver.WidebandReceiver
+		@param   receiver: the started receiver
+		@type    stallTimeout: integer
+		@param   stallTimeout: seconds without a line of multimon-ng until a restart (0 = off)
+		@type    audioStallTimeout: integer
+		@param   audioStallTimeout: seconds without audio until a restart (0 = off)
+		@type    maxBackoff: integer
+		@param   maxBackoff: maximum delay between two restarts in seconds
+		"""
+		self.receiver = receiver
+		self.stallTimeout = stallTimeout
+		self.audioStallTimeout = audioStallTimeout
+		self.maxBackoff = maxBackoff
+		self.failedSince = None
+		self.failedProcess = None
+		self.nextRestart = 0
+		self.backoff = 0
+		self.lastRestart = None
+		# thread of a running restart and its result
+		self.restartThread = None
+		self.restartFailed = False
+		self.watch()
+
+
+	def watch(self):
+		"""
+		Start watching the running chain (after the start or a restart)
+
+		@return:    nothing
+		"""
+		self.watchStart = time.time()
+		# the logfiles are searched from the start of the subprocesses
+		self.logOffsets = dict(self.receiver.logOffsets)
+
+
+	def findFailure(self, now):
+		"""
+		Check the subprocesses for exit, error messages and stalls
+
+		@type    now: float
+		@param   now: timestamp of the check
+
+		@return:    (name of the process, reason) or None if the chain is fine
+		"""
+		processes = self.receiver.getProcesses()
+		for (name, process, logFile, patterns) in processes:
+			if process.poll() is not None:
+				return (name, "terminated with %s" % process.returncode)
+			try:
+				(line, self.logOffsets[logFile]) = checkSubprocesses.findError(logFile, patterns, self.logOffsets.get(logFile, 0))
+			except IOError:
+				logging.debug("cannot read %s", logFile, exc_info=True)
+				continue
+			if line:
+				return (name, line)
+
+		if self.audioStallTimeout and processes:
+			lastAudio = self.receiver.getLastAudio()
+			if lastAudio is not None and now - max(lastAudio, self.watchStart) > self.audioStallTimeout:
+				return (processes[0][0], "no audio for %s seconds" % self.audioStallTimeout)
+
+		streams = self.receiver.getStreams()
+		if self.stallTimeout and streams:
+			lastOutput = max([eventLoop.getLastRead(stream) or 0 for (stream, freq) in streams] + [self.watchStart])
+			if now - lastOutput > self.stallTimeout:
+				return ("multimon-ng", "no output for %s seconds" % self.stallTimeout)
+		return None
+
+
+	def check(self):
+		"""
+		Check the chain and restart it if it failed
+		runs as timer in the thread of the event loop
+
+		@return:    nothing
+		"""
+		now = time.time()
+		if self.restartThread is not None:
+			if not self.restartThread.is_alive():
+				self.finishRestart()
+			return
+
+		if self.failedSince is None:
+			failure = self.findFailure(now)
+			if failure is None:
+				return
+			(self.failedProcess, reason) = failure
+			logging.error("%s of %s failed: %s", self.failedProcess, self.receiver, reason)
+			self.failedSince = now
+			# a chain failing again shortly after a restart is restarted with an increasing delay
+			if self.lastRestart is not None and now - self.lastRestart < STABLE_TIME:
+				self.backoff = min(self.maxBackoff, max(1, self.backoff * 2))
+			else:
+				self.backoff = 0
+			self.nextRestart = now + self.backoff
+			if self.backoff:
+				logging.warning("restart of %s in %s second(s)", self.receiver, self.backoff)
+
+		if now < self.nextRestart:
+			return
+		logging.warning("restarting %s", self.receiver)
+		metrics.count("subprocess_restarts", (("process", self.failedProcess),))
+		for (stream, freq) in self.receiver.getStreams():
+			eventLoop.removeStream(stream)
+		self.restartFailed = False
+		self.restartThread = threading.Thread(target=self.runRestart, name="restart-"+(self.receiver.name or "receiver"))
+		self.restartThread.daemon = True
+		self.restartThread.start()
+
+
+	def runRestart(self):
+		"""
+		Restart the chain of the receiver, runs in the restart thread
+
+		@return:    nothing
+		"""
+		try:
+			self.receiver.restart()
+		except:
+			logging.error("cannot restart %s", self.receiver)
+			logging.debug("cannot restart %s", self.receiver, exc_info=True)
+			self.restartFailed = True
+
+
+	def finishRestart(self):
+		"""
+		Add the streams of the restarted chain to the event loop or plan the next restart
+		runs in the thread of the event loop
+
+		@return:    nothing
+		"""
+		self.restartThread = None
+		if self.restartFailed:
+			self.backoff = min(self.maxBackoff, max(1, self.backoff * 2))
+			self.nextRestart = time.time() + self.backoff
+			logging.warning("next restart of %s in %s second(s)", self.receiver, self.backoff)
+			return
+
+		for (stream, freq) in self.receiver.getStreams():
+			eventLoop.addStream(stream, freq)
+		self.lastRestart = time.time()
+		downtime = self.lastRestart - self.failedSince
+		metrics.count("downtime_seconds", (("receiver", self.receiver.name or "receiver"),), downtime)
+		logging.warning("%s restarted - reception was interrupted for %.1f second(s)", self.receiver, downtime)
+		self.failedSince = None
+		self.watch()
+
+
+def isEnabled():
+	"""
+	Check if the supervisor is switched on in the config.ini
+
+	@return:    True if supervise is set
+	"""
+	return globalVars.config.has_option("BOSWatch", "supervise") and globalVars.config.getboolean("BOSWatch", "supervise")
+
+
+def getStates():
+	"""
+	Returns for each supervised receiver if its chain is running (gauge receiver_up)
+
+	@return:    list of (labels, value)
+	"""
+	return [((("receiver", supervisor.receiver.name or "receiver"),), 0 if supervisor.failedSince else 1) for supervisor in supervisorList]
+
+
+def checkAll():
+	"""
+	Check all supervised receivers, called by the timer of the event loop
+
+	@return:    nothing
+	"""
+	for supervisor in supervisorList:
+		try:
+			supervisor.check()
+		except (KeyboardInterrupt, SystemExit):
+			raise
+		except:
+			logging.error("error in supervisor of %s", supervisor.receiver)
+			logging.debug("error in supervisor of %s", supervisor.receiver, exc_info=True)
+
+
+def start(receivers):
+	"""
+	Supervise the started receivers with a timer on the event loop
+	The supervisor is registered as producer, so the loop keeps running while a chain is restarted
+
+	@type    receivers: list
+	@param   receivers: started receivers (recordings are not supervised)
+
+	@requires:  Configuration has to be set in the config.ini
+
+	@return:    nothing
+	"""
+	stallTimeout = 0
+	audioStallTimeout = 10
+	maxBackoff = 60
+	if globalVars.config.has_option("BOSWatch", "stallTimeout"):
+		stallTimeout = globalVars.config.getint("BOSWatch", "stallTimeout")
+	if globalVars.config.has_option("BOSWatch", "audioStallTimeout"):
+		audioStallTimeout = globalVars.config.getint("BOSWatch", "audioStallTimeout")
+	if globalVars.config.has_option("BOSWatch", "restartMaxBackoff"):
+		maxBackoff = globalVars.config.getint("BOSWatch", "restartMaxBackoff")
+
+	for bosReceiver in receivers:
+		if bosReceiver.isLive():
+			supervisorList.append(Supervisor(bosReceiver, stallTimeout, audioStallTimeout, maxBackoff))
+			logging.debug("supervising %s", bosReceiver)
+	if not supervisorList:
+		return
+	metrics.addGauge("receiver_up", "1 if the subprocesses of the receiver are running, 0 while they are restarted", getStates)
+	eventLoop.addTimer(1, checkAll, inPipeline=False)
+	eventLoop.addProducer()
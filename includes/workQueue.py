@@ -0,0 +1,229 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+#
+
+"""
+Bounded work queue with a fixed pool of worker threads.
+Used for the asynchronous alarm processing, so that a burst of alarms
+doesn't start hundreds of threads and the memory stays capped.
+
+@author: Bastian Schroll
+
+@requires: none
+"""
+
+import logging
+import threading
+import time
+
+from collections import deque
+
+
+class WorkQueue(object):
+	"""
+	Bounded FIFO queue served by a fixed number of worker threads
+
+	Overflow policies if the queue is full:
+	  - block          = put() waits until a place is free (backpressure)
+	  - dropOldest     = the oldest waiting item will be discarded
+	  - dropExpendable = the oldest waiting expendable item will be discarded,
+	                     a new expendable item is discarded itself, otherwise block
+	"""
+
+	# number of the last items with wait and run time for percentiles
+	SAMPLE_SIZE = 10000
+
+	def __init__(self, name, handler, workers=1, maxSize=0, overflow="block"):
+		"""
+		@type    name: string
+		@param   name: Name of the queue (used for logging and thread names)
+		@type    handler: function
+		@param   handler: Function called with the args of each item
+		@type    workers: integer
+		@param   workers: Number of worker threads
+		@type    maxSize: integer
+		@param   maxSize: Maximum number of waiting items (0 = unlimited)
+		@type    overflow: string (block|dropOldest|dropExpendable)
+		@param   overflow: Policy if the queue is full
+
+		@exception: ValueError if an unknown overflow policy is given
+		"""
+		if overflow not in ("block", "dropOldest", "dropExpendable"):
+			raise ValueError("unknown overflow policy: %s" % overflow)
+		self.name = name
+		self.handler = handler
+		self.workers = max(1, int(workers))
+		self.maxSize = max(0, int(maxSize))
+		self.overflow = overflow
+
+		# ItemStructure = (args, expendable, TimeStamp)
+		self._items = deque()
+		self._lock = threading.Lock()
+		self._notEmpty = threading.Condition(self._lock)
+		self._notFull = threading.Condition(self._lock)
+		self._threads = []
+		self._running = False
+		self._busy = 0
+
+		# counters
+		self.enqueued = 0
+		self.processed = 0
+		self.dropped = 0
+		self.maxDepth = 0
+		self.waitTotal = 0.0
+		self.waitMax = 0.0
+		# ItemStructure = (wait time, run time)
+		self.samples = deque(maxlen=self.SAMPLE_SIZE)
+
+
+	def start(self):
+		"""
+		Start the worker threads
+
+		@return:    nothing
+		"""
+		with self._lock:
+			if self._running:
+				return
+			self._running = True
+		for i in range(self.workers):
+			thread = threading.Thread(target=self._worker, name="%s-%s" % (self.name, i))
+			thread.daemon = True
+			thread.start()
+			self._threads.append(thread)
+		logging.debug("%s: started %s worker(s), queue size %s, overflow %s", self.name, self.workers, self.maxSize, self.overflow)
+
+
+	def put(self, args, expendable=False):
+		"""
+		Insert a new item into the queue
+
+		@type    args: tuple
+		@param   args: Arguments for the handler function
+		@type    expendable: boolean
+		@param   expendable: Item may be discarded first (policy dropExpendable)
+
+		@return:    True if the item was queued, False if it was discarded
+		"""
+		with self._lock:
+			while self.maxSize and len(self._items) >= self.maxSize:
+				if self.overflow == "dropOldest":
+					self._items.popleft()
+					self.dropped += 1
+					logging.warning("%s: queue full - oldest item dropped", self.name)
+					break
+				elif self.overflow == "dropExpendable":
+					victim = None
+					for item in self._items:
+						if item[1]:
+							victim = item
+							break
+					if victim is not None:
+						self._items.remove(victim)
+						self.dropped += 1
+						logging.warning("%s: queue full - oldest expendable item dropped", self.name)
+						break
+					elif expendable:
+						self.dropped += 1
+						logging.warning("%s: queue full - new expendable item dropped", self.name)
+						return False
+				# block until a worker takes an item
+				self._notFull.wait()
+
+			self._items.append((args, expendable, time.time()))
+			self.enqueued += 1
+			if len(self._items) > self.maxDepth:
+				self.maxDepth = len(self._items)
+			self._notEmpty.notify()
+		return True
+
+
+	def _worker(self):
+		"""
+		Loop of a worker thread, calls the handler for each item
+
+		@return:    nothing
+		"""
+		while True:
+			with self._lock:
+				while not self._items and self._running:
+					self._notEmpty.wait()
+				if not self._items:
+					# queue stopped and drained
+					return
+				(args, _, queuedTime) = self._items.popleft()
+				self._busy += 1
+				self._notFull.notify()
+				wait = time.time() - queuedTime
+				self.waitTotal += wait
+				if wait > self.waitMax:
+					self.waitMax = wait
+			startTime = time.time()
+			try:
+				self.handler(*args)
+			except:
+				logging.error("%s: error in worker", self.name)
+				logging.debug("%s: error in worker", self.name, exc_info=True)
+			finally:
+				with self._lock:
+					self._busy -= 1
+					self.processed += 1
+					self.samples.append((wait, time.time() - startTime))
+
+
+	def depth(self):
+		"""
+		Returns the number of waiting items
+
+		@return:    integer
+		"""
+		return len(self._items)
+
+
+	def getStats(self):
+		"""
+		Returns the counters of the queue
+
+		@return:    Python Dict with the counters
+		"""
+		with self._lock:
+			return {"depth": len(self._items),
+					"busy": self._busy,
+					"maxDepth": self.maxDepth,
+					"enqueued": self.enqueued,
+					"processed": self.processed,
+					"dropped": self.dropped,
+					"waitTotal": self.waitTotal,
+					"waitMax": self.waitMax,
+					"waitAvg": self.waitTotal / self.processed if self.processed else 0.0}
+
+
+	def getSamples(self):
+		"""
+		Returns wait and run time of the last processed items
+
+		@return:    list of (wait time, run time) in seconds
+		"""
+		with self._lock:
+			return list(self.samples)
+
+
+	def stop(self, timeout=10):
+		"""
+		Stop the workers after the waiting items were processed
+
+		@type    timeout: float
+		@param   timeout: Maximum time to wait for the workers in seconds
+
+		@return:    nothing
+		"""
+		with self._lock:
+			self._running = False
+			self._notEmpty.notifyAll()
+		deadline = time.time() + timeout
+		for thread in self._threads:
+			thread.join(max(0, deadline - time.time()))
+		if self._items:
+			logging.warning("%s: %s item(s) not processed", self.name, len(self._items))
+		del self._threads[:]
+		logging.debug("%s: stopped - %s", self.name, self.getStats())
@@ -31,8 +31,8 @@ def isSignal(poc_id):
 	@exception: none
 	"""
 	# If RIC is Signal return True, else False
-	if globalVars.config.get("POC", "netIdent_ric"):
-		if poc_id in globalVars.config.get("POC", "netIdent_ric"):
+	if globalVars.settings.POC.netIdent_ric:
+		if poc_id in globalVars.settings.POC.netIdent_ric:
 			logging.info("RIC %s is net ident", poc_id)
 			return True
 		else: